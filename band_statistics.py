@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Fri Oct 16 22:25:48 2026
+
+Statistics (count, min, max, mean, standard deviation) of the valid values in a
+raster band, computed without making a full-size masked copy of the array.
+
+The array is processed in fixed-size chunks. Each chunk is summarized on its own
+while it is still in the CPU cache, and the chunk summaries are combined with the
+parallel-variance formula of Chan et al. (the same formula used to merge the
+statistics of separate arrays, files or processes with BandStatistics.merge()).
+"""
+import numpy
+
+# Number of array elements summarized at a time. Small enough that each chunk
+# (and its mask and valid values) stays in the CPU cache while it is summarized.
+DEFAULT_STATS_CHUNK_SIZE = 2**16
+
+class BandStatistics(object):
+    """Running count, min, max, mean and (population) standard deviation of a set of values.
+
+    Add values with update(array, nodata), and combine with the statistics of
+    other arrays (other chunks, files or processes) with merge(). Example:
+
+        stats = compute_band_stats(array1, nodata=0)
+        stats.merge(compute_band_stats(array2, nodata=0))
+        print(stats.count, stats.min, stats.max, stats.mean, stats.std)
+    """
+    def __init__(self, count=0, minimum=numpy.nan, maximum=numpy.nan, mean=numpy.nan, m2=0.0):
+        self.count = int(count)
+        self.min = float(minimum)
+        self.max = float(maximum)
+        self.mean = float(mean)
+        # Sum of squared differences from the mean.
+        self.m2 = float(m2)
+
+    @property
+    def variance(self):
+        if self.count == 0:
+            return numpy.nan
+        return self.m2 / self.count
+
+    @property
+    def std(self):
+        return float(numpy.sqrt(self.variance))
+
+    def as_tuple(self):
+        """Return (min, max, mean, std), in the order GDAL's SetStatistics() takes them. NaNs if empty."""
+        if self.count == 0:
+            return (numpy.nan, numpy.nan, numpy.nan, numpy.nan)
+        return (self.min, self.max, self.mean, self.std)
+
+    def copy(self):
+        return BandStatistics(self.count, self.min, self.max, self.mean, self.m2)
+
+    def merge(self, other):
+        """Add the values summarized in another BandStatistics object to this one. Returns self."""
+        if other.count == 0:
+            return self
+        if self.count == 0:
+            self.count, self.min, self.max, self.mean, self.m2 = other.count, other.min, other.max, other.mean, other.m2
+            return self
+
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean = self.mean + delta * (other.count / count)
+        self.m2 = self.m2 + other.m2 + (delta**2) * (self.count * other.count / count)
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self.count = count
+        return self
+
+    def update(self, array, nodata=None, chunk_size=DEFAULT_STATS_CHUNK_SIZE):
+        """Add the values of an array (of any shape) to the statistics. Returns self.
+
+        nodata = Values equal to this are left out. NaN values are always left out.
+        """
+        flat = numpy.asarray(array).reshape(-1)
+        for start in range(0, flat.size, chunk_size):
+            self.merge(_summarize_chunk(flat[start:start+chunk_size], nodata))
+        return self
+
+    def __repr__(self):
+        return "BandStatistics(count={0}, min={1}, max={2}, mean={3}, std={4})".format(
+               self.count, self.min, self.max, self.mean, self.std)
+
+def _summarize_chunk(chunk, nodata):
+    """Return the BandStatistics of one (1D) chunk of values, leaving out nodata and NaN values."""
+    is_float = numpy.issubdtype(chunk.dtype, numpy.floating)
+
+    valid = None
+    if nodata is not None and not (isinstance(nodata, float) and numpy.isnan(nodata)):
+        valid = (chunk != nodata)
+    if is_float:
+        valid = ~numpy.isnan(chunk) if valid is None else (valid & ~numpy.isnan(chunk))
+
+    count = chunk.size if valid is None else int(numpy.count_nonzero(valid))
+    if count == 0:
+        return BandStatistics()
+    if count == chunk.size:
+        # Skip the masking when every value is valid.
+        valid = None
+
+    # Only this chunk of valid values is ever copied, never the whole array.
+    values = chunk if valid is None else chunk[valid]
+
+    minimum = values.min()
+    maximum = values.max()
+    mean = numpy.sum(values, dtype=numpy.float64) / count
+    deviations = numpy.subtract(values, mean, dtype=numpy.float64)
+    m2 = numpy.dot(deviations, deviations)
+
+    return BandStatistics(count, minimum, maximum, mean, m2)
+
+def compute_band_stats(array, nodata=None, chunk_size=DEFAULT_STATS_CHUNK_SIZE):
+    """Compute the count, min, max, mean and standard deviation of an array's valid values.
+
+    Values equal to "nodata" (if not None), and NaN values, are left out.
+
+    Returns: A BandStatistics object, which can be merge()'d with the statistics of
+             other arrays.
+    """
+    return BandStatistics().update(array, nodata=nodata, chunk_size=chunk_size)
+
+def testing_band_statistics():
+    """Check compute_band_stats() against numpy on the valid values, in one pass. Raises AssertionError on a mismatch.
+
+    Covers integer and floating-point arrays with and without nodata and NaN values,
+    chunk sizes that don't divide the array evenly, arrays merge()'d from separate
+    pieces in any order, and arrays with no valid values at all.
+    """
+    random_state = numpy.random.RandomState(0)
+
+    arrays = [(random_state.randint(0, 3000, size=(448, 304)).astype(numpy.uint16), 0),
+              (random_state.randint(-500, 500, size=(332, 316)).astype(numpy.int32), None),
+              (random_state.normal(250, 20, size=(332, 316)), None),
+              (random_state.normal(250, 20, size=(448, 304)).astype(numpy.float32), 0.0)]
+    arrays[0][0][:100, :100] = 0
+    arrays[3][0][random_state.rand(448, 304) < 0.2] = numpy.nan
+    arrays[3][0][random_state.rand(448, 304) < 0.2] = 0.0
+
+    for array, nodata in arrays:
+        values = array.ravel().astype(numpy.float64)
+        values = values[~numpy.isnan(values)]
+        if nodata is not None:
+            values = values[values != nodata]
+        expected = (len(values), values.min(), values.max(), values.mean(), values.std())
+
+        # One pass, in chunks of several sizes (including ones that don't divide the array).
+        for chunk_size in (DEFAULT_STATS_CHUNK_SIZE, 1000, 7, array.size):
+            stats = compute_band_stats(array, nodata=nodata, chunk_size=chunk_size)
+            assert stats.count == expected[0], (array.dtype, chunk_size, stats.count, expected[0])
+            assert numpy.allclose((stats.min, stats.max, stats.mean, stats.std), expected[1:]), (array.dtype, chunk_size, stats, expected)
+
+        # Merged from uneven pieces, in reverse order, matches the single pass.
+        pieces = numpy.array_split(array.ravel(), [10, 5000, 5001, 60000])
+        merged = BandStatistics()
+        for piece in pieces[::-1]:
+            merged.merge(compute_band_stats(piece, nodata=nodata))
+        single = compute_band_stats(array, nodata=nodata)
+        assert merged.count == single.count, (array.dtype, merged.count, single.count)
+        assert numpy.allclose(merged.as_tuple(), single.as_tuple()), (array.dtype, merged, single)
+
+    # No valid values: NaN statistics, and merging them changes nothing.
+    empty = compute_band_stats(numpy.zeros((10, 10), dtype=numpy.uint8), nodata=0)
+    assert empty.count == 0 and numpy.isnan(empty.as_tuple()).all(), empty
+    stats = compute_band_stats(arrays[2][0])
+    assert stats.as_tuple() == stats.copy().merge(empty).as_tuple()
+
+    print(len(arrays), "band statistics checks passed.")
@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Fri Oct 16 22:24:52 2026
+"""
+import numpy
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+from convert_bin_to_gtif import output_gtif, \
+                               GRIDSIZE_25_N, GRIDSIZE_25_S, \
+                               GRIDSIZE_12_5_N, GRIDSIZE_12_5_S, \
+                               GRIDSIZE_6_25_N, GRIDSIZE_6_25_S
+
+# (name, keyword arguments to output_gtif()) for each encoding compared in the table.
+PROFILES_TO_BENCHMARK = [("plain", dict(profile="plain")),
+                         ("tiled DEFLATE", dict(profile="tiled", compress="DEFLATE")),
+                         ("tiled LZW", dict(profile="tiled", compress="LZW")),
+                         ("tiled ZSTD", dict(profile="tiled", compress="ZSTD")),
+                         ("tiled DEFLATE +ovr", dict(profile="tiled", compress="DEFLATE", overviews=True)),
+                         ("cog DEFLATE", dict(profile="cog", compress="DEFLATE")),
+                         ("cog ZSTD", dict(profile="cog", compress="ZSTD"))]
+
+GRIDS_TO_BENCHMARK = [(25.0, "N", GRIDSIZE_25_N),
+                      (25.0, "S", GRIDSIZE_25_S),
+                      (12.5, "N", GRIDSIZE_12_5_N),
+                      (12.5, "S", GRIDSIZE_12_5_S),
+                      (6.25, "N", GRIDSIZE_6_25_N),
+                      (6.25, "S", GRIDSIZE_6_25_S)]
+
+def make_synthetic_tb_grid(grid_shape, return_type=float, nodata=0, seed=0):
+    """Make a grid that looks roughly like brightness-temperature data, for benchmarking.
+
+    Smooth large-scale structure (like real Tb fields) plus sensor noise, rounded to
+    0.1 K like the NSIDC-0001 values, with a patch of nodata. Compresses about as
+    well as the real data does, unlike purely random values.
+    """
+    random_state = numpy.random.RandomState(seed)
+    rows, cols = int(grid_shape[0]), int(grid_shape[1])
+    y, x = numpy.mgrid[0:rows, 0:cols]
+    y = y / float(rows)
+    x = x / float(cols)
+
+    tb = 220.0 + 35.0*numpy.sin(3*numpy.pi*x) * numpy.cos(2*numpy.pi*y) + random_state.normal(0, 1.5, size=(rows,cols))
+    tb = numpy.round(tb, 1)
+    # A "land" area of nodata in one corner.
+    tb[(x - 0.8)**2 + (y - 0.2)**2 < 0.04] = nodata
+
+    if return_type in (int, numpy.uint16, numpy.int16, numpy.int32):
+        return numpy.array(numpy.round(tb * 10), dtype=return_type)
+    return numpy.array(tb, dtype=return_type)
+
+def is_profile_supported(profile="plain", compress=None, **kwargs):
+    """Return True if the local GDAL can write an output_gtif() profile: it has the COG
+    driver (GDAL 3.1 or newer) for "cog", and was built with the compression asked for."""
+    from osgeo import gdal
+
+    driver = gdal.GetDriverByName("COG" if profile == "cog" else "GTiff")
+    if driver is None:
+        return False
+    if profile == "plain" or compress is None:
+        return True
+    creation_options = driver.GetMetadataItem("DMD_CREATIONOPTIONLIST") or ""
+    return "<Value>{0}</Value>".format(compress.strip().upper()) in creation_options
+
+def benchmark_gtif_profiles(output_dir=None, repeats=3, return_type=float, profiles=PROFILES_TO_BENCHMARK, grids=GRIDS_TO_BENCHMARK):
+    """Time output_gtif() for each encoding profile and grid, and measure the output sizes.
+
+    Returns a list of (grid name, profile name, best write time in seconds, output size in bytes) tuples.
+    Profiles that the local GDAL can't write (e.g. ZSTD or COG in older versions, see
+    is_profile_supported()) get None values. Any other error in writing is raised.
+    """
+    cleanup = output_dir is None
+    if cleanup:
+        output_dir = tempfile.mkdtemp()
+
+    results = []
+    try:
+        for resolution, hemisphere, grid_shape in grids:
+            array = make_synthetic_tb_grid(grid_shape, return_type=return_type)
+            grid_name = "{0} km {1} {2}x{3}".format(resolution, hemisphere, grid_shape[0], grid_shape[1])
+
+            for profile_name, kwargs in profiles:
+                if not is_profile_supported(**kwargs):
+                    results.append((grid_name, profile_name, None, None))
+                    continue
+
+                gtif_file = os.path.join(output_dir, "{0}_{1}_{2}.tif".format(resolution, hemisphere, profile_name.replace(" ", "_").replace("+", "")))
+                times = []
+                for i in range(repeats):
+                    if os.path.exists(gtif_file):
+                        os.remove(gtif_file)
+                    start_time = time.perf_counter()
+                    output_gtif(array, gtif_file, resolution=resolution, hemisphere=hemisphere, nodata=0, verbose=False, **kwargs)
+                    times.append(time.perf_counter() - start_time)
+                results.append((grid_name, profile_name, min(times), os.path.getsize(gtif_file)))
+    finally:
+        if cleanup:
+            shutil.rmtree(output_dir)
+
+    return results
+
+def print_benchmark_table(results):
+    """Print the results of benchmark_gtif_profiles() as a text table."""
+    print("{0:<22} {1:<20} {2:>10} {3:>11} {4:>8}".format("Grid", "Profile", "Write (ms)", "Size (KB)", "Ratio"))
+    print("-" * 75)
+    plain_sizes = dict([(grid_name, size) for (grid_name, profile_name, t, size) in results if profile_name == "plain"])
+    for grid_name, profile_name, seconds, size in results:
+        if seconds is None:
+            print("{0:<22} {1:<20} {2:>10} {3:>11} {4:>8}".format(grid_name, profile_name, "n/a", "n/a", "n/a"))
+            continue
+        plain_size = plain_sizes.get(grid_name, None)
+        print("{0:<22} {1:<20} {2:>10.1f} {3:>11.1f} {4:>8}".format(
+              grid_name, profile_name, seconds*1000, size/1024.,
+              "{0:0.2f}".format(plain_size/float(size)) if plain_size else "n/a"))
+
+def read_and_parse_args():
+    """Read and parse command-line arguments."""
+    parser = argparse.ArgumentParser(description="Compare the write time and file size of each output_gtif() encoding profile on the standard 25, 12.5 and 6.25 km NSIDC polar stereo grids, using synthetic brightness-temperature data.")
+    parser.add_argument("-repeats", "-r", type=int, default=3, help="Times to write each geotiff. The fastest is reported. (Default: 3)")
+    parser.add_argument("-output_type", "-ot", default="float", help="Data type of the grids: 'int' or 'float'. (Default: float)")
+    parser.add_argument("-output_dir", "-o", type=str, default=None, help="Directory to keep the geotiffs in. (Default: a temporary directory, deleted afterward.)")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = read_and_parse_args()
+    out_type = int if args.output_type.lower() in ("int", "i", "d") else float
+    print_benchmark_table(benchmark_gtif_profiles(output_dir=args.output_dir, repeats=args.repeats, return_type=out_type))
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Fri Oct 16 22:31:33 2026
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+import time
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# (name, python code) of each start-up path that is timed.
+IMPORTS_TO_BENCHMARK = [("import read_bin", "import read_bin"),
+                        ("import convert_bin_to_gtif", "import convert_bin_to_gtif"),
+                        ("get_nsidc_geotransform()", "from convert_bin_to_gtif import get_nsidc_geotransform; get_nsidc_geotransform('N', 25)"),
+                        # What every invocation used to pay up front: GDAL plus two EPSG lookups.
+                        ("import gdal + EPSG 3411/3412 (reference)", "from osgeo import osr, gdal; [osr.SpatialReference().ImportFromEPSG(e) for e in (3411, 3412)]")]
+
+# (name, script arguments) of each command-line call that is timed.
+COMMANDS_TO_BENCHMARK = [("read_bin.py --help", ["read_bin.py", "--help"]),
+                         ("convert_bin_to_gtif.py --help", ["convert_bin_to_gtif.py", "--help"])]
+
+IMPORTTIME_REGEX = re.compile(r"import time:\s*(\d+)\s*\|\s*(\d+)\s*\|(\s*)(\S+)")
+
+def time_import(code, repeats=5):
+    """Run "code" in a fresh interpreter with "python -X importtime", repeats times.
+
+    Returns (fastest total import time in seconds, whether osgeo was imported).
+    """
+    best_time = None
+    imports_osgeo = False
+    for i in range(repeats):
+        result = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                                cwd=SCRIPT_DIR, capture_output=True, text=True)
+        if result.returncode != 0:
+            raise RuntimeError("Running '{0}' failed:\n{1}".format(code, result.stderr))
+
+        total_us = 0
+        for match in IMPORTTIME_REGEX.finditer(result.stderr):
+            # Only top-level imports (no extra indent) are summed, since their
+            # cumulative times already include everything they import.
+            if len(match.group(3)) <= 1:
+                total_us += int(match.group(2))
+            if match.group(4).split(".")[0] == "osgeo":
+                imports_osgeo = True
+
+        if best_time is None or total_us/1e6 < best_time:
+            best_time = total_us/1e6
+
+    return best_time, imports_osgeo
+
+def time_command(script_args, repeats=5):
+    """Return the fastest wall-clock time (seconds) of running a script, over "repeats" runs."""
+    best_time = None
+    for i in range(repeats):
+        start_time = time.perf_counter()
+        subprocess.run([sys.executable] + script_args, cwd=SCRIPT_DIR, capture_output=True)
+        elapsed = time.perf_counter() - start_time
+        if best_time is None or elapsed < best_time:
+            best_time = elapsed
+    return best_time
+
+def read_and_parse_args():
+    """Read and parse command-line arguments."""
+    parser = argparse.ArgumentParser(description="Measures the start-up cost of the NSIDC scripts with 'python -X importtime', and shows whether each start-up path imports GDAL (osgeo).")
+    parser.add_argument("-repeats", "-r", type=int, default=5, help="Runs of each measurement. The fastest is reported. (Default: 5)")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = read_and_parse_args()
+
+    print("{0:<42} {1:>12} {2:>14}".format("Import", "Time (ms)", "Imports GDAL"))
+    print("-" * 70)
+    for name, code in IMPORTS_TO_BENCHMARK:
+        try:
+            seconds, imports_osgeo = time_import(code, repeats=args.repeats)
+            print("{0:<42} {1:>12.1f} {2:>14}".format(name, seconds*1000, "yes" if imports_osgeo else "no"))
+        except RuntimeError:
+            print("{0:<42} {1:>12} {2:>14}".format(name, "failed", "n/a"))
+
+    print()
+    print("{0:<42} {1:>12}".format("Command", "Wall (ms)"))
+    print("-" * 55)
+    for name, script_args in COMMANDS_TO_BENCHMARK:
+        print("{0:<42} {1:>12.1f}".format(name, time_command(script_args, repeats=args.repeats)*1000))
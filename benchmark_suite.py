@@ -0,0 +1,299 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Fri Oct 16 22:50:39 2026
+
+A self-contained benchmark of reading, decoding, computing statistics of and writing
+GeoTiffs from NSIDC .bin files, on synthetic files (no downloaded data needed) for every
+combination of hemisphere, resolution, element size, header size and signedness.
+
+Each stage is timed on its own, as well as read_NSIDC_bin_file() and output_bin_to_gtif()
+end to end, and reported as the fastest of several runs, in cells/s and MB/s (of .bin
+file). The results can be saved as JSON and compared against an earlier (baseline) run:
+any stage more than a threshold slower than in the baseline, or a higher peak memory use,
+is reported as a regression and the run exits with status 1. For example:
+
+    $ python benchmark_suite.py -o baseline.json
+    ... change the code ...
+    $ python benchmark_suite.py -o new.json -baseline baseline.json -threshold 0.15
+"""
+import numpy
+import argparse
+import datetime
+import itertools
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+
+from read_bin import read_NSIDC_bin_file, decode_NSIDC_bin_data, get_bin_dtype
+from band_statistics import compute_band_stats
+from convert_bin_to_gtif import output_gtif, output_bin_to_gtif, NSIDC_GRIDSIZES
+from benchmark_gtif_profiles import make_synthetic_tb_grid
+
+BENCHMARK_HEMISPHERES = ("N", "S")
+BENCHMARK_RESOLUTIONS = (25.0, 12.5, 6.25)
+BENCHMARK_ELEMENT_SIZES = (1, 2, 4)
+BENCHMARK_HEADER_SIZES = (0, 300)
+BENCHMARK_SIGNED = (False, True)
+
+# The stages timed for each synthetic file, in order. The GeoTiff stages need GDAL.
+BENCHMARK_STAGES = ("read_bytes",            # open().read() of the whole file
+                    "decode",                # decode_NSIDC_bin_data() of those bytes
+                    "read_NSIDC_bin_file",   # read + decode, end to end
+                    "stats",                 # compute_band_stats() of the decoded grid
+                    "output_gtif",           # writing the decoded grid to a GeoTiff
+                    "output_bin_to_gtif")    # .bin file to GeoTiff, end to end
+GTIF_STAGES = ("output_gtif", "output_bin_to_gtif")
+
+def get_peak_rss_mb():
+    """Return the peak resident memory (MB) this process has used so far, or None if it can't be measured here."""
+    try:
+        import resource
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # In bytes on macOS, kilobytes everywhere else.
+        return max_rss / (1024.**2) if sys.platform == "darwin" else max_rss / 1024.
+    except ImportError:
+        pass
+    try:
+        import psutil
+        return psutil.Process().memory_info().peak_wset / (1024.**2)
+    except (ImportError, AttributeError):
+        return None
+
+def get_benchmark_cases(hemispheres=BENCHMARK_HEMISPHERES,
+                        resolutions=BENCHMARK_RESOLUTIONS,
+                        element_sizes=BENCHMARK_ELEMENT_SIZES,
+                        header_sizes=BENCHMARK_HEADER_SIZES,
+                        signed=BENCHMARK_SIGNED):
+    """Return a list of dictionaries of the read_NSIDC_bin_file() parameters of each synthetic file, one per combination."""
+    cases = []
+    for resolution, hemisphere, element_size, header_size, is_signed in \
+            itertools.product(resolutions, hemispheres, element_sizes, header_sizes, signed):
+        grid_shape = tuple(int(n) for n in NSIDC_GRIDSIZES[(float(resolution), hemisphere)])
+        cases.append({"name": "{0:g}km_{1}_{2}{3}byte_hdr{4}".format(resolution, hemisphere, "s" if is_signed else "u", element_size, header_size),
+                      "hemisphere": hemisphere,
+                      "resolution": float(resolution),
+                      "grid_shape": grid_shape,
+                      "element_size": element_size,
+                      "header_size": header_size,
+                      "signed": is_signed})
+    return cases
+
+def make_synthetic_bin_file(fname, grid_shape, element_size=2, header_size=0, signed=False, byteorder="little", seed=0):
+    """Write a synthetic .bin file of brightness-temperature-like values (see make_synthetic_tb_grid()).
+
+    Values are in tenths of a Kelvin (1-byte files, in Kelvin), offset to straddle zero
+    for signed files, with 0 in a patch of "land". The header is zeros.
+    """
+    raw = make_synthetic_tb_grid(grid_shape, return_type=numpy.int32, seed=seed)
+    if element_size == 1:
+        raw = numpy.clip(raw // 10, 0, 250)
+        if signed:
+            raw = raw - 125
+    elif signed:
+        raw = raw - 1300
+
+    with open(fname, "wb") as f:
+        f.write(bytes(header_size))
+        f.write(raw.astype(get_bin_dtype(element_size=element_size, signed=signed, byteorder=byteorder)).tobytes())
+
+def _time_best(function, repeats):
+    """Run function() "repeats" times. Returns (fastest seconds, median seconds, the last return value)."""
+    times = []
+    value = None
+    for i in range(repeats):
+        value = None
+        start_time = time.perf_counter()
+        value = function()
+        times.append(time.perf_counter() - start_time)
+    return min(times), float(numpy.median(times)), value
+
+def run_benchmarks(cases=None, repeats=5, work_dir=None, verbose=True):
+    """Generate each synthetic .bin file and time each of the BENCHMARK_STAGES on it.
+
+    cases = From get_benchmark_cases(). Defaults to all of them.
+
+    repeats = Times to run each stage. The fastest (and median) time is reported.
+
+    work_dir = Directory to write the synthetic files and GeoTiffs in. Defaults to a
+               temporary directory, deleted afterward.
+
+    Returns: A dictionary of the run's results, as saved by save_benchmark_results():
+             "created", "python", "numpy", "gdal" (version, or None if GDAL isn't
+             installed, in which case the GeoTiff stages are left out), "platform",
+             "repeats", "peak_rss_mb", and "results", a list of one dictionary per case
+             per stage with the case's parameters and "stage", "seconds", "median_seconds",
+             "cells_per_s", "mb_per_s" and "peak_rss_mb" (of the process, so far).
+    """
+    if cases is None:
+        cases = get_benchmark_cases()
+    try:
+        from osgeo import gdal
+        gdal_version = gdal.__version__
+    except ImportError:
+        gdal_version = None
+        if verbose:
+            print("GDAL isn't installed. Skipping the GeoTiff stages.")
+
+    cleanup = work_dir is None
+    if cleanup:
+        work_dir = tempfile.mkdtemp()
+    elif not os.path.exists(work_dir):
+        os.makedirs(work_dir)
+
+    results = []
+    try:
+        for case in cases:
+            bin_file = os.path.join(work_dir, case["name"] + ".bin")
+            gtif_file = os.path.join(work_dir, case["name"] + ".tif")
+            make_synthetic_bin_file(bin_file, case["grid_shape"], element_size=case["element_size"],
+                                    header_size=case["header_size"], signed=case["signed"])
+            file_bytes = os.path.getsize(bin_file)
+            n_cells = case["grid_shape"][0] * case["grid_shape"][1]
+            read_kwargs = dict(grid_shape=case["grid_shape"],
+                               header_size=case["header_size"],
+                               element_size=case["element_size"],
+                               signed=case["signed"],
+                               return_type=float,
+                               multiplier=0.1)
+
+            def read_bytes():
+                with open(bin_file, "rb") as f:
+                    return f.read()
+            raw_data = read_bytes()
+            array = decode_NSIDC_bin_data(raw_data, **read_kwargs)
+
+            stage_functions = {"read_bytes": read_bytes,
+                               "decode": lambda: decode_NSIDC_bin_data(raw_data, **read_kwargs),
+                               "read_NSIDC_bin_file": lambda: read_NSIDC_bin_file(bin_file, **read_kwargs),
+                               "stats": lambda: compute_band_stats(array, nodata=0),
+                               "output_gtif": lambda: output_gtif(array, gtif_file, resolution=case["resolution"],
+                                                                  hemisphere=case["hemisphere"], nodata=0, verbose=False),
+                               "output_bin_to_gtif": lambda: output_bin_to_gtif(bin_file, gtif_file, resolution=case["resolution"],
+                                                                                hemisphere=case["hemisphere"], nodata=0, verbose=False,
+                                                                                **dict([(k, v) for k, v in read_kwargs.items() if k != "grid_shape"]))}
+
+            for stage in BENCHMARK_STAGES:
+                if stage in GTIF_STAGES and gdal_version is None:
+                    continue
+                seconds, median_seconds, value = _time_best(stage_functions[stage], repeats)
+                value = None
+                result = dict([(key, case[key]) for key in ("name", "hemisphere", "resolution", "element_size", "header_size", "signed")])
+                result.update({"stage": stage,
+                               "cells": n_cells,
+                               "file_bytes": file_bytes,
+                               "seconds": seconds,
+                               "median_seconds": median_seconds,
+                               "cells_per_s": n_cells / seconds if seconds > 0 else None,
+                               "mb_per_s": file_bytes / (1024.**2) / seconds if seconds > 0 else None,
+                               "peak_rss_mb": get_peak_rss_mb()})
+                results.append(result)
+                if verbose:
+                    print_benchmark_result(result)
+
+            raw_data = array = None
+            for fname in (bin_file, gtif_file):
+                if os.path.exists(fname):
+                    os.remove(fname)
+    finally:
+        if cleanup:
+            shutil.rmtree(work_dir)
+
+    return {"created": datetime.datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "numpy": numpy.__version__,
+            "gdal": gdal_version,
+            "platform": platform.platform(),
+            "repeats": repeats,
+            "peak_rss_mb": get_peak_rss_mb(),
+            "results": results}
+
+def print_benchmark_result(result):
+    """Print one line of benchmark results."""
+    print("{0:<24} {1:<20} {2:>10.3f} ms {3:>9.1f} Mcells/s {4:>9.1f} MB/s".format(
+          result["name"], result["stage"], result["seconds"]*1000.,
+          (result["cells_per_s"] or 0) / 1e6, result["mb_per_s"] or 0))
+
+def save_benchmark_results(run, json_file):
+    """Save the results of run_benchmarks() as JSON."""
+    with open(json_file, "w") as f:
+        json.dump(run, f, indent=1)
+
+def load_benchmark_results(json_file):
+    """Load results saved with save_benchmark_results()."""
+    with open(json_file, "r") as f:
+        return json.load(f)
+
+def compare_benchmark_results(run, baseline, threshold=0.10, min_seconds=0.001):
+    """Compare a run of run_benchmarks() to a baseline run, stage by stage.
+
+    threshold = How much slower (as a fraction, 0.10 = 10%) a stage can be than in the
+                baseline before it's a regression. The peak memory use of the whole run
+                is held to the same threshold, if both runs benchmarked the same files.
+
+    min_seconds = Stages that take less than this in both runs are too short to time
+                  reliably, so aren't compared.
+
+    Returns: A list of regressions, each a (name, stage, baseline value, new value, ratio)
+             tuple. ("peak_rss_mb" is the stage of a memory regression.) Cases or stages
+             not in both runs are ignored.
+    """
+    baseline_seconds = dict([((r["name"], r["stage"]), r["seconds"]) for r in baseline["results"]])
+
+    regressions = []
+    for result in run["results"]:
+        old_seconds = baseline_seconds.get((result["name"], result["stage"]))
+        if old_seconds is None or old_seconds <= 0 or max(old_seconds, result["seconds"]) < min_seconds:
+            continue
+        ratio = result["seconds"] / old_seconds
+        if ratio > 1.0 + threshold:
+            regressions.append((result["name"], result["stage"], old_seconds, result["seconds"], ratio))
+
+    same_cases = set([r["name"] for r in run["results"]]) == set([r["name"] for r in baseline["results"]])
+    if same_cases and run.get("peak_rss_mb") and baseline.get("peak_rss_mb"):
+        ratio = run["peak_rss_mb"] / baseline["peak_rss_mb"]
+        if ratio > 1.0 + threshold:
+            regressions.append(("(whole run)", "peak_rss_mb", baseline["peak_rss_mb"], run["peak_rss_mb"], ratio))
+
+    return regressions
+
+def read_and_parse_args():
+    """Read and parse command-line arguments."""
+    parser = argparse.ArgumentParser(description="Benchmark reading, decoding, statistics and GeoTiff writing on synthetic NSIDC .bin files of every hemisphere, resolution, element size, header size and signedness. Optionally compare to a baseline run, and exit with status 1 if anything got slower.")
+    parser.add_argument("-repeats", "-r", type=int, default=5, help="Times to run each stage. The fastest is reported. (Default: 5)")
+    parser.add_argument("-output", "-o", type=str, default=None, help="Save the results to this JSON file.")
+    parser.add_argument("-baseline", "-b", type=str, default=None, help="Compare the results to those in this JSON file (from an earlier -output).")
+    parser.add_argument("-threshold", "-t", type=float, default=0.10, help="With -baseline, how much slower a stage can get (as a fraction) before it's a regression. (Default: 0.10)")
+    parser.add_argument("-min_seconds", type=float, default=0.001, help="With -baseline, stages faster than this (in both runs) are too short to time reliably, and aren't compared. (Default: 0.001)")
+    parser.add_argument("-resolutions", type=float, nargs="+", default=list(BENCHMARK_RESOLUTIONS), help="Grid resolutions (km) to benchmark. (Default: 25 12.5 6.25)")
+    parser.add_argument("-hemispheres", type=str, nargs="+", default=list(BENCHMARK_HEMISPHERES), help="Hemispheres to benchmark. (Default: N S)")
+    parser.add_argument("-element_sizes", type=int, nargs="+", default=list(BENCHMARK_ELEMENT_SIZES), help="Element sizes (bytes) to benchmark. (Default: 1 2 4)")
+    parser.add_argument("-work_dir", type=str, default=None, help="Directory to write the synthetic files in. (Default: a temporary directory, deleted afterward.)")
+    parser.add_argument("--quiet", "-q", action="store_true", default=False, help="Don't print each result as it's measured.")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = read_and_parse_args()
+
+    cases = get_benchmark_cases(hemispheres=[h.strip().upper() for h in args.hemispheres],
+                                resolutions=args.resolutions,
+                                element_sizes=args.element_sizes)
+    run = run_benchmarks(cases, repeats=args.repeats, work_dir=args.work_dir, verbose=not args.quiet)
+    print("{0} stages timed. Peak memory use: {1}".format(
+          len(run["results"]), "n/a" if run["peak_rss_mb"] is None else "{0:0.1f} MB".format(run["peak_rss_mb"])))
+
+    if args.output is not None:
+        save_benchmark_results(run, args.output)
+
+    if args.baseline is not None:
+        regressions = compare_benchmark_results(run, load_benchmark_results(args.baseline),
+                                                threshold=args.threshold, min_seconds=args.min_seconds)
+        for name, stage, old_value, new_value, ratio in regressions:
+            print("REGRESSION {0} {1}: {2:0.4g} -> {3:0.4g} ({4:+0.0%})".format(name, stage, old_value, new_value, ratio - 1.0))
+        if len(regressions) > 0:
+            print("{0} regressions beyond {1:0.0%} of the baseline.".format(len(regressions), args.threshold))
+            sys.exit(1)
+        print("No regressions beyond {0:0.0%} of the baseline.".format(args.threshold))
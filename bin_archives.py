@@ -0,0 +1,274 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Fri Oct 16 22:44:54 2026
+
+Reading .bin files straight out of gzip (.gz), zip (.zip) and tar (.tar, .tar.gz,
+.tgz, .tar.bz2, .tar.xz) archives, without extracting them to disk.
+
+A file inside an archive is named "archive::member", e.g.
+
+    "nsidc-0051_1987.tar.gz::nt_19870101_f08_v01_n.bin"
+
+A .gz file (or a zip or tar archive holding a single .bin file) can also be named on its
+own. Each member is decompressed into one buffer of the member's size, allocated up front,
+that the reader then decodes in place.
+"""
+import gzip
+import os
+import struct
+import tarfile
+import zipfile
+
+# Separates an archive's name from the name of a file inside it.
+ARCHIVE_MEMBER_SEPARATOR = "::"
+
+# File extensions of each type of archive.
+ARCHIVE_EXTENSIONS = {"tar": (".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tbz2", ".tar.xz", ".txz"),
+                      "zip": (".zip",),
+                      "gz": (".gz",)}
+
+def get_archive_type(archive):
+    """Return "tar", "zip" or "gz" for an archive file name, or None if it's not an archive."""
+    name = archive.lower()
+    # Check tar first, since ".tar.gz" also ends in ".gz".
+    for archive_type in ("tar", "zip", "gz"):
+        if name.endswith(ARCHIVE_EXTENSIONS[archive_type]):
+            return archive_type
+    return None
+
+def is_archive_path(path):
+    """Return True if a path is an archive, or a file inside one ("archive::member")."""
+    return isinstance(path, str) and (ARCHIVE_MEMBER_SEPARATOR in path or get_archive_type(path) is not None)
+
+def split_archive_path(path):
+    """Split "archive::member" into (archive, member). A path without a member gives (path, None)."""
+    if ARCHIVE_MEMBER_SEPARATOR in path:
+        archive, member = path.split(ARCHIVE_MEMBER_SEPARATOR, 1)
+        return archive, member
+    return path, None
+
+def get_member_name(path):
+    """Return the file name of the .bin file a path refers to, inside an archive or not.
+
+    e.g. "a.tar::2020/nt_20201231_f17_v1.1_n.bin" and "nt_20201231_f17_v1.1_n.bin.gz"
+    both give "nt_20201231_f17_v1.1_n.bin".
+    """
+    archive, member = split_archive_path(path)
+    if member is not None:
+        return os.path.basename(member)
+    if get_archive_type(archive) == "gz":
+        return os.path.basename(archive)[:-len(".gz")]
+    return os.path.basename(archive)
+
+def _read_into_buffer(stream, size):
+    """Read a stream into a new buffer of "size" bytes, filling it in place. Returns the buffer (a bytearray).
+
+    If the stream turns out to be longer than "size" (e.g. a gzip file over 4 GB, whose
+    stored size wraps around), the rest is appended.
+    """
+    buffer = bytearray(size)
+    view = memoryview(buffer)
+    n_read = 0
+    while n_read < size:
+        n = stream.readinto(view[n_read:])
+        if not n:
+            raise EOFError("Archive member ended after {0} of {1} bytes.".format(n_read, size))
+        n_read += n
+    view.release()
+
+    rest = stream.read()
+    if len(rest) > 0:
+        buffer.extend(rest)
+    return buffer
+
+def _gzip_uncompressed_size(gz_file):
+    """The uncompressed size of a gzip file, from its trailer (modulo 4 GB)."""
+    with open(gz_file, "rb") as f:
+        f.seek(-4, os.SEEK_END)
+        return struct.unpack("<I", f.read(4))[0]
+
+def read_archive_member(path):
+    """Read one .bin file from inside an archive into memory, without extracting it to disk.
+
+    path = "archive::member", or just the archive if it's a .gz file, or a zip or tar
+           archive holding just one .bin file.
+
+    Returns: The uncompressed contents of the file, as a bytearray.
+    """
+    archive, member = split_archive_path(path)
+    archive_type = get_archive_type(archive)
+    if archive_type is None:
+        raise ValueError("{0} is not a .tar, .zip or .gz archive.".format(archive))
+
+    if archive_type == "gz":
+        if member is not None and member != get_member_name(archive):
+            raise KeyError("{0} only holds {1}, not {2}.".format(archive, get_member_name(archive), member))
+        with gzip.open(archive, "rb") as f:
+            return _read_into_buffer(f, _gzip_uncompressed_size(archive))
+
+    elif archive_type == "zip":
+        with zipfile.ZipFile(archive) as zf:
+            if member is None:
+                member = _get_only_member(archive, [info.filename for info in zf.infolist() if not info.is_dir()])
+            info = zf.getinfo(member)
+            with zf.open(info) as f:
+                return _read_into_buffer(f, info.file_size)
+
+    else:
+        with tarfile.open(archive, "r:*") as tf:
+            if member is None:
+                member = _get_only_member(archive, [info.name for info in tf.getmembers() if info.isfile()])
+            info = tf.getmember(member)
+            with tf.extractfile(info) as f:
+                return _read_into_buffer(f, info.size)
+
+def _get_only_member(archive, member_names):
+    """Return the one .bin file in an archive, or raise ValueError if there isn't exactly one."""
+    bin_members = [name for name in member_names if name.lower().endswith(".bin")]
+    if len(bin_members) != 1:
+        raise ValueError("{0} holds {1} .bin files. Name one as '{0}{2}member.bin'.".format(
+                         archive, len(bin_members), ARCHIVE_MEMBER_SEPARATOR))
+    return bin_members[0]
+
+def list_archive_members(archive, extension=".bin", with_sizes=False):
+    """Return the names ("archive::member") of every file ending in "extension" in an archive, in the order they're stored.
+
+    with_sizes = If True, return (name, uncompressed size in bytes) tuples instead.
+
+    (This reads a zip archive's directory, but all the way through a tar archive. To read
+    every file of a compressed tar archive, iter_archive_members() is much faster than
+    reading each of these one at a time.)
+    """
+    archive_type = get_archive_type(archive)
+    if archive_type is None:
+        raise ValueError("{0} is not a .tar, .zip or .gz archive.".format(archive))
+
+    if archive_type == "gz":
+        if not get_member_name(archive).lower().endswith(extension.lower()):
+            return []
+        return [(archive, _gzip_uncompressed_size(archive))] if with_sizes else [archive]
+    elif archive_type == "zip":
+        with zipfile.ZipFile(archive) as zf:
+            members = [(info.filename, info.file_size) for info in zf.infolist() if not info.is_dir()]
+    else:
+        with tarfile.open(archive, "r:*") as tf:
+            members = [(info.name, info.size) for info in tf.getmembers() if info.isfile()]
+
+    members = [(archive + ARCHIVE_MEMBER_SEPARATOR + name, size) for name, size in members
+               if name.lower().endswith(extension.lower())]
+    return members if with_sizes else [name for name, size in members]
+
+def iter_archive_members(archive, extension=".bin"):
+    """Read every file ending in "extension" from an archive, in the order they're stored.
+
+    The archive is opened once and read front to back (tar archives as a stream, with no
+    seeking), so a whole compressed tarball is only decompressed once.
+
+    Yields: ("archive::member", contents as a bytearray) for each file.
+    """
+    archive_type = get_archive_type(archive)
+    if archive_type is None:
+        raise ValueError("{0} is not a .tar, .zip or .gz archive.".format(archive))
+
+    if archive_type == "gz":
+        if get_member_name(archive).lower().endswith(extension.lower()):
+            with gzip.open(archive, "rb") as f:
+                yield archive, _read_into_buffer(f, _gzip_uncompressed_size(archive))
+
+    elif archive_type == "zip":
+        with zipfile.ZipFile(archive) as zf:
+            for info in zf.infolist():
+                if info.is_dir() or not info.filename.lower().endswith(extension.lower()):
+                    continue
+                with zf.open(info) as f:
+                    yield archive + ARCHIVE_MEMBER_SEPARATOR + info.filename, _read_into_buffer(f, info.file_size)
+
+    else:
+        # "r|*" reads the tar archive as a stream, one member after another.
+        with tarfile.open(archive, "r|*") as tf:
+            for info in tf:
+                if not info.isfile() or not info.name.lower().endswith(extension.lower()):
+                    continue
+                with tf.extractfile(info) as f:
+                    yield archive + ARCHIVE_MEMBER_SEPARATOR + info.name, _read_into_buffer(f, info.size)
+
+
+def testing_archives():
+    """Check that .bin files read out of .gz, .zip and .tar archives decode the same as the plain files. Raises AssertionError on a mismatch.
+
+    Writes small synthetic .bin files (with a 300-byte header), packs them into each type
+    of archive, and decodes every member with read_NSIDC_bin_file() (as "archive::member",
+    and as the archive on its own where it holds one file) and iter_archive_members().
+    """
+    import io
+    import shutil
+    import tempfile
+    import numpy
+    # Imported here, since read_bin imports this module.
+    from read_bin import read_NSIDC_bin_file, decode_NSIDC_bin_data
+
+    kwargs = dict(grid_shape=(20,16), header_size=300, element_size=1, return_type=int)
+    random_state = numpy.random.RandomState(0)
+    tempdir = tempfile.mkdtemp()
+    try:
+        bin_names = ["nt_1987070{0}_f08_v01_n.bin".format(day) for day in (1,2,3)]
+        bin_files = [os.path.join(tempdir, name) for name in bin_names]
+        for bin_file in bin_files:
+            random_state.randint(0, 256, size=300 + 20*16).astype(numpy.uint8).tofile(bin_file)
+        expected = dict((name, read_NSIDC_bin_file(bin_file, **kwargs)) for name, bin_file in zip(bin_names, bin_files))
+
+        archives = []
+        gz_file = bin_files[0] + ".gz"
+        with open(bin_files[0], "rb") as f_in, gzip.open(gz_file, "wb") as f_out:
+            shutil.copyfileobj(f_in, f_out)
+        archives.append((gz_file, bin_names[:1]))
+
+        zip_file = os.path.join(tempdir, "nt_1987.zip")
+        with zipfile.ZipFile(zip_file, "w", zipfile.ZIP_DEFLATED) as zf:
+            zf.writestr("README.txt", "Not a .bin file.")
+            for name, bin_file in zip(bin_names, bin_files):
+                zf.write(bin_file, arcname=name)
+        archives.append((zip_file, bin_names))
+
+        for extension, mode in ((".tar", "w"), (".tar.gz", "w:gz"), (".tar.bz2", "w:bz2")):
+            tar_file = os.path.join(tempdir, "nt_1987" + extension)
+            with tarfile.open(tar_file, mode) as tf:
+                info = tarfile.TarInfo("README.txt")
+                info.size = 16
+                tf.addfile(info, io.BytesIO(b"Not a .bin file."))
+                for name, bin_file in zip(bin_names, bin_files):
+                    tf.add(bin_file, arcname=name)
+            archives.append((tar_file, bin_names))
+
+        # A zip archive holding one .bin file can be named on its own.
+        single_zip_file = os.path.join(tempdir, "nt_19870702.zip")
+        with zipfile.ZipFile(single_zip_file, "w") as zf:
+            zf.write(bin_files[1], arcname=bin_names[1])
+        archives.append((single_zip_file, bin_names[1:2]))
+
+        for archive, member_names in archives:
+            paths = list_archive_members(archive)
+            if get_archive_type(archive) == "gz":
+                assert paths == [archive], (archive, paths)
+            else:
+                assert paths == [archive + ARCHIVE_MEMBER_SEPARATOR + name for name in member_names], (archive, paths)
+
+            for path, name in zip(paths, member_names):
+                assert get_member_name(path) == name, (path, get_member_name(path))
+                array = read_NSIDC_bin_file(path, **kwargs)
+                assert array.tobytes() == expected[name].tobytes(), path
+
+            if len(member_names) == 1:
+                array = read_NSIDC_bin_file(archive, **kwargs)
+                assert array.tobytes() == expected[member_names[0]].tobytes(), archive
+
+            n_members = 0
+            for (path, raw_data), name in zip(iter_archive_members(archive), member_names):
+                array = decode_NSIDC_bin_data(raw_data, fname=path, **kwargs)
+                assert array.tobytes() == expected[name].tobytes(), path
+                n_members += 1
+            assert n_members == len(member_names), (archive, n_members)
+    finally:
+        shutil.rmtree(tempdir)
+
+    print(len(archives), "archives match the plain .bin files.")
@@ -0,0 +1,335 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Fri Oct 16 22:29:08 2026
+"""
+import numpy
+import argparse
+import os
+import concurrent.futures
+
+from read_bin import NSIDCBinFile, scale_raw_array
+from nsidc_catalog import select_catalog_files, parse_catalog_selection
+from convert_bin_to_gtif import output_gtif, \
+                               resolve_hemisphere_and_resolution, \
+                               resolve_multiplier, \
+                               find_bin_files, \
+                               NSIDC_GRIDSIZES
+
+# Composite statistics that can be written out, in the default band order.
+COMPOSITE_STATISTICS = ("mean", "min", "max", "count", "std")
+
+class CompositeAccumulator(object):
+    """Running per-pixel sum, sum of squares, min, max and valid-count over a series of same-grid arrays.
+
+    Add grids one at a time with update(). Memory use is a handful of grid-sized
+    arrays, however many grids are added. Accumulators built from separate sets of
+    files (e.g. in separate processes) can be combined with merge().
+    """
+    def __init__(self, grid_shape):
+        grid_shape = tuple(int(n) for n in grid_shape)
+        self.grid_shape = grid_shape
+        self.n_grids = 0
+        self.sum = numpy.zeros(grid_shape, dtype=numpy.float64)
+        self.sum_sq = numpy.zeros(grid_shape, dtype=numpy.float64)
+        self.min = numpy.full(grid_shape, numpy.inf, dtype=numpy.float64)
+        self.max = numpy.full(grid_shape, -numpy.inf, dtype=numpy.float64)
+        self.count = numpy.zeros(grid_shape, dtype=numpy.int32)
+
+    def update(self, array, valid=None):
+        """Add one grid of values. Only pixels where "valid" is True (and the value isn't NaN) are counted.
+
+        Returns self.
+        """
+        if array.shape != self.grid_shape:
+            raise ValueError("Array shape {0} does not match the composite grid {1}.".format(array.shape, self.grid_shape))
+
+        if numpy.issubdtype(array.dtype, numpy.floating):
+            valid = ~numpy.isnan(array) if valid is None else (valid & ~numpy.isnan(array))
+        if valid is None:
+            valid = True
+
+        numpy.add(self.sum, array, out=self.sum, where=valid)
+        numpy.add(self.sum_sq, numpy.square(array, dtype=numpy.float64), out=self.sum_sq, where=valid)
+        numpy.fmin(self.min, array, out=self.min, where=valid)
+        numpy.fmax(self.max, array, out=self.max, where=valid)
+        numpy.add(self.count, valid, out=self.count, casting="unsafe")
+        self.n_grids += 1
+        return self
+
+    def merge(self, other):
+        """Add the grids accumulated in another CompositeAccumulator (on the same grid) to this one. Returns self."""
+        if other.grid_shape != self.grid_shape:
+            raise ValueError("Can't merge composites on different grids: {0} and {1}".format(self.grid_shape, other.grid_shape))
+        self.sum += other.sum
+        self.sum_sq += other.sum_sq
+        numpy.fmin(self.min, other.min, out=self.min)
+        numpy.fmax(self.max, other.max, out=self.max)
+        self.count += other.count
+        self.n_grids += other.n_grids
+        return self
+
+    def get_statistic(self, statistic, nodata=numpy.nan):
+        """Return one composite statistic as a grid: "mean", "min", "max", "count" or "std".
+
+        Pixels with no valid values are set to "nodata" (except in the "count" grid, where they're zero.)
+        """
+        statistic = statistic.strip().lower()
+        if statistic == "count":
+            return self.count.copy()
+
+        empty = (self.count == 0)
+        with numpy.errstate(invalid="ignore", divide="ignore"):
+            if statistic == "mean":
+                result = self.sum / self.count
+            elif statistic == "min":
+                result = self.min.copy()
+            elif statistic == "max":
+                result = self.max.copy()
+            elif statistic == "std":
+                mean = self.sum / self.count
+                # Clip tiny negative variances from floating-point round-off.
+                result = numpy.sqrt(numpy.maximum(self.sum_sq / self.count - mean**2, 0.0))
+            else:
+                raise ValueError("Unknown composite statistic '{0}'. Must be one of {1}".format(statistic, COMPOSITE_STATISTICS))
+
+        result[empty] = numpy.nan if nodata is None else nodata
+        return result
+
+def composite_bins(bin_files,
+                   element_size=2,
+                   header_size=0,
+                   resolution=None,
+                   hemisphere=None,
+                   nodata=None,
+                   flag_values=(),
+                   signed=False,
+                   multiplier="auto",
+                   return_type=float,
+                   byteorder="little",
+                   jobs=1,
+                   verbose=True):
+    """Accumulate per-pixel composite statistics over many same-grid NSIDC .bin files.
+
+    Files are read one at a time into a CompositeAccumulator, so memory use doesn't
+    grow with the number of files.
+
+    bin_files = A list of .bin files, glob patterns or directories. (See find_bin_files().)
+
+    nodata = Values (after the multiplier is applied) to leave out of the composites.
+
+    flag_values = Raw values, as stored in the file (before the multiplier is applied),
+                  to leave out of the composites. For instance, NSIDC-0051 uses
+                  251-255 for the pole hole, coast, land and missing data.
+
+    jobs = Number of processes to use. The files are split into this many contiguous
+           subsets, each accumulated in its own process, and the results merged.
+           If None or 0, uses one process per CPU.
+
+    The rest of the parameters are the same as output_bin_to_gtif(). All the files
+    must be on the same grid.
+
+    Returns: A CompositeAccumulator.
+    """
+    bin_files = find_bin_files(bin_files, expand_archives=True)
+    if len(bin_files) == 0:
+        raise ValueError("No .bin files to composite.")
+
+    hemisphere, resolution = resolve_hemisphere_and_resolution(bin_files[0], hemisphere=hemisphere, resolution=resolution)
+    read_kwargs = dict(grid_shape=NSIDC_GRIDSIZES[(resolution, hemisphere)],
+                       header_size=header_size,
+                       element_size=element_size,
+                       return_type=return_type,
+                       signed=signed,
+                       multiplier=resolve_multiplier(multiplier, return_type),
+                       byteorder=byteorder)
+
+    if not jobs:
+        jobs = os.cpu_count()
+    jobs = min(jobs, len(bin_files))
+
+    if jobs == 1:
+        return _accumulate_bins(bin_files, read_kwargs, nodata, flag_values, verbose)
+
+    # Split the files into contiguous subsets, one per process, and merge their accumulators.
+    subsets = [list(subset) for subset in numpy.array_split(numpy.array(bin_files, dtype=object), jobs)]
+    accumulator = None
+    with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = [executor.submit(_accumulate_bins, subset, read_kwargs, nodata, flag_values, verbose) for subset in subsets]
+        for future in concurrent.futures.as_completed(futures):
+            if accumulator is None:
+                accumulator = future.result()
+            else:
+                accumulator.merge(future.result())
+
+    return accumulator
+
+def _accumulate_bins(bin_files, read_kwargs, nodata, flag_values, verbose):
+    """Read a list of .bin files, one at a time, into a new CompositeAccumulator."""
+    accumulator = CompositeAccumulator(read_kwargs["grid_shape"])
+    flag_values = numpy.array(list(flag_values) if flag_values is not None else [])
+
+    for bin_file in bin_files:
+        bin_grid = NSIDCBinFile(bin_file, **read_kwargs)
+        raw_array = numpy.asarray(bin_grid.raw)
+
+        valid = None
+        if len(flag_values) > 0:
+            valid = ~numpy.isin(raw_array, flag_values)
+        array = scale_raw_array(raw_array, return_type=bin_grid.return_type, multiplier=bin_grid.multiplier)
+        if nodata is not None:
+            valid = (array != nodata) if valid is None else (valid & (array != nodata))
+
+        accumulator.update(array, valid=valid)
+
+        raw_array = array = valid = None
+        bin_grid.close()
+
+        if verbose:
+            print(bin_file, "added to composite.")
+
+    return accumulator
+
+def output_composite_gtif(accumulator,
+                          gtif_file,
+                          resolution,
+                          hemisphere,
+                          statistics=("mean", "min", "max", "count"),
+                          nodata=numpy.nan,
+                          verbose=True,
+                          **gtif_kwargs):
+    """Write composite statistics to a multi-band geotiff, one band per statistic (in order), via output_gtif().
+
+    nodata = Value for pixels with no valid data. Defaults to NaN.
+
+    Other keyword arguments (profile, compress, etc) are passed along to output_gtif().
+    """
+    bands = numpy.array([accumulator.get_statistic(stat, nodata=nodata) for stat in statistics], dtype=numpy.float64)
+    return output_gtif(bands,
+                       gtif_file,
+                       resolution=resolution,
+                       hemisphere=hemisphere,
+                       nodata=nodata,
+                       verbose=verbose,
+                       band_descriptions=list(statistics),
+                       **gtif_kwargs)
+
+def testing_composite():
+    """Check composite_bins() against numpy over the whole stack at once. Raises AssertionError on a mismatch.
+
+    Writes a few small synthetic .bin files, with flag values and nodata values, and
+    checks that accumulating them in one process, split among several processes, or
+    in separate accumulators merge()'d afterward all give the same composites as
+    numpy's nan-aware functions on the whole (files, rows, cols) stack.
+    """
+    import tempfile
+    import shutil
+    import warnings
+
+    grid_shape = NSIDC_GRIDSIZES[(25.0, "S")]
+    random_state = numpy.random.RandomState(0)
+    raw_stack = random_state.randint(0, 256, size=(7,) + tuple(int(n) for n in grid_shape)).astype(numpy.uint8)
+    raw_stack[:, :20, :20] = 255
+
+    tempdir = tempfile.mkdtemp()
+    try:
+        bin_files = []
+        for i, raw_array in enumerate(raw_stack):
+            bin_files.append(os.path.join(tempdir, "nt_198701{0:02d}_f08_v1.1_s.bin".format(i+1)))
+            raw_array.tofile(bin_files[-1])
+        kwargs = dict(element_size=1, hemisphere="S", resolution=25, flag_values=(251, 252, 253, 254, 255),
+                      nodata=0.0, multiplier=0.4, return_type=float, verbose=False)
+
+        # The expected composites, from the whole stack at once. (Pixels with no valid
+        # values are all-NaN slices, which numpy warns about.)
+        stack = raw_stack * 0.4
+        stack[(raw_stack >= 251) | (stack == 0)] = numpy.nan
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)
+            expected = {"mean": numpy.nanmean(stack, axis=0),
+                        "min": numpy.nanmin(stack, axis=0),
+                        "max": numpy.nanmax(stack, axis=0),
+                        "std": numpy.nanstd(stack, axis=0),
+                        "count": numpy.sum(~numpy.isnan(stack), axis=0)}
+
+        merged = composite_bins(bin_files[:3], **kwargs).merge(composite_bins(bin_files[3:], **kwargs))
+        for accumulator in (composite_bins(bin_files, jobs=1, **kwargs),
+                            composite_bins(bin_files, jobs=3, **kwargs),
+                            merged):
+            assert accumulator.n_grids == len(bin_files), accumulator.n_grids
+            for statistic in COMPOSITE_STATISTICS:
+                result = accumulator.get_statistic(statistic)
+                assert numpy.allclose(result, expected[statistic], equal_nan=True), statistic
+    finally:
+        shutil.rmtree(tempdir)
+
+    print("Composite checks passed.")
+
+def read_and_parse_args():
+    """Read and parse command-line arguments."""
+    parser = argparse.ArgumentParser(description="Computes per-pixel composites (mean, min, max, count, std) over many NSIDC flat binary (.bin) files on the same grid, e.g. a monthly or climatological mean, and writes them to a multi-band geo-referenced TIF (.tif). Files are streamed one at a time, so memory use doesn't grow with the number of files.")
+    parser.add_argument("src", type=str, nargs="*", help="Source .bin files, glob patterns (quoted, e.g. \"nt_198701*_n.bin\") and/or directories (searched recursively for .bin files and archives). Files inside .gz, .zip or .tar archives can be named as \"archive.tar::file.bin\".")
+    parser.add_argument("-dest", type=str, required=True, help="Destination file (.tif).")
+    parser.add_argument("-catalog", type=str, default=None, help="A catalog database of .bin files (see nsidc_catalog.py) to select the source files from, with -select, instead of (or as well as) listing them.")
+    parser.add_argument("-select", type=str, nargs="*", default=[], help="With -catalog, the key=value fields of the files to composite, e.g. -select product=0051 hemisphere=N start=1987-01-01 end=1987-01-31")
+    parser.add_argument("-stats", type=str, default="mean,min,max,count", help="Comma-separated composite statistics to write, one band each, from: mean, min, max, count, std. (Default: mean,min,max,count)")
+    parser.add_argument("-flags", type=int, nargs="*", default=[], help="Raw values in the files (before the multiplier) to leave out, e.g. -flags 251 252 253 254 255 for NSIDC-0051 pole-hole, coast, land and missing values.")
+    parser.add_argument("-jobs", "-j", type=int, default=1, help="Number of processes to split the files among. 0 uses one process per CPU. (Default: 1)")
+    parser.add_argument("-resolution", "-r", type=float, default=None, help="Resolution (km): 6.25, 12.5, or 25. If omitted, it is interpreted from the file names. If cannot be interpreted, defaults to 25 km.")
+    parser.add_argument("-hemisphere", type=str, default=None, help="Hemisphere: one letter, N or S. If omitted, it is interpreted from the file names. If cannot be interpreted, defaults to 'S'.")
+    parser.add_argument("-nodata", "-nd", type=float, default=None, help="Nodata value in the files, left out of the composites. (Default: None)")
+    parser.add_argument("-header_size", "-hs", type=int, default=0, help="Size of .bin file header (in bytes). (Default: 0)")
+    parser.add_argument("-element_size", "-es", type=int, default=2, help="Size of each numerical .bin data element (in bytes). Typically 1 or 2 for NSIDC files. (Default: 2)")
+    parser.add_argument("-multiplier","-m", type=str, default="auto", help="Use a multiplier. With 'auto', defaults to 0.1 (2731 -> 273.1).")
+    parser.add_argument("-byteorder", "-bo", type=str, default="little", help="Byte order of each .bin data element: 'little' or 'big'. (Default: little)")
+    parser.add_argument("-profile", "-p", type=str, default="plain", help="GeoTiff encoding: 'plain', 'tiled', or 'cog'. (Default: plain)")
+    parser.add_argument("--signed", "-s", action="store_true", default=False, help="If set, read binary data as signed numbers. (Default: unsigned)")
+    parser.add_argument("--verbose", "-v", action="store_true", default=False, help="Increase output verbosity.")
+
+    args = parser.parse_args()
+    if len(args.src) == 0 and args.catalog is None:
+        parser.error("the following arguments are required: src (unless selecting files from a -catalog)")
+
+    return args
+
+if __name__ == "__main__":
+    args = read_and_parse_args()
+
+    statistics = [stat.strip().lower() for stat in args.stats.split(",") if len(stat.strip()) > 0]
+    for stat in statistics:
+        if stat not in COMPOSITE_STATISTICS:
+            raise ValueError("Unknown composite statistic '{0}'. Must be one of {1}".format(stat, COMPOSITE_STATISTICS))
+
+    if args.multiplier.lower().strip() != "auto":
+        multiplier = float(args.multiplier)
+    else:
+        multiplier = args.multiplier
+
+    bin_files = find_bin_files(args.src, expand_archives=True)
+    if args.catalog is not None:
+        bin_files = bin_files + select_catalog_files(args.catalog, **parse_catalog_selection(args.select))
+    if len(bin_files) == 0:
+        raise FileNotFoundError("No .bin files to composite.")
+    hemisphere, resolution = resolve_hemisphere_and_resolution(bin_files[0],
+                                                               hemisphere=None if args.hemisphere is None else args.hemisphere.strip().upper(),
+                                                               resolution=args.resolution)
+
+    accumulator = composite_bins(bin_files,
+                                 header_size = args.header_size,
+                                 element_size = args.element_size,
+                                 resolution = resolution,
+                                 hemisphere = hemisphere,
+                                 nodata = args.nodata,
+                                 flag_values = args.flags,
+                                 signed = args.signed,
+                                 multiplier = multiplier,
+                                 byteorder = args.byteorder,
+                                 jobs = args.jobs,
+                                 verbose = args.verbose)
+
+    output_composite_gtif(accumulator,
+                          args.dest,
+                          resolution = resolution,
+                          hemisphere = hemisphere,
+                          statistics = statistics,
+                          profile = args.profile,
+                          verbose = True)
@@ -0,0 +1,202 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Fri Oct 16 22:49:11 2026
+
+A manifest of the .bin files a batch conversion has converted, so that re-running it
+skips the files that are already up to date, and a run that was interrupted picks up
+where it stopped.
+
+Each converted file gets one entry: its source path, size and modification time, a key
+of the conversion parameters, and the geotiff written (with its size). A file is only
+converted again if any of those has changed, or the geotiff is gone. Entries are appended
+to the manifest (one JSON object per line) as soon as each file is done, so an
+interrupted run loses nothing, and the manifest is rewritten compactly (to a temporary
+file, then renamed over it) when the run ends.
+"""
+import numpy
+import hashlib
+import json
+import os
+import uuid
+
+from bin_archives import split_archive_path
+
+# Name of the manifest that batch conversions keep in their destination directory, by default.
+DEFAULT_MANIFEST_NAME = "bin_to_gtif_manifest.jsonl"
+
+def get_source_stat(bin_file):
+    """Return the (size, mtime_ns) of a .bin file on disk, or of the archive it's in."""
+    stat = os.stat(split_archive_path(bin_file)[0])
+    return stat.st_size, stat.st_mtime_ns
+
+def get_conversion_params_key(kwargs):
+    """Return a short key (hex digest) of a set of output_bin_to_gtif() keyword arguments.
+
+    Two conversions with the same key write the same geotiff from the same .bin file.
+    Arrays (lookup tables) are keyed by their contents, types by their names.
+    """
+    items = []
+    for key in sorted(kwargs):
+        value = kwargs[key]
+        if isinstance(value, numpy.ndarray):
+            value = "{0}:{1}".format(value.dtype.str, hashlib.sha1(numpy.ascontiguousarray(value).tobytes()).hexdigest())
+        elif isinstance(value, type):
+            value = value.__name__
+        items.append((key, repr(value)))
+    return hashlib.sha1(repr(items).encode("utf-8")).hexdigest()
+
+class ConversionManifest(object):
+    """The manifest of a batch conversion, kept in a file. Use with a "with" block, or call close() when done.
+
+        with ConversionManifest("tifs/bin_to_gtif_manifest.jsonl") as manifest:
+            if not manifest.is_up_to_date(bin_file, gtif_file, params_key, source_stat):
+                ... convert ...
+                manifest.record(bin_file, gtif_file, params_key, source_stat)
+    """
+    def __init__(self, manifest_file):
+        self.manifest_file = manifest_file
+        self.entries = {}
+        if os.path.exists(manifest_file):
+            with open(manifest_file, "r") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                        self.entries[entry["src"]] = entry
+                    except (ValueError, KeyError, TypeError):
+                        # A line cut short when a run was interrupted.
+                        continue
+
+        manifest_dir = os.path.dirname(os.path.abspath(manifest_file))
+        if not os.path.exists(manifest_dir):
+            os.makedirs(manifest_dir)
+        self._file = open(manifest_file, "a")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def is_up_to_date(self, bin_file, gtif_file, params_key, source_stat=None):
+        """Return True if bin_file was already converted to gtif_file with these parameters, and neither has changed since."""
+        entry = self.entries.get(bin_file)
+        if entry is None:
+            return False
+        if source_stat is None:
+            source_stat = get_source_stat(bin_file)
+        try:
+            dest_size = os.path.getsize(gtif_file)
+        except OSError:
+            return False
+        return (entry["dest"] == gtif_file and
+                entry["params"] == params_key and
+                (entry["size"], entry["mtime_ns"]) == tuple(source_stat) and
+                entry["dest_size"] == dest_size)
+
+    def record(self, bin_file, gtif_file, params_key, source_stat):
+        """Record that bin_file (as it was when source_stat was taken) was converted to gtif_file."""
+        entry = {"src": bin_file,
+                 "size": source_stat[0],
+                 "mtime_ns": source_stat[1],
+                 "params": params_key,
+                 "dest": gtif_file,
+                 "dest_size": os.path.getsize(gtif_file)}
+        self.entries[bin_file] = entry
+        self._file.write(json.dumps(entry) + "\n")
+        self._file.flush()
+
+    def close(self):
+        """Rewrite the manifest with just the latest entry of each file, and close it."""
+        if self._file is None:
+            return
+        self._file.close()
+        self._file = None
+
+        temp_file = "{0}.{1}.tmp".format(self.manifest_file, uuid.uuid4().hex)
+        with open(temp_file, "w") as f:
+            for entry in self.entries.values():
+                f.write(json.dumps(entry) + "\n")
+        os.replace(temp_file, self.manifest_file)
+
+def testing_manifest():
+    """Check that a manifest skips unchanged files and re-converts changed ones. Raises AssertionError on a mismatch.
+
+    Runs a pretend batch conversion (each "geotiff" is just a copy of its .bin file) over
+    a few files in a temporary directory, several times over, changing a source file's
+    modification time, the conversion parameters, and a geotiff in between. Also checks
+    that a line cut short by an interrupted run is ignored, and that close() leaves one
+    line per file.
+    """
+    import shutil
+    import tempfile
+
+    def run_batch(bin_files, params):
+        """Convert the files that aren't up to date. Returns the ones converted."""
+        converted = []
+        params_key = get_conversion_params_key(params)
+        with ConversionManifest(manifest_file) as manifest:
+            for bin_file in bin_files:
+                gtif_file = os.path.splitext(bin_file)[0] + ".tif"
+                source_stat = get_source_stat(bin_file)
+                if manifest.is_up_to_date(bin_file, gtif_file, params_key, source_stat):
+                    continue
+                shutil.copyfile(bin_file, gtif_file)
+                manifest.record(bin_file, gtif_file, params_key, source_stat)
+                converted.append(os.path.basename(bin_file))
+        return converted
+
+    def manifest_lines():
+        with open(manifest_file, "r") as f:
+            return f.read().splitlines()
+
+    tempdir = tempfile.mkdtemp()
+    try:
+        manifest_file = os.path.join(tempdir, "tifs", DEFAULT_MANIFEST_NAME)
+        bin_files = [os.path.join(tempdir, "nt_1987070{0}_f08_v01_n.bin".format(day)) for day in (1,2,3)]
+        for bin_file in bin_files:
+            with open(bin_file, "wb") as f:
+                f.write(os.urandom(100))
+        names = [os.path.basename(bin_file) for bin_file in bin_files]
+        params = {"multiplier": 0.1, "return_type": float, "lut": numpy.arange(256, dtype=numpy.float32)}
+
+        assert run_batch(bin_files, params) == names
+        assert len(manifest_lines()) == 3, manifest_lines()
+        assert run_batch(bin_files, params) == []
+
+        # A changed modification time (or size) of the source file.
+        stat = os.stat(bin_files[1])
+        os.utime(bin_files[1], ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        assert run_batch(bin_files, params) == names[1:2]
+        assert run_batch(bin_files, params) == []
+
+        # A geotiff that's gone, or been changed.
+        os.remove(os.path.splitext(bin_files[0])[0] + ".tif")
+        with open(os.path.splitext(bin_files[2])[0] + ".tif", "ab") as f:
+            f.write(b"more")
+        assert run_batch(bin_files, params) == [names[0], names[2]]
+
+        # Different parameters, including a different lookup table or type.
+        for changed in ({"multiplier": 0.4},
+                        {"return_type": int},
+                        {"lut": numpy.arange(256, dtype=numpy.float64)},
+                        {"lut": numpy.arange(256, dtype=numpy.float32)[::-1].copy()}):
+            new_params = dict(params, **changed)
+            assert get_conversion_params_key(new_params) != get_conversion_params_key(params), changed
+            assert run_batch(bin_files, new_params) == names, changed
+            assert run_batch(bin_files, params) == names, changed
+        assert get_conversion_params_key(dict(params, lut=params["lut"].copy())) == get_conversion_params_key(params)
+
+        # Each run appended lines as it went, but close() left just one per file.
+        assert len(manifest_lines()) == 3, manifest_lines()
+        assert [os.path.basename(json.loads(line)["src"]) for line in manifest_lines()] == names, manifest_lines()
+
+        # An interrupted run leaves a line cut short, which is ignored (and dropped by close()).
+        with open(manifest_file, "a") as f:
+            f.write('{"src": "' + bin_files[0])
+        assert run_batch(bin_files, params) == []
+        assert len(manifest_lines()) == 3, manifest_lines()
+        assert not any([fname.endswith(".tmp") for fname in os.listdir(os.path.dirname(manifest_file))])
+    finally:
+        shutil.rmtree(tempdir)
+
+    print("Manifest checks passed.")
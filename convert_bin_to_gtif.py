@@ -7,9 +7,27 @@ Created on Mon Apr  6 15:21:04 2020
 import numpy
 import argparse
 import os
-from osgeo import osr, gdal
+import sys
+import glob
+import time
+import concurrent.futures
+import uuid
+import functools
+import json
+import queue
+import threading
+# NOTE: GDAL (osgeo) is only imported inside the functions that use it, so that importing
+# this module (or running it with --help) doesn't pay GDAL's start-up cost.
 
-from read_bin import read_NSIDC_bin_file, get_hemisphere_and_resolution_from_nsidc_filename
+from read_bin import read_NSIDC_bin_file, decode_NSIDC_bin_data, get_hemisphere_and_resolution_from_nsidc_filename
+from bin_archives import is_archive_path, split_archive_path, get_archive_type, get_member_name, \
+                         read_archive_member, iter_archive_members, list_archive_members, ARCHIVE_MEMBER_SEPARATOR
+from conversion_manifest import ConversionManifest, get_conversion_params_key, get_source_stat, DEFAULT_MANIFEST_NAME
+from nsidc_catalog import select_catalog_files, parse_catalog_selection
+from nsidc_products import get_product_info, get_product_luts, NSIDC_PRODUCTS
+from band_statistics import compute_band_stats
+from grid_resample import resample_grid, get_resample_method, get_resampled_window, DOWNSAMPLE_METHODS, UPSAMPLE_METHODS
+from stage_profiler import profile_stage, StageProfiler
 
 # See https://nsidc.org/data/polar-stereo/ps_grids.html for documentation on
 # these polar stereo grids
@@ -23,45 +41,72 @@ GRIDSIZE_12_5_N = GRIDSIZE_25_N * 2 # (896, 608)
 GRIDSIZE_12_5_S = GRIDSIZE_25_S * 2 # (664, 632)
 GRIDSIZE_6_25_N = GRIDSIZE_25_N * 4
 GRIDSIZE_6_25_S = GRIDSIZE_25_S * 4
+# The grid sizes, by (resolution, hemisphere)
+NSIDC_GRIDSIZES = {(6.25, "N"):GRIDSIZE_6_25_N,
+                   (6.25, "S"):GRIDSIZE_6_25_S,
+                   (12.5, "N"):GRIDSIZE_12_5_N,
+                   (12.5, "S"):GRIDSIZE_12_5_S,
+                   (25.0, "N"):GRIDSIZE_25_N,
+                   (25.0, "S"):GRIDSIZE_25_S}
 # EPSG reference numbers for each of the grids.
 EPSG_N = 3411
-SPATIAL_REFERENCE_N = osr.SpatialReference()
-SPATIAL_REFERENCE_N.ImportFromEPSG(EPSG_N)
-
 EPSG_S = 3412
-SPATIAL_REFERENCE_S = osr.SpatialReference()
-SPATIAL_REFERENCE_S.ImportFromEPSG(EPSG_S)
+
+def __getattr__(name):
+    """Build the SPATIAL_REFERENCE_N and SPATIAL_REFERENCE_S module constants only when first used."""
+    if name == "SPATIAL_REFERENCE_N":
+        return get_spatial_reference("N")
+    elif name == "SPATIAL_REFERENCE_S":
+        return get_spatial_reference("S")
+    raise AttributeError("module {0!r} has no attribute {1!r}".format(__name__, name))
 
 def retrieve_ssmi_grid_coords(N_or_S="S", gridsize_km=25):
-    """Return two arrays, for "grid_x" and "grid_y" corrdinates of the array."""
-    if N_or_S.strip().upper() == "S":
-        hemisphere="S"
-        UL_corner=NSIDC_S_GRID_UPPER_LEFT_KM
-    elif N_or_S.strip().upper() == "N":
-        hemisphere="N"
-        UL_corner=NSIDC_N_GRID_UPPER_LEFT_KM
-    else:
-        raise ValueError("Uknown hemisphere " + str(N_or_S))
+    """Return two arrays, for "grid_x" and "grid_y" corrdinates of the array.
 
+    The arrays are cached, and shared between calls, so treat them as read-only.
+    (See grid_geometry for cell centers, lat/lon and pixel areas.)
+    """
+    # Imported here, since grid_geometry imports the grid constants from this module.
+    from grid_geometry import get_grid_xy_vectors
+
+    if N_or_S.strip().upper() not in ("N", "S"):
+        raise ValueError("Uknown hemisphere " + str(N_or_S))
     assert gridsize_km in (25,12.5,6.25)
-    if hemisphere=="N":
-        if gridsize_km==25:
-            gridsize_yx = GRIDSIZE_25_N
-        elif gridsize_km==12.5:
-            gridsize_yx = GRIDSIZE_12_5_N
-        elif gridsize_km==6.25:
-            gridsize_yx = GRIDSIZE_6_25_N
-    if hemisphere=="S":
-        if gridsize_km==25:
-            gridsize_yx = GRIDSIZE_25_S
-        elif gridsize_km==12.5:
-            gridsize_yx = GRIDSIZE_12_5_S
-        elif gridsize_km==6.25:
-            gridsize_yx = GRIDSIZE_6_25_S
-
-    x_vector = numpy.arange(UL_corner[0], UL_corner[0]+(gridsize_km*gridsize_yx[1]), step=gridsize_km)
-    y_vector = numpy.arange(UL_corner[1], UL_corner[1]+(-gridsize_km*gridsize_yx[0]), step=-gridsize_km)
-    return x_vector, y_vector
+
+    return get_grid_xy_vectors(N_or_S.strip().upper(), gridsize_km)
+
+def resolve_hemisphere_and_resolution(bin_file, hemisphere=None, resolution=None):
+    """Fill in the hemisphere and/or resolution of a .bin file, if not given, from its file name.
+
+    If they can't be read from the file name either, defaults to "S" and 25 km.
+
+    Returns: (hemisphere, resolution) -- "N" or "S", and 6.25, 12.5 or 25.0
+    """
+    if resolution is None or hemisphere is None:
+        # Get hemisphere & resolution from file name
+        hemisphere_from_fname, resolution_from_fname = \
+            get_hemisphere_and_resolution_from_nsidc_filename(bin_file)
+        # Only replace values if not explicitly given.
+        if resolution is None:
+            resolution = resolution_from_fname
+            if resolution is None:
+                resolution = 25.0
+        if hemisphere is None:
+            hemisphere = hemisphere_from_fname
+            if hemisphere is None:
+                hemisphere = "S"
+
+    resolution = float(resolution)
+    assert resolution in (6.25, 12.5, 25.0)
+    assert hemisphere in ("N", "S")
+
+    return hemisphere, resolution
+
+def resolve_multiplier(multiplier, return_type):
+    """Turn an "auto" multiplier into 1 for integer return types and 0.1 for floating-point types."""
+    if isinstance(multiplier, str) and multiplier.strip().lower() =="auto":
+        multiplier= 1 if (return_type == int) else 0.1
+    return multiplier
 
 def output_bin_to_gtif(bin_file,
                        gtif_file=None,
@@ -73,20 +118,36 @@ def output_bin_to_gtif(bin_file,
                        nodata=0,
                        signed=False,
                        multiplier="auto",
-                       return_type=float):
+                       return_type=float,
+                       byteorder="little",
+                       return_bytes=False,
+                       bbox=None,
+                       lut=None,
+                       defer_scaling=False,
+                       raw_data=None,
+                       resample_to=None,
+                       resample_method=None,
+                       reproject_to=None,
+                       reproject_resolution=None,
+                       reproject_method="nearest",
+                       grid_cache_dir=None,
+                       **gtif_kwargs):
     """Read an NSIDC SSMI .bin file and output to a geo-referenced .tif file.
 
     The hemisphere and spatial resolution are acquired from the filename. File
     names should be kept as downloaded from the NSIDC. Changed file names do not
     guarantee good outputs.
 
-    bin_file = Name of the flat-binary data file to read.
+    bin_file = Name of the flat-binary data file to read. Can also be a file inside a .gz,
+               .zip or .tar archive, as "archive.tar::member.bin". (See bin_archives.py.)
 
     gtif_file = Name of the geotiff to produce.
                 If None, it uses the same filname as "bin_file" with the
                 file extension swapped with ".tif". NOTE: If a .tif file is given
                 for "bin_file", this will overwrite the file. (And probably break
                 anyway since a .tif is not a flat-binary file.)
+                Can also be a writable binary file-like object (an open file,
+                io.BytesIO, etc) to write the geotiff into.
 
     resolution = Floating-point grid resolution, in km.
                  Accepted values are: 25.0, 12.5, 6.25
@@ -102,60 +163,134 @@ def output_bin_to_gtif(bin_file,
 
     return_type = The data type of the geotiff raster band. Defaults to float.
 
-    Returns: None. Just saves the geotiff.
+    byteorder = "little" or "big", the byte order of the .bin data elements.
+                Defaults to "little", as used in the NSIDC products.
+
+    return_bytes = If True, don't write a file at all, just return the encoded geotiff
+                   as bytes (gtif_file is ignored). Handy for serving conversions
+                   without touching the disk.
+
+    bbox = (xmin, ymin, xmax, ymax), in polar stereo km, to read and write only the grid
+           cells within that box, as a cropped geotiff. (See get_bbox_window().)
+
+    lut = A lookup table to decode the raw values with, in place of return_type and
+          multiplier, e.g. from nsidc_products.get_product_luts(). (See read_NSIDC_bin_file().)
+
+    defer_scaling = If True, write the file's own integers (e.g. 2-byte unsigned) rather than
+          scaled floats, and record the multiplier as the band's scale (GDAL's SetScale()),
+          for readers to apply. Much smaller in memory and on disk. The nodata value is
+          then a raw value, too.
+
+    raw_data = The contents of bin_file, if already read into memory (e.g. from an archive,
+          with bin_archives.iter_archive_members()). bin_file is then just used for its name.
+
+    resample_to = A resolution (25, 12.5 or 6.25 km) to resample the grid to before writing
+          it, on the same hemisphere's grid. None (the default) keeps the file's resolution.
+          With a bbox, the geotiff covers whole cells of the coarser of the two grids.
+
+    resample_method = How to resample: "mean" (the default), "max" or "mode" to a coarser
+          grid, "nearest" (the default) or "bilinear" to a finer one. Nodata and NaN cells
+          are left out. (See grid_resample.resample_grid().)
+
+    reproject_to = "ease2" or "latlon" to reproject the grid to EASE-Grid 2.0 or to a regular
+          latitude/longitude grid, in the same hemisphere. (Or a grid_reproject.TargetGrid.)
+          None (the default) keeps the polar stereo grid. Can't be used with a bbox.
+
+    reproject_resolution = Resolution of the grid reprojected to: km for "ease2" (25, 12.5,
+          6.25 or 3.125, default 25), degrees for "latlon" (default 0.25).
+
+    reproject_method = "nearest" (the default) or "bilinear".
+
+    grid_cache_dir = A directory to cache the reprojection's warp maps in, as memory-mappable
+          .npy files, to reuse in later runs. Defaults to the NSIDC_GRID_CACHE_DIR
+          environment variable, if set. (See grid_reproject.get_warp_map().)
+
+    Any other keyword arguments (profile, compress, predictor, blocksize, overviews,
+    num_threads) are passed along to output_gtif() to choose how the geotiff is encoded.
+
+    Returns: The geotiff as bytes, if return_bytes is True. Otherwise None, just saves the geotiff.
     """
-    if (gtif_file is None) or (len(gtif_file.strip().upper()) == 0):
-        gtif_file = os.path.splitext(bin_file)[0] + ".tif"
+    if return_bytes:
+        gtif_file = None
+    elif (gtif_file is None) or (isinstance(gtif_file, str) and len(gtif_file.strip().upper()) == 0):
+        gtif_file = get_gtif_file_name(bin_file)
 
-    if resolution is None or hemisphere is None:
-        # Get hemisphere & resolution from file name
-        hemisphere_from_fname, resolution_from_fname = \
-            get_hemisphere_and_resolution_from_nsidc_filename(bin_file)
-        # Only replace values if not explicitly given.
-        if resolution is None:
-            resolution = resolution_from_fname
-            if resolution is None:
-                resolution = 25.0
-        if hemisphere is None:
-            hemisphere = hemisphere_from_fname
-            if hemisphere is None:
-                hemisphere = "S"
+    hemisphere, resolution = resolve_hemisphere_and_resolution(bin_file,
+                                                               hemisphere=hemisphere,
+                                                               resolution=resolution)
+    multiplier = resolve_multiplier(multiplier, return_type)
 
-    resolution = float(resolution)
-    assert resolution in (6.25, 12.5, 25.0)
-    assert hemisphere in ("N", "S")
+    if resample_to is not None:
+        out_resolution = float(resample_to)
+        resample_method = get_resample_method(resolution, out_resolution, resample_method)
+    else:
+        out_resolution = resolution
 
-    gridsize_dict = {(6.25, "N"):GRIDSIZE_6_25_N,
-                     (6.25, "S"):GRIDSIZE_6_25_S,
-                     (12.5, "N"):GRIDSIZE_12_5_N,
-                     (12.5, "S"):GRIDSIZE_12_5_S,
-                     (25.0, "N"):GRIDSIZE_25_N,
-                     (25.0, "S"):GRIDSIZE_25_S}
+    if reproject_to is not None and bbox is not None:
+        raise ValueError("Can't reproject a part (bbox) of a grid, only the whole grid.")
 
-    if multiplier.strip().lower() =="auto":
-        multiplier= 1 if (return_type == int) else 0.1
+    if bbox is not None:
+        # Take whole cells of the coarser grid, so the window covers the same area on both.
+        coarser_resolution = max(resolution, out_resolution)
+        window = get_resampled_window(get_bbox_window(bbox, hemisphere=hemisphere, resolution=coarser_resolution),
+                                      coarser_resolution, resolution)
+        out_window = get_resampled_window(window, resolution, out_resolution)
+    else:
+        window = None
+        out_window = None
+
+    read_kwargs = dict(grid_shape = NSIDC_GRIDSIZES[(resolution, hemisphere)],
+                       header_size=header_size,
+                       element_size=element_size,
+                       return_type=return_type,
+                       signed=signed,
+                       multiplier=multiplier,
+                       byteorder=byteorder,
+                       window=window,
+                       lut=lut,
+                       defer_scaling=defer_scaling)
 
     # Read in the array
-    array = read_NSIDC_bin_file(bin_file,
-                                grid_shape = gridsize_dict[(resolution, hemisphere)],
-                                header_size=header_size,
-                                element_size=element_size,
-                                return_type=return_type,
-                                signed=signed,
-                                multiplier=multiplier)
-
-    # Export the file.
-    output_gtif(array,
-                gtif_file,
-                resolution=resolution,
-                hemisphere=hemisphere,
-                nodata=nodata,
-                verbose=verbose)
+    if raw_data is None:
+        array_or_tuple = read_NSIDC_bin_file(bin_file, **read_kwargs)
+    else:
+        array_or_tuple = decode_NSIDC_bin_data(raw_data, fname=bin_file, **read_kwargs)
+    if defer_scaling:
+        array, scale = array_or_tuple
+    else:
+        array, scale = array_or_tuple, None
 
-    return
+    if out_resolution != resolution:
+        array = resample_grid(array, resolution, out_resolution, method=resample_method, nodata=nodata)
+
+    if reproject_to is not None:
+        # Imported here, since grid_reproject imports the grid constants from this module.
+        from grid_reproject import get_target_grid, reproject_grid
+        from grid_geometry import DEFAULT_GRID_CACHE_DIR
+        target_grid = get_target_grid(reproject_to, hemisphere, reproject_resolution)
+        array = reproject_grid(array, hemisphere, out_resolution, target_grid,
+                               method=reproject_method,
+                               nodata=nodata,
+                               cache_dir=DEFAULT_GRID_CACHE_DIR if grid_cache_dir is None else grid_cache_dir)
+        gtif_kwargs.update(geotransform=target_grid.geotransform, epsg=target_grid.epsg)
+
+    # Export the file. (Returns the geotiff bytes if gtif_file is None.)
+    return output_gtif(array,
+                       gtif_file,
+                       resolution=out_resolution,
+                       hemisphere=hemisphere,
+                       nodata=nodata,
+                       verbose=verbose,
+                       window=out_window,
+                       scale=scale,
+                       **gtif_kwargs)
+
+def get_nsidc_geotransform(hemisphere, resolution, window=None):
+    """Given the hemisphere and the resolution of the dataset, return the 6-number GeoTiff 'geotransform' tuple.
 
-def get_nsidc_geotransform(hemisphere, resolution):
-    """Given the hemisphere and the resolution of the dataset, return the 6-number GeoTiff 'geotransform' tuple."""
+    If a ((row_start, row_stop), (col_start, col_stop)) window is given, the geotransform
+    is for just that part of the grid, starting at its upper-left cell.
+    """
     # Must multiply km resolution by 1000 to get meters, for the projection.
     if hemisphere.strip().upper() == "N":
         UL_X, UL_Y = NSIDC_N_GRID_UPPER_LEFT_KM * 1000
@@ -164,113 +299,904 @@ def get_nsidc_geotransform(hemisphere, resolution):
     else:
         raise ValueError("Unknown hemisphere: '{0}'".format(hemisphere))
 
+    if window is not None:
+        UL_X = UL_X + window[1][0] * resolution*1000
+        UL_Y = UL_Y - window[0][0] * resolution*1000
+
     return (UL_X, resolution*1000, 0, UL_Y, 0, -resolution*1000)
 
+def get_bbox_window(bbox, hemisphere, resolution):
+    """Return the ((row_start, row_stop), (col_start, col_stop)) window of the grid cells within a bounding box.
+
+    bbox = (xmin, ymin, xmax, ymax), in polar stereo km. Cells partly inside the box are
+           included, and the window is cut off at the edges of the grid.
+
+    Raises ValueError if the box doesn't overlap the grid at all.
+    """
+    hemisphere = hemisphere.strip().upper()
+    resolution = float(resolution)
+    xmin, ymin, xmax, ymax = (float(n) for n in bbox)
+    if xmin >= xmax or ymin >= ymax:
+        raise ValueError("Bounding box {0} must be (xmin, ymin, xmax, ymax), with xmin < xmax and ymin < ymax.".format(tuple(bbox)))
+
+    UL_X, UL_Y = NSIDC_N_GRID_UPPER_LEFT_KM if hemisphere == "N" else NSIDC_S_GRID_UPPER_LEFT_KM
+    n_rows, n_cols = (int(n) for n in NSIDC_GRIDSIZES[(resolution, hemisphere)])
+
+    row_start = max(int(numpy.floor((UL_Y - ymax) / resolution)), 0)
+    row_stop = min(int(numpy.ceil((UL_Y - ymin) / resolution)), n_rows)
+    col_start = max(int(numpy.floor((xmin - UL_X) / resolution)), 0)
+    col_stop = min(int(numpy.ceil((xmax - UL_X) / resolution)), n_cols)
+
+    if row_start >= row_stop or col_start >= col_stop:
+        raise ValueError("Bounding box {0} is outside the {1} {2} km grid.".format(tuple(bbox), hemisphere, resolution))
+
+    return ((row_start, row_stop), (col_start, col_stop))
+
+
+# GeoTiff encoding profiles handled by output_gtif():
+#   "plain" - An uncompressed, striped GeoTiff. (GDAL's defaults.)
+#   "tiled" - A tiled, compressed GeoTiff, optionally with internal overviews.
+#   "cog"   - A Cloud-Optimized GeoTiff (tiled, compressed, with internal overviews, laid
+#             out for efficient HTTP range reads). Needs GDAL 3.1 or newer.
+GTIF_PROFILES = ("plain", "tiled", "cog")
+GTIF_COMPRESSIONS = ("DEFLATE", "ZSTD", "LZW", "NONE")
+
+def get_gtif_creation_options(profile="plain",
+                              compress="DEFLATE",
+                              predictor=True,
+                              blocksize=256,
+                              num_threads="ALL_CPUS",
+                              is_float=False):
+    """Return the list of GDAL creation options to write a geotiff with the given profile.
+
+    profile = "plain", "tiled" or "cog" (see GTIF_PROFILES above.)
+
+    compress = Compression for the "tiled" and "cog" profiles: "DEFLATE", "ZSTD", "LZW" or "NONE".
+               (ZSTD needs a GDAL built with it.)
+
+    predictor = If True, use a predictor to improve compression. Horizontal differencing
+                is used for integer data, and the floating-point predictor for float data.
+
+    blocksize = Width & height of the tiles, in pixels. Must be a multiple of 16.
+
+    num_threads = Number of threads GDAL uses to compress tiles: a number, or "ALL_CPUS".
+                  None leaves compression single-threaded.
+
+    is_float = True if the raster band is a floating-point type (chooses the predictor.)
+    """
+    profile = profile.strip().lower()
+    if profile not in GTIF_PROFILES:
+        raise ValueError("Unknown geotiff profile '{0}'. Must be one of {1}".format(profile, GTIF_PROFILES))
+
+    if profile == "plain":
+        return []
+
+    compress = "NONE" if compress is None else compress.strip().upper()
+    if compress not in GTIF_COMPRESSIONS:
+        raise ValueError("Unknown compression '{0}'. Must be one of {1}".format(compress, GTIF_COMPRESSIONS))
+
+    blocksize = int(blocksize)
+    if blocksize <= 0 or (blocksize % 16) != 0:
+        raise ValueError("blocksize must be a positive multiple of 16, not {0}".format(blocksize))
+
+    options = ["COMPRESS={0}".format(compress)]
+
+    if profile == "tiled":
+        options.extend(["TILED=YES",
+                        "BLOCKXSIZE={0}".format(blocksize),
+                        "BLOCKYSIZE={0}".format(blocksize)])
+        if predictor and compress != "NONE":
+            options.append("PREDICTOR={0}".format(3 if is_float else 2))
+
+    elif profile == "cog":
+        # The COG driver is always tiled, and picks the right predictor for the data type itself.
+        options.append("BLOCKSIZE={0}".format(blocksize))
+        if predictor and compress != "NONE":
+            options.append("PREDICTOR=YES")
+
+    if num_threads is not None and compress != "NONE":
+        options.append("NUM_THREADS={0}".format(num_threads))
+
+    return options
+
+def get_overview_levels(shape, blocksize=256):
+    """Return the overview decimation factors (2, 4, 8, ...) needed until the grid fits in one block."""
+    levels = []
+    factor = 2
+    while max(shape) / (factor/2) > blocksize:
+        levels.append(factor)
+        factor *= 2
+    return levels
+
+@functools.lru_cache(maxsize=None)
+def get_spatial_reference(hemisphere):
+    """Return the osr.SpatialReference of the NSIDC polar stereo grid in the "N" or "S" hemisphere.
+
+    Built from the EPSG code on first use (a PROJ database lookup), then cached.
+    """
+    from osgeo import osr
+
+    hemisphere_upper = hemisphere.strip().upper()
+    if hemisphere_upper == "S":
+        epsg = EPSG_S
+    elif hemisphere_upper == "N":
+        epsg = EPSG_N
+    else:
+        raise ValueError("Unknown hemisphere", hemisphere)
+
+    spatial_reference = osr.SpatialReference()
+    spatial_reference.ImportFromEPSG(epsg)
+    return spatial_reference
+
+@functools.lru_cache(maxsize=None)
+def get_epsg_projection_wkt(epsg):
+    """Return the WKT projection string of an EPSG code (e.g. of a grid from grid_reproject). Cached after first use."""
+    from osgeo import osr
+
+    spatial_reference = osr.SpatialReference()
+    spatial_reference.ImportFromEPSG(int(epsg))
+    return spatial_reference.ExportToWkt()
+
+@functools.lru_cache(maxsize=None)
+def get_projection_wkt(hemisphere):
+    """Return the WKT projection string of the NSIDC polar stereo grid in the "N" or "S" hemisphere. Cached after first use."""
+    return get_spatial_reference(hemisphere.strip().upper()).ExportToWkt()
+
+def get_gdal_datatype(dtype):
+    """Return the GDAL raster band data type used to write a numpy array of the given dtype."""
+    from osgeo import gdal
+
+    dtype = numpy.dtype(dtype)
+    if dtype in (numpy.int8, numpy.int16, numpy.int32, numpy.int64):
+        if dtype in (numpy.int8, numpy.int16):
+            datatype = gdal.GDT_Int16
+        elif dtype in (numpy.int32, numpy.int64):
+            datatype = gdal.GDT_Int32
+
+    elif dtype in (numpy.uint8, numpy.uint16, numpy.uint32, numpy.uint64):
+        if dtype == numpy.uint8:
+            datatype = gdal.GDT_Byte
+        elif dtype == numpy.uint16:
+            datatype = gdal.GDT_UInt16
+        elif dtype in (numpy.uint32, numpy.uint64):
+            datatype = gdal.GDT_UInt32
+
+    elif dtype == numpy.float32:
+        datatype = gdal.GDT_Float32
+
+    elif dtype == numpy.float64:
+        datatype = gdal.GDT_Float64
+
+    else:
+        raise TypeError("Unhandled data type {0}. Please use int or float.".format(str(dtype)))
+
+    return datatype
+
+def read_vsimem_file(vsimem_file):
+    """Return the contents of a GDAL /vsimem/ in-memory file as bytes."""
+    from osgeo import gdal
+
+    vsi_file = gdal.VSIFOpenL(vsimem_file, "rb")
+    if vsi_file is None:
+        raise IOError("Could not open in-memory file {0}".format(vsimem_file))
+    try:
+        gdal.VSIFSeekL(vsi_file, 0, os.SEEK_END)
+        size = gdal.VSIFTellL(vsi_file)
+        gdal.VSIFSeekL(vsi_file, 0, os.SEEK_SET)
+        return bytes(gdal.VSIFReadL(1, size, vsi_file))
+    finally:
+        gdal.VSIFCloseL(vsi_file)
+
+def delete_vsimem_file(vsimem_file):
+    """Free a GDAL /vsimem/ in-memory file, along with any .aux.xml side-car GDAL made for it."""
+    from osgeo import gdal
+
+    for fname in (vsimem_file, vsimem_file + ".aux.xml"):
+        gdal.Unlink(fname)
 
 def output_gtif(array,
                 gtif_file,
                 resolution=25,
                 hemisphere="S",
                 nodata=0,
-                verbose=True):
+                verbose=True,
+                profile="plain",
+                compress="DEFLATE",
+                predictor=True,
+                blocksize=256,
+                overviews=None,
+                overview_resampling="NEAREST",
+                num_threads="ALL_CPUS",
+                band_descriptions=None,
+                window=None,
+                scale=None,
+                offset=None,
+                geotransform=None,
+                epsg=None):
     """Take an array, output to a geotiff in the NSIDC resolution specified.
 
     Defaults to 25 km resolution, southern hemisphere.
     Resoltions currently handled: 25 km, 12.5 km, 6.25 km.
     Hemispheres: "N" or "S"
 
-    This currently only produces NSIDC Polar Stereo grids. Will update the code later
-    to also include EASE and other grids.
+    This produces NSIDC Polar Stereo grids, unless given the geotransform and EPSG code
+    of some other grid (e.g. EASE-Grid 2.0, from grid_reproject.py).
 
-    Returns: None. Just saves the geotiff.
-    """
-    geotransform = get_nsidc_geotransform(hemisphere=hemisphere,
-                                          resolution=resolution)
+    array = A 2D (rows, cols) array, or a 3D (bands, rows, cols) array to write a
+            multi-band geotiff.
 
-    driver = gdal.GetDriverByName("GTiff")
-    if array.dtype in (numpy.int8, numpy.int16, numpy.int32, numpy.int64):
-        if array.dtype in (numpy.int8, numpy.int16):
-            datatype = gdal.GDT_Int16
-        elif array.dtype in (numpy.int32, numpy.int64):
-            datatype = gdal.GDT_Int32
+    gtif_file = Name of the geotiff to write. Or, a writable binary file-like object
+                (such as an open file or io.BytesIO) to write the geotiff into. Or,
+                None to return the encoded geotiff as bytes. Neither of the latter
+                two touch the disk. A named file is written under a temporary name and
+                renamed once it's complete, so it's never left half-written.
 
-    elif array.dtype in (numpy.uint8, numpy.uint16, numpy.uint32, numpy.uint32):
-        if array.dtype in (numpy.uint8, numpy.uint16):
-            datatype = gdal.GDT_UInt16
-        elif array.dtype in (numpy.uint32, numpy.uint64):
-            datatype = gdal.GDT_UInt32
+    profile = How to encode the geotiff: "plain" (uncompressed and striped, the default),
+              "tiled" (tiled & compressed) or "cog" (Cloud-Optimized GeoTiff, needs GDAL >= 3.1).
 
-    elif array.dtype == numpy.float32:
-        datatype = gdal.GDT_Float32
+    compress, predictor, blocksize, num_threads = Compression settings for the "tiled"
+              and "cog" profiles. See get_gtif_creation_options().
 
-    elif array.dtype == numpy.float64:
-        datatype = gdal.GDT_Float64
+    overviews = Whether to add internal overviews. If None, overviews are added for
+                "cog" but not for "plain" or "tiled".
 
-    else:
-        raise TypeError("Unhandled data type {0}. Please use int or float.".format(str(array.dtype)))
+    overview_resampling = The GDAL resampling method used to build overviews. NEAREST
+                          (the default) keeps flag values intact.
 
-    hemisphere_upper = hemisphere.strip().upper()
-    if hemisphere_upper == "S":
-        projection = SPATIAL_REFERENCE_S
-    elif hemisphere_upper == "N":
-        projection = SPATIAL_REFERENCE_N
+    band_descriptions = Optional list of descriptions (names) for each band.
+
+    window = If the array is just part of the grid, the ((row_start, row_stop), (col_start, col_stop))
+             of the grid it covers (e.g. from get_bbox_window()). The geotiff is
+             georeferenced to that part of the grid.
+
+    scale, offset = If the array holds packed values (e.g. integers that are a tenth of a
+             Kelvin), the values are array * scale + offset. These are recorded on each
+             band (GDAL's SetScale() & SetOffset()) rather than applied. Default: None, not packed.
+
+    geotransform, epsg = The GDAL geotransform and EPSG code of the array's grid, if it's not an
+             NSIDC polar stereo grid (e.g. from grid_reproject.get_ease2_grid()). Then resolution,
+             hemisphere and window are ignored.
+
+    Returns: The geotiff as bytes, if gtif_file is None. Otherwise None, just saves the geotiff.
+    """
+    from osgeo import gdal
+
+    if geotransform is None:
+        geotransform = get_nsidc_geotransform(hemisphere=hemisphere,
+                                              resolution=resolution,
+                                              window=window)
+
+    datatype = get_gdal_datatype(array.dtype)
+
+    if epsg is None:
+        projection_wkt = get_projection_wkt(hemisphere)
     else:
-        raise ValueError("Unknown hemisphere", hemisphere)
+        projection_wkt = get_epsg_projection_wkt(epsg)
 
-    # Calculate statistics
-    if nodata != None:
-        array_wo_nodata = array[array != nodata]
+    # Treat a single 2D grid as a one-band stack of grids.
+    if array.ndim == 2:
+        bands = array[numpy.newaxis, :, :]
+    elif array.ndim == 3:
+        bands = array
     else:
-        array_wo_nodata = array
-
-    ds = driver.Create(gtif_file, array.shape[1], array.shape[0], 1, datatype)
-    ds.SetGeoTransform(geotransform)
-    ds.SetProjection(projection.ExportToWkt())
-    band = ds.GetRasterBand(1)
-    band.WriteArray(array)
-
-    # Set the nodata value in the band (if not None)
-    if nodata != None:
-        band.SetNoDataValue(nodata)
-
-    # Set the array statistics.
-    # Only set statistics if this isn't an empty array.
-    if len(array_wo_nodata) > 0:
-        band.SetStatistics(float(numpy.min(array_wo_nodata)),
-                           float(numpy.max(array_wo_nodata)),
-                           float(numpy.mean(array_wo_nodata)),
-                           float(numpy.std(array_wo_nodata)))
+        raise ValueError("Can only write a 2D or 3D array to a geotiff, not {0}D.".format(array.ndim))
+    n_bands, n_rows, n_cols = bands.shape
+    if window is not None and (n_rows, n_cols) != (window[0][1] - window[0][0], window[1][1] - window[1][0]):
+        raise ValueError("Array of {0} rows x {1} cols does not match the window {2}.".format(n_rows, n_cols, window))
+
+    profile = profile.strip().lower()
+    creation_options = get_gtif_creation_options(profile=profile,
+                                                 compress=compress,
+                                                 predictor=predictor,
+                                                 blocksize=blocksize,
+                                                 num_threads=num_threads,
+                                                 is_float=(datatype in (gdal.GDT_Float32, gdal.GDT_Float64)))
+    if overviews is None:
+        overviews = (profile == "cog")
+
+    # A geotiff written to memory (gtif_file=None) or to a file-like object is encoded
+    # in a temporary GDAL /vsimem/ file, which is always removed before returning.
+    in_memory = (gtif_file is None) or hasattr(gtif_file, "write")
+    if in_memory:
+        output_file = "/vsimem/nsidc_{0}.tif".format(uuid.uuid4().hex)
     else:
-        band.SetStatistics(numpy.NaN,
-                           numpy.NaN,
-                           numpy.NaN,
-                           numpy.NaN)
+        output_file = "{0}.{1}.tmp.tif".format(os.path.splitext(gtif_file)[0], uuid.uuid4().hex)
+
+    # Calculate the statistics of each band, in one pass over each, leaving out nodata values.
+    with profile_stage("stats"):
+        band_stats = [compute_band_stats(bands[i], nodata=nodata) for i in range(n_bands)]
 
-    ds.FlushCache()
     ds = None
+    written = False
+    try:
+        with profile_stage("gdal_write"):
+            if profile == "cog":
+                # The COG driver can only copy an existing dataset, so build the raster in memory first.
+                ds = gdal.GetDriverByName("MEM").Create("", n_cols, n_rows, n_bands, datatype)
+            else:
+                driver = gdal.GetDriverByName("GTiff")
+                ds = driver.Create(output_file, n_cols, n_rows, n_bands, datatype, options=creation_options)
+
+            ds.SetGeoTransform(geotransform)
+            ds.SetProjection(projection_wkt)
+            for i in range(n_bands):
+                band = ds.GetRasterBand(i+1)
+                band.WriteArray(bands[i])
+
+                # Set the nodata value in the band (if not None)
+                if nodata != None:
+                    band.SetNoDataValue(nodata)
+
+                if scale is not None or offset is not None:
+                    band.SetScale(1.0 if scale is None else float(scale))
+                    band.SetOffset(0.0 if offset is None else float(offset))
+
+                # Set the array statistics.
+                # Only set statistics if this isn't an empty array.
+                stats = band_stats[i]
+                if stats.count > 0:
+                    band.SetStatistics(stats.min,
+                                       stats.max,
+                                       stats.mean,
+                                       stats.std)
+                else:
+                    band.SetStatistics(numpy.NaN,
+                                       numpy.NaN,
+                                       numpy.NaN,
+                                       numpy.NaN)
+
+                if band_descriptions is not None:
+                    band.SetDescription(str(band_descriptions[i]))
+
+        with profile_stage("overviews"):
+            if profile == "cog":
+                if not overviews:
+                    creation_options.append("OVERVIEWS=NONE")
+                else:
+                    creation_options.append("RESAMPLING={0}".format(overview_resampling))
+                cog_ds = gdal.GetDriverByName("COG").CreateCopy(output_file, ds, options=creation_options)
+                if cog_ds is None:
+                    raise RuntimeError("Could not write Cloud-Optimized GeoTiff {0}. (The COG driver needs GDAL 3.1 or newer.)".format(output_file))
+                cog_ds = None
+            elif overviews:
+                overview_levels = get_overview_levels((n_rows, n_cols), blocksize=blocksize)
+                if len(overview_levels) > 0:
+                    ds.BuildOverviews(overview_resampling, overview_levels)
+
+        with profile_stage("gdal_flush") as stage:
+            ds.FlushCache()
+            ds = None
+
+            if in_memory:
+                gtif_bytes = read_vsimem_file(output_file)
+                stage.add(bytes_written=len(gtif_bytes))
+            else:
+                # Move the finished file (and any .aux.xml side-car GDAL made for it) into place.
+                if os.path.exists(output_file + ".aux.xml"):
+                    os.replace(output_file + ".aux.xml", gtif_file + ".aux.xml")
+                os.replace(output_file, gtif_file)
+                stage.add(bytes_written=os.path.getsize(gtif_file))
+        written = True
+    finally:
+        ds = None
+        if in_memory:
+            delete_vsimem_file(output_file)
+        elif not written:
+            for fname in (output_file, output_file + ".aux.xml"):
+                if os.path.exists(fname):
+                    os.remove(fname)
+
+    if gtif_file is None:
+        if verbose:
+            print(len(gtif_bytes), "bytes of geotiff written to memory.")
+        return gtif_bytes
+
+    if in_memory:
+        gtif_file.write(gtif_bytes)
 
     if verbose:
-        print(gtif_file, "written.")
+        print(getattr(gtif_file, "name", gtif_file), "written.")
 
     return
 
 
+def get_gtif_file_name(bin_file, dest_dir=None):
+    """Return the default geotiff name for a .bin file: the same name with a .tif extension.
+
+    It goes in dest_dir, if given. Otherwise alongside the .bin file, or alongside the
+    archive the .bin file is in ("archive.tar::member.bin" -> "member.tif" next to archive.tar).
+    """
+    if dest_dir is None or len(dest_dir.strip()) == 0:
+        dest_dir = os.path.dirname(split_archive_path(bin_file)[0])
+    return os.path.join(dest_dir, os.path.splitext(get_member_name(bin_file))[0] + ".tif")
+
+def find_bin_files(paths, extension=".bin", expand_archives=False):
+    """Expand a list of file names, glob patterns and/or directories into a list of .bin files.
+
+    paths = A file name, glob pattern ("/data/tb_f08_1987*.bin") or directory, or a list of them.
+            Directories are searched recursively for files ending in "extension", and for
+            .gz, .zip and .tar archives. Explicit file names are kept whatever their
+            extension, as are files inside archives ("archive.tar::member.bin").
+
+    expand_archives = If True, list each file in a .zip or .tar archive ("archive.tar::member.bin")
+            in place of the archive itself. (A .gz file only ever holds one file, so is kept as-is.)
+
+    Returns a list of file names, in the order given (sorted within each glob or
+    directory), without duplicates.
+    """
+    if isinstance(paths, str):
+        paths = [paths]
+
+    bin_files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for dirpath, dirnames, filenames in os.walk(path):
+                dirnames.sort()
+                bin_files.extend([os.path.join(dirpath, fn) for fn in sorted(filenames)
+                                  if fn.lower().endswith(extension.lower()) or get_archive_type(fn) is not None])
+        elif os.path.exists(path):
+            bin_files.append(path)
+        elif ARCHIVE_MEMBER_SEPARATOR in path:
+            if not os.path.exists(split_archive_path(path)[0]):
+                raise FileNotFoundError("No archive '{0}'.".format(split_archive_path(path)[0]))
+            bin_files.append(path)
+        else:
+            matches = sorted(glob.glob(path, recursive=True))
+            if len(matches) == 0:
+                raise FileNotFoundError("No files found matching '{0}'.".format(path))
+            bin_files.extend([fn for fn in matches if not os.path.isdir(fn)])
+
+    if expand_archives:
+        bin_files = [member for fn in bin_files
+                     for member in (list_archive_members(fn, extension=extension)
+                                    if get_archive_type(fn) in ("zip", "tar") and ARCHIVE_MEMBER_SEPARATOR not in fn
+                                    else [fn])]
+
+    # Remove duplicates, keeping the first occurrence of each file.
+    seen = set()
+    return [fn for fn in bin_files if not (fn in seen or seen.add(fn))]
+
+def _output_bin_to_gtif_and_time(bin_file, gtif_file, kwargs, raw_data=None):
+    """Run output_bin_to_gtif() on one file, catching any errors.
+
+    Runs in the worker processes of output_bins_to_gtifs(). Returns a dictionary
+    describing the result rather than raising, so that one bad file does not
+    stop a batch.
+    """
+    result = {"src": bin_file,
+              "dest": gtif_file,
+              "success": False,
+              "skipped": False,
+              "error": None,
+              "bytes": 0,
+              "seconds": 0.0}
+
+    start_time = time.perf_counter()
+    try:
+        if gtif_file is None:
+            gtif_file = result["dest"] = get_gtif_file_name(bin_file)
+        if raw_data is None and is_archive_path(bin_file):
+            raw_data = read_archive_member(bin_file)
+        result["bytes"] = os.path.getsize(bin_file) if raw_data is None else len(raw_data)
+        output_bin_to_gtif(bin_file, gtif_file, verbose=False, raw_data=raw_data, **kwargs)
+        result["success"] = True
+    except Exception as e:
+        result["error"] = "{0}: {1}".format(type(e).__name__, str(e))
+    result["seconds"] = time.perf_counter() - start_time
+
+    return result
+
+def _output_archive_to_gtifs_and_time(archive, dest_dir, kwargs):
+    """Convert every .bin file in a zip or tar archive, reading the archive once, front to back.
+
+    Returns a list of result dictionaries (as _output_bin_to_gtif_and_time()), one per
+    file in the archive, in archive order.
+    """
+    results = []
+    try:
+        members = iter_archive_members(archive)
+        while True:
+            with profile_stage("read") as stage:
+                member = next(members, None)
+                if member is not None:
+                    stage.add(bytes_read=len(member[1]))
+            if member is None:
+                break
+            bin_file, raw_data = member
+            member = None
+            results.append(_output_bin_to_gtif_and_time(bin_file, get_gtif_file_name(bin_file, dest_dir), kwargs, raw_data=raw_data))
+            raw_data = None
+    except Exception as e:
+        # The archive itself couldn't be read (any files converted before that are kept).
+        results.append({"src": archive,
+                        "dest": None,
+                        "success": False,
+                        "skipped": False,
+                        "error": "{0}: {1}".format(type(e).__name__, str(e)),
+                        "bytes": 0,
+                        "seconds": 0.0})
+    return results
+
+def _output_task_to_gtifs_and_time(bin_file, dest_dir, kwargs, collect_profile=False):
+    """Convert one item of a batch: a .bin file, or every .bin file in a zip or tar archive.
+
+    collect_profile = If True, profile the stages of the conversion (see stage_profiler.py),
+                      e.g. in a worker process, where the caller's profiler can't see them.
+
+    Returns: (a list of results, the profiled stages or None)
+    """
+    profiler = StageProfiler() if collect_profile else None
+    if profiler is not None:
+        profiler.start()
+    try:
+        if get_archive_type(bin_file) in ("zip", "tar"):
+            results = _output_archive_to_gtifs_and_time(bin_file, dest_dir, kwargs)
+        else:
+            results = [_output_bin_to_gtif_and_time(bin_file, get_gtif_file_name(bin_file, dest_dir), kwargs)]
+    finally:
+        if profiler is not None:
+            profiler.stop()
+    return results, (None if profiler is None else profiler.stages)
+
+def _get_up_to_date_results(bin_file, dest_dir, manifest, params_key, source_stat):
+    """If the manifest says a batch task (a .bin file, or every .bin file in a zip or tar archive)
+    is already converted and unchanged, return the (skipped) results of it. Otherwise None."""
+    if get_archive_type(bin_file) in ("zip", "tar"):
+        prefix = bin_file + ARCHIVE_MEMBER_SEPARATOR
+        src_files = [src for src in manifest.entries if src.startswith(prefix)]
+    else:
+        src_files = [bin_file]
+
+    gtif_files = [get_gtif_file_name(src, dest_dir) for src in src_files]
+    if len(src_files) == 0 or not all([manifest.is_up_to_date(src, gtif, params_key, source_stat)
+                                       for src, gtif in zip(src_files, gtif_files)]):
+        return None
+
+    return [{"src": src,
+             "dest": gtif,
+             "success": True,
+             "skipped": True,
+             "error": None,
+             "bytes": 0,
+             "seconds": 0.0} for src, gtif in zip(src_files, gtif_files)]
+
+def output_bins_to_gtifs(bin_files,
+                         dest_dir=None,
+                         jobs=1,
+                         verbose=True,
+                         manifest=None,
+                         profiler=None,
+                         **kwargs):
+    """Convert many NSIDC .bin files to geo-referenced .tif files, in parallel.
+
+    bin_files = A list of .bin files, glob patterns or directories. (See find_bin_files().)
+
+    dest_dir = Directory to write the geotiffs into. If None, each .tif is written
+               alongside its .bin file (same as output_bin_to_gtif()).
+
+    jobs = Number of worker processes to convert files with. If 1, files are converted
+           one after another in this process. If None or 0, uses one process per CPU.
+
+    verbose = If True, print a line for each file converted, and a summary at the end.
+              Failures are always printed.
+
+    manifest = A manifest file (see conversion_manifest.py) to record each converted file
+               in. Files already in it, converted with the same options and unchanged since,
+               are skipped. So re-running a batch only converts new or changed files, and an
+               interrupted batch picks up where it stopped. None (the default) converts every file.
+
+    profiler = A StageProfiler (see stage_profiler.py) to add the time spent in each stage of
+               every conversion to, including those run in worker processes.
+
+    All other keyword arguments (header_size, element_size, resolution, hemisphere,
+    nodata, signed, multiplier, return_type, byteorder) are passed to output_bin_to_gtif()
+    for every file. Leave resolution and hemisphere as None to have them read from each
+    file name individually.
+
+    A file that fails to convert is reported and skipped, it does not stop the batch.
+
+    Returns: A list of result dictionaries, one per file, in the order given, with keys
+             "src", "dest", "success", "skipped" (already up to date), "error", "bytes" and "seconds".
+    """
+    # Each task is one .bin file, or one whole zip or tar archive (read in one pass).
+    bin_files = find_bin_files(bin_files)
+
+    if dest_dir is not None and len(dest_dir.strip()) > 0:
+        if not os.path.exists(dest_dir):
+            os.makedirs(dest_dir)
+    else:
+        dest_dir = None
+
+    if not jobs:
+        jobs = os.cpu_count()
+
+    task_results = [None] * len(bin_files)
+    start_time = time.perf_counter()
+
+    # The size & modification time of each source, taken before it's converted.
+    conversion_manifest = None
+    if manifest is not None:
+        conversion_manifest = ConversionManifest(manifest)
+        params_key = get_conversion_params_key(kwargs)
+        source_stats = [None] * len(bin_files)
+        for i, bin_file in enumerate(bin_files):
+            try:
+                source_stats[i] = get_source_stat(bin_file)
+            except OSError:
+                continue
+            task_results[i] = _get_up_to_date_results(bin_file, dest_dir, conversion_manifest, params_key, source_stats[i])
+
+    def report(i, results_i):
+        task_results[i] = results_i
+        n_done = len([r for r in task_results if r is not None])
+        for result in results_i:
+            if conversion_manifest is not None and result["success"] and source_stats[i] is not None:
+                conversion_manifest.record(result["src"], result["dest"], params_key, source_stats[i])
+            if not result["success"]:
+                print("[{0}/{1}] FAILED {2}: {3}".format(n_done, len(bin_files), result["src"], result["error"]))
+            elif verbose:
+                print("[{0}/{1}] {2} -> {3} ({4:0.2f} s)".format(n_done, len(bin_files), result["src"], result["dest"], result["seconds"]))
+
+    # Tasks already up to date (in the manifest) are skipped.
+    tasks_to_do = [i for i in range(len(bin_files)) if task_results[i] is None]
+
+    # Conversions in this process are seen by the profiler directly, those in worker processes are profiled there.
+    start_profiler = (profiler is not None) and (jobs == 1) and not profiler.is_active
+    if start_profiler:
+        profiler.start()
+    try:
+        if jobs == 1:
+            for i in tasks_to_do:
+                report(i, _output_task_to_gtifs_and_time(bin_files[i], dest_dir, kwargs)[0])
+        else:
+            with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as executor:
+                futures = dict([(executor.submit(_output_task_to_gtifs_and_time, bin_files[i], dest_dir, kwargs, profiler is not None), i)
+                                for i in tasks_to_do])
+                for future in concurrent.futures.as_completed(futures):
+                    i = futures[future]
+                    try:
+                        results_i, stages = future.result()
+                        if stages is not None:
+                            profiler.merge(stages)
+                    except Exception as e:
+                        # The worker process itself died (not just the conversion).
+                        results_i = [{"src": bin_files[i],
+                                      "dest": None,
+                                      "success": False,
+                                      "skipped": False,
+                                      "error": "{0}: {1}".format(type(e).__name__, str(e)),
+                                      "bytes": 0,
+                                      "seconds": 0.0}]
+                    report(i, results_i)
+    finally:
+        if start_profiler:
+            profiler.stop()
+        if conversion_manifest is not None:
+            conversion_manifest.close()
+
+    results = [result for results_i in task_results for result in results_i]
+
+    elapsed = time.perf_counter() - start_time
+    if verbose:
+        n_success = len([r for r in results if r["success"]])
+        n_skipped = len([r for r in results if r["skipped"]])
+        megabytes = sum([r["bytes"] for r in results if r["success"]]) / (1024.**2)
+        print("{0} of {1} files converted ({2} already up to date, {3} failed) in {4:0.2f} s: {5:0.2f} files/s, {6:0.2f} MB/s.".format(
+              n_success - n_skipped, len(results), n_skipped, len(results) - n_success, elapsed,
+              (n_success - n_skipped) / elapsed if elapsed > 0 else 0.0,
+              megabytes / elapsed if elapsed > 0 else 0.0))
+
+    return results
+
+# Names of output_bin_to_gtif() return types that can be given in worker-mode jobs.
+RETURN_TYPE_NAMES = {"int": int, "float": float, "float32": numpy.float32}
+
+def run_conversion_worker(input_stream=None,
+                          output_stream=None,
+                          jobs=1,
+                          use_processes=False,
+                          queue_size=None,
+                          **default_kwargs):
+    """Convert .bin files to geotiffs as jobs arrive, one JSON job per line, until the input ends.
+
+    Meant for long-running ingest pipelines: GDAL, numpy and the cached projections
+    are loaded once, rather than once per file. Each input line is a JSON object with
+    "src" (the .bin file), optionally "dest" (the .tif file, by default next to the .bin
+    file) and "id" (echoed back), and any output_bin_to_gtif() keyword arguments to
+    override the defaults for that job. Example:
+
+        {"id": 17, "src": "/data/nt_20201231_f17_v1.1_n.bin", "header_size": 300, "element_size": 1, "return_type": "int"}
+
+    For each job, one JSON line is written to the output (not necessarily in input order),
+    with "id", "src", "dest", "success", "error", "bytes", "seconds" (to convert) and
+    "queue_seconds" (waiting to start).
+
+    input_stream, output_stream = Text streams to read jobs from and write results to.
+                  Default to stdin and stdout.
+
+    jobs = Number of conversions to run at once. If None or 0, uses one per CPU.
+
+    use_processes = If False (default), conversions run in threads, which share the
+                    loaded modules and caches (numpy and GDAL release the GIL while they
+                    work.) If True, they run in a pool of "jobs" processes.
+
+    queue_size = Maximum number of jobs read ahead and waiting to start. When full, no
+                 more input is read until a job starts. Defaults to 2 * jobs.
+
+    All other keyword arguments are the default output_bin_to_gtif() arguments for every job.
+
+    Returns: The number of jobs that failed.
+    """
+    input_stream = sys.stdin if input_stream is None else input_stream
+    output_stream = sys.stdout if output_stream is None else output_stream
+    if not jobs:
+        jobs = os.cpu_count()
+    if queue_size is None:
+        queue_size = 2 * jobs
+
+    job_queue = queue.Queue(maxsize=queue_size)
+    output_lock = threading.Lock()
+    n_failed = [0]
+    executor = concurrent.futures.ProcessPoolExecutor(max_workers=jobs) if use_processes else None
+
+    def write_result(result):
+        with output_lock:
+            if not result["success"]:
+                n_failed[0] += 1
+            output_stream.write(json.dumps(result) + "\n")
+            output_stream.flush()
+
+    def work():
+        while True:
+            item = job_queue.get()
+            if item is None:
+                return
+            job_id, bin_file, gtif_file, kwargs, queued_time = item
+            queue_seconds = time.perf_counter() - queued_time
+            # Catch everything here, so that one bad job can't kill this thread and
+            # leave the rest of the queue (and the final join) hanging.
+            try:
+                if executor is None:
+                    result = _output_bin_to_gtif_and_time(bin_file, gtif_file, kwargs)
+                else:
+                    result = executor.submit(_output_bin_to_gtif_and_time, bin_file, gtif_file, kwargs).result()
+            except Exception as e:
+                result = {"src": bin_file, "dest": gtif_file, "success": False, "skipped": False,
+                          "error": "{0}: {1}".format(type(e).__name__, str(e)),
+                          "bytes": 0, "seconds": 0.0}
+            result["id"] = job_id
+            result["queue_seconds"] = queue_seconds
+            write_result(result)
+
+    threads = [threading.Thread(target=work, daemon=True) for i in range(jobs)]
+    for thread in threads:
+        thread.start()
+
+    try:
+        for line in input_stream:
+            if len(line.strip()) == 0:
+                continue
+            job_id = None
+            try:
+                job = json.loads(line)
+                if not isinstance(job, dict):
+                    raise ValueError("Each job must be a JSON object.")
+                job_id = job.pop("id", None)
+                bin_file = job.pop("src")
+                gtif_file = job.pop("dest", None)
+                if not isinstance(bin_file, str):
+                    raise TypeError("'src' must be a file path string.")
+                if gtif_file is not None and not isinstance(gtif_file, str):
+                    raise TypeError("'dest' must be a file path string or null.")
+                kwargs = dict(default_kwargs)
+                kwargs.update(job)
+                if isinstance(kwargs.get("return_type"), str):
+                    kwargs["return_type"] = RETURN_TYPE_NAMES[kwargs["return_type"].strip().lower()]
+            except Exception as e:
+                write_result({"id": job_id, "src": None, "dest": None, "success": False, "skipped": False,
+                              "error": "Bad job {0!r}: {1}: {2}".format(line.strip(), type(e).__name__, str(e)),
+                              "bytes": 0, "seconds": 0.0, "queue_seconds": 0.0})
+                continue
+
+            # Blocks while the queue is full, so input is only read as fast as it's converted.
+            job_queue.put((job_id, bin_file, gtif_file, kwargs, time.perf_counter()))
+    finally:
+        for thread in threads:
+            job_queue.put(None)
+        for thread in threads:
+            thread.join()
+        if executor is not None:
+            executor.shutdown()
+
+    return n_failed[0]
+
+def testing_worker():
+    """Check that run_conversion_worker() answers every job, and keeps going after bad ones.
+
+    Feeds it lines that aren't JSON objects, a job with no usable "src", and jobs whose
+    files are missing or the wrong size, through a small queue and several threads, and
+    checks that each gets exactly one failed result line, and that the worker returns
+    (rather than hanging on a dead thread). Raises AssertionError if not.
+    """
+    import io
+    import tempfile
+    import shutil
+
+    tempdir = tempfile.mkdtemp()
+    try:
+        short_file = os.path.join(tempdir, "tb_f08_19870709_v5_s19h.bin")
+        with open(short_file, "wb") as f:
+            f.write(b"\0" * 100)
+        missing_file = os.path.join(tempdir, "tb_f08_19870710_v5_s19h.bin")
+
+        job_lines = ["not json",
+                     "[1, 2]",
+                     json.dumps({"id": 3, "src": 5}),
+                     json.dumps({"id": 4, "src": missing_file, "dest": 7}),
+                     "",
+                     json.dumps({"id": 5, "src": missing_file}),
+                     json.dumps({"id": 6, "src": missing_file, "dest": os.path.join(tempdir, "out.tif")}),
+                     json.dumps({"id": 7, "src": short_file}),
+                     json.dumps({"id": 8, "src": short_file, "return_type": "no_such_type"})]
+        output_stream = io.StringIO()
+        n_failed = run_conversion_worker(io.StringIO("\n".join(job_lines) + "\n"), output_stream, jobs=3, queue_size=1)
+
+        results = [json.loads(line) for line in output_stream.getvalue().splitlines()]
+        assert n_failed == len(results) == 8, (n_failed, results)
+        assert sorted([r["id"] for r in results if r["id"] is not None]) == [3, 4, 5, 6, 7, 8], results
+        for result in results:
+            assert set(result) >= set(["id", "src", "dest", "success", "skipped", "error", "bytes", "seconds", "queue_seconds"]), result
+            assert result["success"] is False and result["error"], result
+        assert not os.path.exists(os.path.join(tempdir, "out.tif"))
+    finally:
+        shutil.rmtree(tempdir)
+
+    print("Worker checks passed.")
+
 def read_and_parse_args():
     """Read and parse command-line arguments."""
     parser = argparse.ArgumentParser(description="Outputs a geo-referenced TIF (.tif) from an NSDIC flat binary (.bin) data file.")
-    parser.add_argument("src", type=str, help="Source file (.bin)")
-    parser.add_argument("-dest", type=str, default="", help="Destination file (.tif). Default: Write the same filename in the same location with a .tif extension rather than .bin.")
+    parser.add_argument("src", type=str, nargs="*", help="Source file (.bin, .bin.gz, or a file inside a .zip or .tar archive as \"archive.tar::file.bin\"). Or, to convert a batch of files, any number of .bin files, archives (every .bin file in a .zip or .tar archive is converted, in one pass through it), glob patterns (quoted, e.g. \"tb_f08_1987*.bin\") and/or directories (searched recursively for .bin files and archives).")
+    parser.add_argument("-dest", type=str, default="", help="Destination file (.tif). Default: Write the same filename in the same location with a .tif extension rather than .bin. When converting a batch of files, this is the destination directory instead.")
+    parser.add_argument("-catalog", type=str, default=None, help="A catalog database of .bin files (see nsidc_catalog.py) to select the source files from, with -select, instead of (or as well as) listing them.")
+    parser.add_argument("-select", type=str, nargs="*", default=[], help="With -catalog, the key=value fields of the files to convert, as a batch, e.g. -select product=0001 hemisphere=S channel=19H start=1995-01-01 end=1995-12-31")
+    parser.add_argument("-jobs", "-j", type=int, default=1, help="Number of files to convert in parallel in a batch, in separate processes (or with --worker, in threads). 0 uses one per CPU. (Default: 1)")
+    parser.add_argument("-manifest", type=str, default=None, help="When converting a batch of files, keep a manifest of the files converted in this file, and skip files already converted with the same options and unchanged since. Re-running a batch then only converts new or changed files, and an interrupted batch picks up where it stopped. Default: bin_to_gtif_manifest.jsonl in the -dest directory, if given. 'none' to convert every file.")
+    parser.add_argument("--worker", action="store_true", default=False, help="Run as a long-lived worker: read one JSON job per line from stdin ({\"src\": ..., \"dest\": ..., plus any output_bin_to_gtif() options}), and write one JSON result line per job to stdout. The other options here set the defaults for every job.")
+    parser.add_argument("--processes", action="store_true", default=False, help="With --worker, run the -jobs conversions in processes rather than threads.")
+    parser.add_argument("-queue_size", type=int, default=None, help="With --worker, the most jobs to read ahead of the running ones. (Default: 2 x jobs)")
     parser.add_argument("-resolution", "-r", type=float, default=None, help="Resolution (km): 6.25, 12.5, or 25. If omitted, it is interpreted from the file name. If cannot be interpreted, defaults to 25 km. Check your NSIDC data source documentation.")
     parser.add_argument("-hemisphere", type=str, default=None, help="Hemisphere: one letter, N or S. If omitted, it is interpreted from the file name. If cannot be interpreted, defaults to 'N'.")
     parser.add_argument("-nodata", "-nd", type=int, default=None, help="Nodata value. Can be a number, or 'None' (without the quotes). (Default: None)")
     parser.add_argument("-header_size", "-hs", type=int, default=0, help="Size of .bin file header (in bytes). (Default: 0)")
     parser.add_argument("-element_size", "-es", type=int, default=2, help="Size of each numerical .bin data element (in bytes). Typically 1 or 2 for NSIDC files. (Default: 2)")
-    parser.add_argument("-output_type", "-ot", default="float", help="Output data type: 'int' or 'float'. Default 'float'.")
+    parser.add_argument("-output_type", "-ot", default="float", help="Output data type: 'int', 'float', 'float32', or 'native' (the file's own integers, with the multiplier saved as the band's scale, for readers to apply. The smallest output.) Default 'float'.")
     parser.add_argument("-multiplier","-m", type=str, default="auto", help="Use a multiplier. With 'auto', defaults to 1 (no mod) for integer output and 0.1 for floating-point (2731 -> 273.1). If you want to use a different multiplier, put the number here.")
+    parser.add_argument("-byteorder", "-bo", type=str, default="little", help="Byte order of each .bin data element: 'little' or 'big'. NSIDC files are little-endian. (Default: little)")
     parser.add_argument("--signed", "-s", action="store_true", default=False, help="If set, read binary data as signed numbers. (Default: unsigned)")
+    parser.add_argument("-product", type=str, default=None, help="A built-in NSIDC product ({0}). Sets the header size, element size and (unless given) multiplier, and decodes with a lookup table that turns flag values (land, coast, pole hole, missing...) into NaN for float output. (NaN is then the nodata value, unless -nodata is given.)".format(", ".join(sorted(NSIDC_PRODUCTS))))
+    parser.add_argument("-bbox", type=float, nargs=4, default=None, metavar=("XMIN", "YMIN", "XMAX", "YMAX"), help="Only read & write the grid cells within this box, in polar stereo coordinates (km), as a cropped geotiff.")
+    parser.add_argument("-resample_to", type=float, default=None, help="Resample to this resolution (km): 25, 12.5 or 6.25, on the same hemisphere's grid. The nested NSIDC grids line up exactly, so this is a block reduction or a cell split, not a warp. (Default: keep the file's resolution)")
+    parser.add_argument("-resample_method", type=str, default=None, help="How to resample: {0} to a coarser grid, or {1} to a finer one, leaving out nodata & NaN cells. (Default: {2} or {3})".format(
+                        ", ".join(DOWNSAMPLE_METHODS), ", ".join(UPSAMPLE_METHODS), DOWNSAMPLE_METHODS[0], UPSAMPLE_METHODS[0]))
+    parser.add_argument("-reproject", type=str, default=None, help="Reproject to 'ease2' (EASE-Grid 2.0, EPSG 6931/6932) or 'latlon' (a regular latitude/longitude grid, EPSG 4326, from 30 degrees to the pole), in the file's hemisphere. The warp map is computed once, then reused for every file. (Default: keep the polar stereo grid)")
+    parser.add_argument("-reproject_resolution", type=float, default=None, help="Resolution to reproject to: km for 'ease2' (25, 12.5, 6.25 or 3.125), degrees for 'latlon'. (Default: 25 km, or 0.25 degrees)")
+    parser.add_argument("-reproject_method", type=str, default="nearest", help="How to reproject: 'nearest' or 'bilinear' (leaving out nodata & NaN cells). (Default: nearest)")
+    parser.add_argument("-grid_cache_dir", type=str, default=None, help="Directory to cache reprojection warp maps in (as .npy files), so later runs memory-map them rather than compute them. (Default: the NSIDC_GRID_CACHE_DIR environment variable, if set)")
+    parser.add_argument("-profile", "-p", type=str, default="plain", help="GeoTiff encoding: 'plain' (uncompressed, striped), 'tiled' (tiled & compressed), or 'cog' (Cloud-Optimized GeoTiff, with overviews. Needs GDAL 3.1+). (Default: plain)")
+    parser.add_argument("-compress", "-c", type=str, default="DEFLATE", help="Compression for 'tiled' or 'cog' profiles: DEFLATE, ZSTD, LZW, or NONE. (Default: DEFLATE)")
+    parser.add_argument("-blocksize", "-bs", type=int, default=256, help="Tile size (pixels) for 'tiled' or 'cog' profiles. Multiple of 16. (Default: 256)")
+    parser.add_argument("-threads", "-t", type=str, default="ALL_CPUS", help="Number of threads GDAL uses to compress a geotiff, or 'ALL_CPUS'. (Default: ALL_CPUS)")
+    parser.add_argument("--no_predictor", action="store_true", default=False, help="Don't use a predictor when compressing. (Default: use one)")
+    parser.add_argument("--overviews", "-o", action="store_true", default=False, help="Add internal overviews to a 'tiled' geotiff. ('cog' geotiffs always get them.)")
+    parser.add_argument("-profile_report", type=str, default=None, metavar="JSON_FILE", help="Time each stage of the conversions (read, scale, resample, reproject, stats, gdal_write, overviews, gdal_flush), and write the totals (seconds, bytes read & written, arrays allocated, MB/s) to this JSON file. See stage_profiler.py. (Not to be confused with -profile, the GeoTiff encoding.)")
     parser.add_argument("--verbose", "-v", action="store_true", default=False, help="Increase output verbosity.")
 
-    return parser.parse_args()
+    args = parser.parse_args()
+    if len(args.src) == 0 and not args.worker and args.catalog is None:
+        parser.error("the following arguments are required: src (unless running with --worker, or selecting files from a -catalog)")
+
+    return args
 
 if __name__ == "__main__":
     # Parse the command-line arguments.
@@ -308,12 +1234,19 @@ if __name__ == "__main__":
 
     assert hemisphere in (None, "N", "S")
 
+    defer_scaling = False
     if args.output_type.lower() in ("float", "f"):
         out_type = float
+    elif args.output_type.lower() == "float32":
+        out_type = numpy.float32
+    elif args.output_type.lower() == "native":
+        # Written as the raw integers, scaled by the (float) multiplier when read.
+        out_type = float
+        defer_scaling = True
     elif args.output_type.lower() in ("int", "i", "d"):
         out_type = int
     else:
-        raise ValueError("Uknown output_type (can be: 'int','i','d','float', or 'f'):", str(args.output_type))
+        raise ValueError("Uknown output_type (can be: 'int','i','d','float','f','float32', or 'native'):", str(args.output_type))
 
     if args.multiplier.lower().strip() != "auto":
         multiplier = float(args.multiplier)
@@ -328,13 +1261,105 @@ if __name__ == "__main__":
         except ValueError:
             NDV = None
 
-    output_bin_to_gtif(args.src,
-                       args.dest,
-                       header_size = args.header_size,
-                       element_size = args.element_size,
-                       resolution = resolution,
-                       hemisphere = hemisphere,
-                       nodata = NDV,
-                       return_type = out_type,
-                       multiplier = multiplier,
-                       verbose = args.verbose)
\ No newline at end of file
+    header_size = args.header_size
+    element_size = args.element_size
+    if args.product is not None:
+        product_info = get_product_info(args.product)
+        header_size = product_info["header_size"]
+        element_size = product_info["element_size"]
+        if defer_scaling:
+            # The raw values (flags included) are written as-is, so no lookup table.
+            lut = None
+            if multiplier == "auto":
+                multiplier = product_info["multiplier"]
+        else:
+            lut = get_product_luts(args.product,
+                                   return_type = out_type,
+                                   multiplier = None if multiplier == "auto" else multiplier,
+                                   signed = args.signed)[0]
+            if NDV is None and out_type in (float, numpy.float32):
+                NDV = numpy.nan
+    else:
+        lut = None
+
+    conversion_kwargs = dict(header_size = header_size,
+                             element_size = element_size,
+                             resolution = resolution,
+                             hemisphere = hemisphere,
+                             nodata = NDV,
+                             return_type = out_type,
+                             multiplier = multiplier,
+                             byteorder = args.byteorder,
+                             signed = args.signed,
+                             bbox = args.bbox,
+                             lut = lut,
+                             defer_scaling = defer_scaling,
+                             profile = args.profile,
+                             compress = args.compress,
+                             predictor = not args.no_predictor,
+                             blocksize = args.blocksize,
+                             num_threads = args.threads,
+                             overviews = True if args.overviews else None)
+    # Only added when resampling, so the conversions in existing manifests stay up to date.
+    if args.resample_to is not None:
+        conversion_kwargs.update(resample_to = args.resample_to,
+                                 resample_method = args.resample_method)
+    if args.reproject is not None:
+        conversion_kwargs.update(reproject_to = args.reproject,
+                                 reproject_resolution = args.reproject_resolution,
+                                 reproject_method = args.reproject_method,
+                                 grid_cache_dir = args.grid_cache_dir)
+
+    if args.profile_report is not None:
+        profiler = StageProfiler()
+        profiler.start()
+    else:
+        profiler = None
+    failed = False
+
+    # Convert the jobs streamed in on stdin, until it closes.
+    if args.worker:
+        n_failed = run_conversion_worker(sys.stdin,
+                                         sys.stdout,
+                                         jobs = args.jobs,
+                                         use_processes = args.processes,
+                                         queue_size = args.queue_size,
+                                         **conversion_kwargs)
+        failed = (n_failed > 0)
+
+    # A single .bin file (or .bin.gz, or "archive::member.bin") is converted as-is, to the "dest" file.
+    elif len(args.src) == 1 and args.catalog is None and (ARCHIVE_MEMBER_SEPARATOR in args.src[0] or
+                                 (os.path.isfile(args.src[0]) and get_archive_type(args.src[0]) not in ("zip", "tar"))):
+        output_bin_to_gtif(args.src[0],
+                           args.dest,
+                           verbose = args.verbose,
+                           **conversion_kwargs)
+
+    # Otherwise, convert the batch of files into the "dest" directory.
+    else:
+        src = args.src
+        if args.catalog is not None:
+            src = src + select_catalog_files(args.catalog, **parse_catalog_selection(args.select))
+        if args.manifest is None:
+            manifest = None if dest is None else os.path.join(dest, DEFAULT_MANIFEST_NAME)
+        elif args.manifest.strip().lower() == "none":
+            manifest = None
+        else:
+            manifest = args.manifest
+        results = output_bins_to_gtifs(src,
+                                       dest_dir = dest,
+                                       jobs = args.jobs,
+                                       verbose = True,
+                                       manifest = manifest,
+                                       profiler = profiler,
+                                       **conversion_kwargs)
+        failed = not all([r["success"] for r in results])
+
+    if profiler is not None:
+        profiler.stop()
+        profiler.save_json(args.profile_report)
+        if args.verbose:
+            profiler.print_report()
+
+    if failed:
+        sys.exit(1)
@@ -0,0 +1,383 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Fri Oct 16 22:34:27 2026
+
+Converts many NSIDC .bin files to geotiffs with the read, decode and geotiff-write
+steps of each file running at the same time as the other steps of other files.
+
+    reader threads --[read queue]--> decode threads --[write queue]--> writer threads
+
+The reader threads read whole files ahead of the decoders (up to "prefetch" files
+waiting), the decode threads turn the bytes into scaled grids, and the writer threads
+compute the band statistics and encode the geotiffs. The queues between stages are
+bounded, so a slow stage holds back the ones before it rather than filling memory.
+numpy, file reads and GDAL all release the GIL while they work, so threads are enough.
+
+Each stage counts its items and the time it spent busy, waiting for input (starved)
+and waiting to hand on its output (blocked). The busiest stage is the bottleneck.
+
+This is kept apart from the batch mode of convert_bin_to_gtif.py (output_bins_to_gtifs()),
+which converts each file start to finish in one of several worker processes. There, the
+reads, decodes and writes of different files already overlap across the processes. This
+pipeline is for converting in a single process, where reads are slow or bursty (e.g. a
+network filesystem), and for finding out which step is holding a batch back.
+"""
+import numpy
+import argparse
+import os
+import queue
+import sys
+import threading
+import time
+
+from read_bin import decode_NSIDC_bin_data
+from bin_archives import is_archive_path, read_archive_member
+from convert_bin_to_gtif import output_gtif, \
+                               resolve_hemisphere_and_resolution, \
+                               resolve_multiplier, \
+                               get_bbox_window, \
+                               find_bin_files, \
+                               get_gtif_file_name, \
+                               NSIDC_GRIDSIZES
+
+# output_bin_to_gtif() keyword arguments used by the decode stage. All the others go to output_gtif().
+DECODE_KWARGS = ("header_size", "element_size", "return_type", "signed", "multiplier", "byteorder", "lut", "defer_scaling")
+
+# The grids the files can be on.
+PIPELINE_RESOLUTIONS = (6.25, 12.5, 25.0)
+PIPELINE_HEMISPHERES = ("N", "S")
+
+class PipelineStageCounters(object):
+    """Items processed, and time spent busy, starved (waiting for input) and blocked (waiting
+    to pass on output), summed over all the threads of one pipeline stage."""
+    def __init__(self, name, threads=1):
+        self.name = name
+        self.threads = int(threads)
+        self.items = 0
+        self.busy_seconds = 0.0
+        self.starved_seconds = 0.0
+        self.blocked_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, items=0, busy=0.0, starved=0.0, blocked=0.0):
+        with self._lock:
+            self.items += items
+            self.busy_seconds += busy
+            self.starved_seconds += starved
+            self.blocked_seconds += blocked
+
+    def utilization(self, wall_seconds):
+        """Fraction of the stage's available thread-time (threads * wall_seconds) it spent busy."""
+        if wall_seconds <= 0:
+            return 0.0
+        return self.busy_seconds / (self.threads * wall_seconds)
+
+    def __repr__(self):
+        return "PipelineStageCounters({0!r}, threads={1}, items={2}, busy={3:0.3f}s, starved={4:0.3f}s, blocked={5:0.3f}s)".format(
+               self.name, self.threads, self.items, self.busy_seconds, self.starved_seconds, self.blocked_seconds)
+
+def _timed_get(q, counters):
+    """Get the next item from a queue, counting any wait as starved time."""
+    start_time = time.perf_counter()
+    item = q.get()
+    counters.add(starved=time.perf_counter() - start_time)
+    return item
+
+def _timed_put(q, item, counters):
+    """Put an item on a queue, counting any wait (backpressure) as blocked time."""
+    start_time = time.perf_counter()
+    q.put(item)
+    counters.add(blocked=time.perf_counter() - start_time)
+
+def convert_bins_pipelined(bin_files,
+                           dest_dir=None,
+                           prefetch=4,
+                           queue_depth=2,
+                           read_threads=1,
+                           decode_threads=1,
+                           write_threads=1,
+                           verbose=True,
+                           **kwargs):
+    """Convert many NSIDC .bin files to geo-referenced .tif files, overlapping reads, decoding and writes.
+
+    bin_files = A list of .bin files, glob patterns or directories. (See find_bin_files().)
+
+    dest_dir = Directory to write the geotiffs into. If None, each .tif is written
+               alongside its .bin file (same as output_bin_to_gtif()).
+
+    prefetch = Most files read into memory and waiting to be decoded. Raise it when
+               reads are slow and bursty (e.g. on a network filesystem).
+
+    queue_depth = Most decoded grids waiting to be written.
+
+    read_threads, decode_threads, write_threads = Number of threads in each stage.
+               (GDAL's own compression threads are set with num_threads, as in output_gtif().)
+
+    verbose = If True, print a line for each file converted. Failures are always printed.
+
+    All other keyword arguments (header_size, element_size, resolution, hemisphere,
+    nodata, signed, multiplier, return_type, byteorder, and the output_gtif() encoding
+    options) are the same as output_bin_to_gtif(), for every file.
+
+    A file that fails at any stage is reported and skipped, it does not stop the others.
+
+    Returns: (results, stats)
+             results = A list of result dictionaries, one per file, in the order given, with
+                       keys "src", "dest", "success", "error", "bytes" and "seconds" (from the
+                       start of its read to the end of its write), as output_bins_to_gtifs().
+             stats = {"stages": [PipelineStageCounters of the "read", "decode" and "write"
+                      stages], "seconds": wall-clock seconds of the whole run}.
+                      (See print_pipeline_report().)
+    """
+    resolution = kwargs.pop("resolution", None)
+    hemisphere = kwargs.pop("hemisphere", None)
+    # Checked here, rather than failing every file in the reader threads.
+    if resolution is not None and float(resolution) not in PIPELINE_RESOLUTIONS:
+        raise ValueError("Unknown resolution {0}. Must be one of {1}".format(resolution, PIPELINE_RESOLUTIONS))
+    if hemisphere is not None and hemisphere not in PIPELINE_HEMISPHERES:
+        raise ValueError("Unknown hemisphere '{0}'. Must be one of {1}".format(hemisphere, PIPELINE_HEMISPHERES))
+
+    bin_files = find_bin_files(bin_files, expand_archives=True)
+
+    if dest_dir is not None and len(dest_dir.strip()) > 0:
+        if not os.path.exists(dest_dir):
+            os.makedirs(dest_dir)
+    gtif_files = [get_gtif_file_name(fn, dest_dir) for fn in bin_files]
+
+    bbox = kwargs.pop("bbox", None)
+    kwargs["multiplier"] = resolve_multiplier(kwargs.get("multiplier", "auto"), kwargs.get("return_type", float))
+    decode_kwargs = dict([(key, kwargs.pop(key)) for key in DECODE_KWARGS if key in kwargs])
+    write_kwargs = kwargs
+
+    read_stage = PipelineStageCounters("read", read_threads)
+    decode_stage = PipelineStageCounters("decode", decode_threads)
+    write_stage = PipelineStageCounters("write", write_threads)
+
+    file_queue = queue.Queue()
+    read_queue = queue.Queue(maxsize=max(int(prefetch), 1))
+    write_queue = queue.Queue(maxsize=max(int(queue_depth), 1))
+    for i in range(len(bin_files)):
+        file_queue.put(i)
+    for t in range(read_threads):
+        file_queue.put(None)
+
+    results = [None] * len(bin_files)
+    start_times = [None] * len(bin_files)
+    file_sizes = [0] * len(bin_files)
+    results_lock = threading.Lock()
+    # Number of threads still running in the read and decode stages. The last one out of
+    # a stage tells every thread of the next stage to stop.
+    running = {"read": read_threads, "decode": decode_threads}
+
+    def finish(i, error=None):
+        result = {"src": bin_files[i],
+                  "dest": gtif_files[i],
+                  "success": error is None,
+                  "error": None if error is None else "{0}: {1}".format(type(error).__name__, str(error)),
+                  "bytes": file_sizes[i],
+                  "seconds": time.perf_counter() - start_times[i]}
+        with results_lock:
+            results[i] = result
+            n_done = len([r for r in results if r is not None])
+        if not result["success"]:
+            print("[{0}/{1}] FAILED {2}: {3}".format(n_done, len(bin_files), result["src"], result["error"]))
+        elif verbose:
+            print("[{0}/{1}] {2} -> {3} ({4:0.2f} s)".format(n_done, len(bin_files), result["src"], result["dest"], result["seconds"]))
+
+    def stage_done(stage_name, next_queue, n_next_threads, counters):
+        with results_lock:
+            running[stage_name] -= 1
+            last_out = (running[stage_name] == 0)
+        if last_out:
+            for t in range(n_next_threads):
+                _timed_put(next_queue, None, counters)
+
+    def read():
+        while True:
+            i = _timed_get(file_queue, read_stage)
+            if i is None:
+                break
+            start_times[i] = time.perf_counter()
+            try:
+                grid_hemisphere, grid_resolution = resolve_hemisphere_and_resolution(bin_files[i],
+                                                                                     hemisphere=hemisphere,
+                                                                                     resolution=resolution)
+                window = None if bbox is None else get_bbox_window(bbox, hemisphere=grid_hemisphere, resolution=grid_resolution)
+                if is_archive_path(bin_files[i]):
+                    raw_data = read_archive_member(bin_files[i])
+                else:
+                    with open(bin_files[i], "rb") as f:
+                        raw_data = f.read()
+                file_sizes[i] = len(raw_data)
+            except Exception as e:
+                read_stage.add(busy=time.perf_counter() - start_times[i])
+                finish(i, e)
+                continue
+            read_stage.add(items=1, busy=time.perf_counter() - start_times[i])
+            _timed_put(read_queue, (i, raw_data, grid_hemisphere, grid_resolution, window), read_stage)
+        stage_done("read", read_queue, decode_threads, read_stage)
+
+    def decode():
+        while True:
+            item = _timed_get(read_queue, decode_stage)
+            if item is None:
+                break
+            i, raw_data, grid_hemisphere, grid_resolution, window = item
+            start_time = time.perf_counter()
+            try:
+                array = decode_NSIDC_bin_data(raw_data,
+                                              grid_shape=NSIDC_GRIDSIZES[(grid_resolution, grid_hemisphere)],
+                                              window=window,
+                                              fname=bin_files[i],
+                                              **decode_kwargs)
+            except Exception as e:
+                decode_stage.add(busy=time.perf_counter() - start_time)
+                finish(i, e)
+                continue
+            if decode_kwargs.get("defer_scaling", False):
+                array, scale = array
+            else:
+                scale = None
+            # Let go of the raw bytes now, rather than when the next item arrives.
+            item = raw_data = None
+            decode_stage.add(items=1, busy=time.perf_counter() - start_time)
+            _timed_put(write_queue, (i, array, scale, grid_hemisphere, grid_resolution, window), decode_stage)
+        stage_done("decode", write_queue, write_threads, decode_stage)
+
+    def write():
+        while True:
+            item = _timed_get(write_queue, write_stage)
+            if item is None:
+                break
+            i, array, scale, grid_hemisphere, grid_resolution, window = item
+            item = None
+            start_time = time.perf_counter()
+            try:
+                output_gtif(array,
+                            gtif_files[i],
+                            resolution=grid_resolution,
+                            hemisphere=grid_hemisphere,
+                            window=window,
+                            scale=scale,
+                            verbose=False,
+                            **write_kwargs)
+                error = None
+                write_stage.add(items=1, busy=time.perf_counter() - start_time)
+            except Exception as e:
+                error = e
+                write_stage.add(busy=time.perf_counter() - start_time)
+            array = None
+            finish(i, error)
+
+    start_time = time.perf_counter()
+    threads = [threading.Thread(target=read, daemon=True) for t in range(read_threads)] + \
+              [threading.Thread(target=decode, daemon=True) for t in range(decode_threads)] + \
+              [threading.Thread(target=write, daemon=True) for t in range(write_threads)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start_time
+
+    return results, {"stages": [read_stage, decode_stage, write_stage], "seconds": elapsed}
+
+def print_pipeline_report(results, stats):
+    """Print a summary of a convert_bins_pipelined() run: files per second and the utilization of each stage."""
+    elapsed = stats["seconds"]
+    n_success = len([r for r in results if r["success"]])
+    megabytes = sum([r["bytes"] for r in results if r["success"]]) / (1024.**2)
+    print("{0} of {1} files converted ({2} failed) in {3:0.2f} s: {4:0.2f} files/s, {5:0.2f} MB/s.".format(
+          n_success, len(results), len(results) - n_success, elapsed,
+          n_success / elapsed if elapsed > 0 else 0.0,
+          megabytes / elapsed if elapsed > 0 else 0.0))
+    print()
+    print("{0:<8} {1:>8} {2:>7} {3:>10} {4:>12} {5:>12} {6:>12}".format("Stage", "Threads", "Items", "Busy (s)", "Starved (s)", "Blocked (s)", "Utilization"))
+    print("-" * 75)
+    for stage in stats["stages"]:
+        print("{0:<8} {1:>8} {2:>7} {3:>10.2f} {4:>12.2f} {5:>12.2f} {6:>11.0f}%".format(
+              stage.name, stage.threads, stage.items, stage.busy_seconds, stage.starved_seconds,
+              stage.blocked_seconds, 100 * stage.utilization(elapsed)))
+    bottleneck = max(stats["stages"], key=lambda stage: stage.utilization(elapsed))
+    print("Bottleneck:", bottleneck.name)
+    return
+
+def read_and_parse_args():
+    """Read and parse command-line arguments."""
+    parser = argparse.ArgumentParser(description="Converts many NSDIC flat binary (.bin) data files to geo-referenced TIFs (.tif), reading, decoding and writing different files at the same time. Prints how busy each stage was at the end.")
+    parser.add_argument("src", type=str, nargs="+", help="Source .bin files, glob patterns (quoted, e.g. \"tb_f08_1987*.bin\") and/or directories (searched recursively for .bin files and archives). Files inside .gz, .zip or .tar archives can be named as \"archive.tar::file.bin\".")
+    parser.add_argument("-dest", type=str, default="", help="Destination directory. Default: Write each .tif alongside its .bin file.")
+    parser.add_argument("-prefetch", type=int, default=4, help="Most files read ahead and waiting to be decoded. (Default: 4)")
+    parser.add_argument("-queue_depth", type=int, default=2, help="Most decoded grids waiting to be written. (Default: 2)")
+    parser.add_argument("-read_threads", type=int, default=1, help="Number of threads reading files. (Default: 1)")
+    parser.add_argument("-decode_threads", type=int, default=1, help="Number of threads decoding files. (Default: 1)")
+    parser.add_argument("-write_threads", type=int, default=1, help="Number of threads writing geotiffs. (Default: 1)")
+    parser.add_argument("-resolution", "-r", type=float, default=None, choices=PIPELINE_RESOLUTIONS, help="Resolution (km): 6.25, 12.5, or 25. If omitted, it is interpreted from each file name. If cannot be interpreted, defaults to 25 km.")
+    parser.add_argument("-hemisphere", type=lambda h: h.strip().upper(), default=None, choices=PIPELINE_HEMISPHERES, help="Hemisphere: one letter, N or S. If omitted, it is interpreted from each file name. If cannot be interpreted, defaults to 'S'.")
+    parser.add_argument("-nodata", "-nd", type=int, default=None, help="Nodata value. (Default: None)")
+    parser.add_argument("-header_size", "-hs", type=int, default=0, help="Size of .bin file header (in bytes). (Default: 0)")
+    parser.add_argument("-element_size", "-es", type=int, default=2, help="Size of each numerical .bin data element (in bytes). Typically 1 or 2 for NSIDC files. (Default: 2)")
+    parser.add_argument("-output_type", "-ot", default="float", help="Output data type: 'int', 'float', 'float32', or 'native' (the file's own integers, with the multiplier saved as the band's scale). Default 'float'.")
+    parser.add_argument("-multiplier","-m", type=str, default="auto", help="Use a multiplier. With 'auto', defaults to 1 (no mod) for integer output and 0.1 for floating-point (2731 -> 273.1).")
+    parser.add_argument("-byteorder", "-bo", type=str, default="little", help="Byte order of each .bin data element: 'little' or 'big'. (Default: little)")
+    parser.add_argument("--signed", "-s", action="store_true", default=False, help="If set, read binary data as signed numbers. (Default: unsigned)")
+    parser.add_argument("-bbox", type=float, nargs=4, default=None, metavar=("XMIN", "YMIN", "XMAX", "YMAX"), help="Only write the grid cells within this box, in polar stereo coordinates (km), as cropped geotiffs.")
+    parser.add_argument("-profile", "-p", type=str, default="plain", help="GeoTiff encoding: 'plain', 'tiled', or 'cog'. (Default: plain)")
+    parser.add_argument("-compress", "-c", type=str, default="DEFLATE", help="Compression for 'tiled' or 'cog' profiles: DEFLATE, ZSTD, LZW, or NONE. (Default: DEFLATE)")
+    parser.add_argument("-blocksize", "-bs", type=int, default=256, help="Tile size (pixels) for 'tiled' or 'cog' profiles. Multiple of 16. (Default: 256)")
+    parser.add_argument("-threads", "-t", type=str, default="ALL_CPUS", help="Number of threads GDAL uses to compress each geotiff, or 'ALL_CPUS'. (Default: ALL_CPUS)")
+    parser.add_argument("--no_predictor", action="store_true", default=False, help="Don't use a predictor when compressing. (Default: use one)")
+    parser.add_argument("--overviews", "-o", action="store_true", default=False, help="Add internal overviews to a 'tiled' geotiff.")
+    parser.add_argument("--verbose", "-v", action="store_true", default=False, help="Print a line for each file converted.")
+
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = read_and_parse_args()
+
+    defer_scaling = False
+    if args.output_type.lower() in ("float", "f"):
+        out_type = float
+    elif args.output_type.lower() == "float32":
+        out_type = numpy.float32
+    elif args.output_type.lower() == "native":
+        out_type = float
+        defer_scaling = True
+    elif args.output_type.lower() in ("int", "i", "d"):
+        out_type = int
+    else:
+        raise ValueError("Uknown output_type (can be: 'int','i','d','float','f','float32', or 'native'):", str(args.output_type))
+
+    if args.multiplier.lower().strip() != "auto":
+        multiplier = float(args.multiplier)
+    else:
+        multiplier = args.multiplier
+
+    results, stats = convert_bins_pipelined(args.src,
+                                            dest_dir = args.dest,
+                                            prefetch = args.prefetch,
+                                            queue_depth = args.queue_depth,
+                                            read_threads = args.read_threads,
+                                            decode_threads = args.decode_threads,
+                                            write_threads = args.write_threads,
+                                            verbose = args.verbose,
+                                            header_size = args.header_size,
+                                            element_size = args.element_size,
+                                            resolution = args.resolution,
+                                            hemisphere = args.hemisphere,
+                                            nodata = args.nodata,
+                                            signed = args.signed,
+                                            return_type = out_type,
+                                            defer_scaling = defer_scaling,
+                                            multiplier = multiplier,
+                                            byteorder = args.byteorder,
+                                            bbox = args.bbox,
+                                            profile = args.profile,
+                                            compress = args.compress,
+                                            predictor = not args.no_predictor,
+                                            blocksize = args.blocksize,
+                                            num_threads = args.threads,
+                                            overviews = True if args.overviews else None)
+    print_pipeline_report(results, stats)
+
+    if len([r for r in results if not r["success"]]) > 0:
+        sys.exit(1)
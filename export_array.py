@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Fri Oct 16 22:30:35 2026
+"""
+import numpy
+import sys
+import itertools
+import io
+
+# Formats handled by output_array():
+#   "txt" - Space-delimited text, one line per grid row.
+#   "csv" - Comma-delimited text, one line per grid row. Or, with x & y coordinates,
+#           one "x,y,value" line per grid cell (with a header line).
+#   "npy" - A numpy .npy file (readable with numpy.load()).
+#   "bin" - Raw binary values in native byte order, row by row, no header.
+EXPORT_FORMATS = ("txt", "csv", "npy", "bin")
+
+# Number of grid rows formatted & written at a time.
+DEFAULT_EXPORT_CHUNK_ROWS = 256
+
+# Size of the write buffer on output files.
+EXPORT_BUFFER_SIZE = 2**20
+
+def get_text_format(dtype, precision=None):
+    """Return the printf-style format for writing values of the given dtype as text.
+
+    Integers are written as integers. Floats are written with "precision" decimal
+    places, or if precision is None, in the shortest form that reads back to the
+    same value (e.g. "273.1"). The latter is several times slower to write.
+    """
+    dtype = numpy.dtype(dtype)
+    if numpy.issubdtype(dtype, numpy.integer) or dtype == numpy.bool_:
+        return "%d"
+    if precision is None:
+        return "%s"
+    return "%.{0}f".format(int(precision))
+
+def output_array(array,
+                 dest=None,
+                 format="txt",
+                 precision=None,
+                 x_vector=None,
+                 y_vector=None,
+                 chunk_rows=DEFAULT_EXPORT_CHUNK_ROWS):
+    """Write a 2D array to stdout, a file, or a file-like object, in one of the EXPORT_FORMATS.
+
+    Text is formatted and written a chunk of rows at a time, rather than a value at a
+    time, so exports run much closer to disk speed than to print() speed.
+
+    dest = File name to write to, a binary file-like object, or None (or "-") for stdout.
+
+    format = "txt", "csv", "npy" or "bin". (See EXPORT_FORMATS above.)
+
+    precision = Number of decimal places for floating-point values in "txt" and "csv"
+                output. If None, floats are written in full (slower).
+
+    x_vector, y_vector = The x (column) and y (row) coordinates of the grid, e.g. from
+                convert_bin_to_gtif.retrieve_ssmi_grid_coords(). If given, "csv" output
+                is written as one "x,y,value" line per grid cell.
+
+    Returns: None
+    """
+    format = format.strip().lower()
+    if format not in EXPORT_FORMATS:
+        raise ValueError("Unknown export format '{0}'. Must be one of {1}".format(format, EXPORT_FORMATS))
+    if array.ndim != 2:
+        raise ValueError("Can only export a 2D array, not {0}D.".format(array.ndim))
+
+    close_stream = False
+    if dest is None or dest == "-":
+        # Anything already printed must come out before what we write to the underlying buffer.
+        sys.stdout.flush()
+        stream = sys.stdout.buffer
+    elif hasattr(dest, "write"):
+        stream = dest
+    else:
+        stream = open(dest, "wb", buffering=EXPORT_BUFFER_SIZE)
+        close_stream = True
+
+    try:
+        if format == "npy":
+            numpy.save(stream, array)
+
+        elif format == "bin":
+            native_array = array.astype(array.dtype.newbyteorder("="), copy=False)
+            for start in range(0, native_array.shape[0], chunk_rows):
+                stream.write(numpy.ascontiguousarray(native_array[start:start+chunk_rows]).data)
+
+        elif format == "csv" and (x_vector is not None or y_vector is not None):
+            _write_xy_csv(array, stream, precision, x_vector, y_vector, chunk_rows)
+
+        else:
+            delimiter = "," if format == "csv" else " "
+            value_format = get_text_format(array.dtype, precision=precision)
+            row_format = delimiter.join([value_format] * array.shape[1]) + "\n"
+            for start in range(0, array.shape[0], chunk_rows):
+                chunk = array[start:start+chunk_rows]
+                # Format the whole chunk with one string operation.
+                stream.write(((row_format * chunk.shape[0]) % tuple(chunk.ravel().tolist())).encode("ascii"))
+
+        stream.flush()
+    finally:
+        if close_stream:
+            stream.close()
+
+    return
+
+def _write_xy_csv(array, stream, precision, x_vector, y_vector, chunk_rows):
+    """Write one "x,y,value" csv line per grid cell."""
+    if x_vector is None or y_vector is None:
+        raise ValueError("Both x_vector and y_vector are needed to write x,y columns.")
+    if len(x_vector) != array.shape[1] or len(y_vector) != array.shape[0]:
+        raise ValueError("x_vector and y_vector lengths ({0}, {1}) don't match the array shape {2}.".format(
+                         len(x_vector), len(y_vector), array.shape))
+
+    line_format = "%s,%s," + get_text_format(array.dtype, precision=precision) + "\n"
+    x_list = numpy.asarray(x_vector).tolist()
+
+    stream.write(b"x,y,value\n")
+    for start in range(0, array.shape[0], chunk_rows):
+        chunk = array[start:start+chunk_rows]
+        y_list = numpy.asarray(y_vector[start:start+chunk_rows]).tolist()
+        xs = x_list * chunk.shape[0]
+        ys = [y for y in y_list for i in range(chunk.shape[1])]
+        values = itertools.chain.from_iterable(zip(xs, ys, chunk.ravel().tolist()))
+        stream.write(((line_format * len(xs)) % tuple(values)).encode("ascii"))
+
+    return
+
+def testing_export():
+    """Check that output_array() round-trips in every format. Raises AssertionError on a mismatch.
+
+    Writes integer, floating-point and big-endian arrays to memory as txt, csv, npy and
+    bin, a few rows at a time, and reads them back with numpy. Floats written at full
+    precision must read back exactly, and to the given number of decimal places otherwise.
+    """
+    random_state = numpy.random.RandomState(0)
+    arrays = [random_state.randint(0, 3000, size=(37, 23)).astype(numpy.uint16),
+              random_state.randint(-2**31, 2**31, size=(37, 23)).astype(numpy.int32),
+              random_state.normal(250, 20, size=(37, 23)),
+              (random_state.rand(37, 23) * 100).astype(numpy.float32),
+              random_state.randint(0, 3000, size=(37, 23)).astype(">u2")]
+
+    for array in arrays:
+        for format in EXPORT_FORMATS:
+            for precision in ((None, 2) if format in ("txt", "csv") else (None,)):
+                stream = io.BytesIO()
+                output_array(array, stream, format=format, precision=precision, chunk_rows=5)
+                data = stream.getvalue()
+
+                if format == "npy":
+                    result = numpy.load(io.BytesIO(data))
+                elif format == "bin":
+                    result = numpy.frombuffer(data, dtype=array.dtype.newbyteorder("=")).reshape(array.shape)
+                else:
+                    result = numpy.loadtxt(io.StringIO(data.decode("ascii")), delimiter="," if format == "csv" else None,
+                                           dtype=array.dtype.newbyteorder("="), ndmin=2)
+
+                assert result.shape == array.shape, (array.dtype, format, result.shape)
+                if precision is None:
+                    assert numpy.array_equal(result, array), (array.dtype, format)
+                else:
+                    assert numpy.allclose(result, array, rtol=0, atol=0.5 * 10**-precision), (array.dtype, format, precision)
+
+    # x,y,value csv: one line per cell, in row order.
+    array = arrays[0]
+    x_vector = numpy.arange(array.shape[1]) * 25.0
+    y_vector = -numpy.arange(array.shape[0]) * 25.0
+    stream = io.BytesIO()
+    output_array(array, stream, format="csv", x_vector=x_vector, y_vector=y_vector, chunk_rows=5)
+    lines = stream.getvalue().decode("ascii").splitlines()
+    assert lines[0] == "x,y,value", lines[0]
+    xyz = numpy.loadtxt(lines[1:], delimiter=",")
+    y_grid, x_grid = numpy.meshgrid(y_vector, x_vector, indexing="ij")
+    assert numpy.array_equal(xyz, numpy.column_stack((x_grid.ravel(), y_grid.ravel(), array.ravel())))
+
+    print(len(arrays), "arrays round-trip in", len(EXPORT_FORMATS), "formats.")
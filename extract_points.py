@@ -0,0 +1,307 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Fri Oct 16 22:35:59 2026
+
+Extracts the values at a few points (e.g. buoys or weather stations) from many NSIDC
+.bin files, as a time series, without reading the rest of each grid.
+
+The points are converted to grid rows & cols once, and each file is then read only at
+the byte offsets of those cells: header_size + (row*cols + col)*element_size.
+"""
+import numpy
+import argparse
+import os
+import sys
+import csv
+import concurrent.futures
+
+from read_bin import get_bin_dtype, \
+                     check_bin_file_size, \
+                     scale_raw_array, \
+                     get_date_from_nsidc_filename
+from bin_archives import is_archive_path, read_archive_member
+from convert_bin_to_gtif import resolve_hemisphere_and_resolution, \
+                               resolve_multiplier, \
+                               find_bin_files, \
+                               NSIDC_GRIDSIZES, \
+                               NSIDC_N_GRID_UPPER_LEFT_KM, \
+                               NSIDC_S_GRID_UPPER_LEFT_KM
+from grid_geometry import latlon_to_polar_stereo_km
+
+# Column names of the table written by output_point_table().
+POINT_TABLE_COLUMNS = ("file", "date", "point", "value")
+
+def get_point_rows_cols(x, y, hemisphere, resolution):
+    """Return the (rows, cols, inside) of the NSIDC grid cells holding the points at x,y (km, polar stereographic).
+
+    inside is False for the points outside the grid, whose rows & cols are 0.
+    """
+    UL_x, UL_y = NSIDC_N_GRID_UPPER_LEFT_KM if hemisphere == "N" else NSIDC_S_GRID_UPPER_LEFT_KM
+    n_rows, n_cols = (int(n) for n in NSIDC_GRIDSIZES[(resolution, hemisphere)])
+
+    cols = numpy.floor((numpy.asarray(x, dtype=numpy.float64) - UL_x) / resolution).astype(numpy.int64)
+    rows = numpy.floor((UL_y - numpy.asarray(y, dtype=numpy.float64)) / resolution).astype(numpy.int64)
+
+    inside = (rows >= 0) & (rows < n_rows) & (cols >= 0) & (cols < n_cols)
+    return numpy.where(inside, rows, 0), numpy.where(inside, cols, 0), inside
+
+def read_bin_file_cells(fname,
+                        rows,
+                        cols,
+                        grid_shape,
+                        header_size=0,
+                        element_size=2,
+                        return_type=float,
+                        signed=False,
+                        multiplier=0.1,
+                        byteorder="little"):
+    """Read just the values of the given grid cells from a .bin file, without reading the rest of it.
+
+    rows, cols = Arrays of the row & col of each cell.
+
+    The other parameters are the same as read_NSIDC_bin_file().
+
+    Returns: A 1D array of the (scaled) values, one per cell.
+    """
+    dtype = get_bin_dtype(element_size=element_size, signed=signed, byteorder=byteorder)
+    # A file inside an archive can't be read at an offset, so it's read (decompressed) whole.
+    archive_data = read_archive_member(fname) if is_archive_path(fname) else None
+    grid_shape = check_bin_file_size(fname, grid_shape, header_size=header_size, element_size=element_size,
+                                     file_size=None if archive_data is None else len(archive_data))
+
+    offsets = header_size + (numpy.asarray(rows, dtype=numpy.int64) * grid_shape[1] + numpy.asarray(cols, dtype=numpy.int64)) * element_size
+    # Read the cells in file order, each cell only once.
+    unique_offsets, inverse = numpy.unique(offsets, return_inverse=True)
+
+    if archive_data is not None:
+        raw_array = numpy.frombuffer(archive_data, dtype=dtype, offset=header_size,
+                                     count=int(numpy.prod(grid_shape)))[(unique_offsets - header_size) // element_size][inverse]
+    else:
+        raw_data = bytearray(len(unique_offsets) * element_size)
+        with open(fname, "rb", buffering=0) as f:
+            for i, offset in enumerate(unique_offsets.tolist()):
+                f.seek(offset)
+                raw_data[i*element_size:(i+1)*element_size] = f.read(element_size)
+        raw_array = numpy.frombuffer(raw_data, dtype=dtype)[inverse]
+    return scale_raw_array(raw_array, return_type=return_type, multiplier=multiplier)
+
+def extract_point_values(bin_files,
+                         points,
+                         point_names=None,
+                         latlon=False,
+                         hemisphere=None,
+                         resolution=None,
+                         header_size=0,
+                         element_size=2,
+                         return_type=float,
+                         signed=False,
+                         multiplier="auto",
+                         byteorder="little",
+                         jobs=8,
+                         verbose=False):
+    """Extract the values at a set of points from every one of many .bin files.
+
+    bin_files = A list of .bin files, glob patterns or directories. (See find_bin_files().)
+
+    points = A list of (x, y) points in polar stereographic km, or with latlon=True,
+             of (lat, lon) points in degrees.
+
+    point_names = A name for each point (e.g. a station ID), used in the output table.
+                  Defaults to "x,y" (or "lat,lon") as given.
+
+    jobs = Number of files read at the same time, in threads. (Reading a few bytes from
+           many files is mostly waiting on the disk or network.)
+
+    verbose = If True, print a line for each file read, to stderr (so as not to mix with
+              a table written to stdout). Files that can't be read (or whose grid can't
+              be worked out) are always reported, and left out of the table.
+
+    The other parameters are the same as output_bin_to_gtif(). The hemisphere and
+    resolution are read from each file name unless given, and the points are placed
+    on each file's grid. Points outside a file's grid get NaN values, with a warning
+    (on stderr) once for each grid.
+
+    Returns: A list of (file, date, point name, value) tuples, one per file per point,
+             in file order. The date is a datetime.date, or None if not in the file name.
+    """
+    bin_files = find_bin_files(bin_files, expand_archives=True)
+    points = numpy.asarray(points, dtype=numpy.float64).reshape(-1, 2)
+    if point_names is None:
+        point_names = ["{0:g},{1:g}".format(a, b) for a, b in points]
+    if len(point_names) != len(points):
+        raise ValueError("{0} point names given for {1} points.".format(len(point_names), len(points)))
+    multiplier = resolve_multiplier(multiplier, return_type)
+
+    # The grid of each file. A file whose grid can't be worked out fails on its own, as
+    # does one that can't be read.
+    grids = []
+    for fn in bin_files:
+        try:
+            grids.append(resolve_hemisphere_and_resolution(fn, hemisphere=hemisphere, resolution=resolution))
+        except Exception as e:
+            grids.append(e)
+
+    # The row & col of each point, computed once for each grid the files are on.
+    rows_cols = {}
+    for grid in set([g for g in grids if not isinstance(g, Exception)]):
+        grid_hemisphere, grid_resolution = grid
+        try:
+            if latlon:
+                x, y = latlon_to_polar_stereo_km(points[:,0], points[:,1], grid_hemisphere)
+            else:
+                x, y = points[:,0], points[:,1]
+            rows_cols[grid] = get_point_rows_cols(x, y, grid_hemisphere, grid_resolution)
+        except Exception as e:
+            rows_cols[grid] = e
+            continue
+        inside = rows_cols[grid][2]
+        if not numpy.all(inside):
+            print("{0} of {1} points are outside the {2} {3} km grid, and get NaN values on it: {4}".format(
+                  numpy.count_nonzero(~inside), len(inside), grid_hemisphere, grid_resolution,
+                  ", ".join([str(point_names[i]) for i in numpy.flatnonzero(~inside)])), file=sys.stderr)
+
+    def read_file(i):
+        if isinstance(grids[i], Exception):
+            return grids[i]
+        if isinstance(rows_cols[grids[i]], Exception):
+            return rows_cols[grids[i]]
+        grid_hemisphere, grid_resolution = grids[i]
+        rows, cols, inside = rows_cols[grids[i]]
+        try:
+            cell_values = read_bin_file_cells(bin_files[i],
+                                              rows[inside],
+                                              cols[inside],
+                                              NSIDC_GRIDSIZES[(grid_resolution, grid_hemisphere)],
+                                              header_size=header_size,
+                                              element_size=element_size,
+                                              return_type=return_type,
+                                              signed=signed,
+                                              multiplier=multiplier,
+                                              byteorder=byteorder)
+        except Exception as e:
+            return e
+        # Points outside the grid get NaN, in their place among the others.
+        cell_values = iter(cell_values.tolist())
+        return [next(cell_values) if is_inside else numpy.nan for is_inside in inside]
+
+    table = []
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(int(jobs), 1)) as executor:
+        for i, values in enumerate(executor.map(read_file, range(len(bin_files)))):
+            if isinstance(values, Exception):
+                print("[{0}/{1}] FAILED {2}: {3}: {4}".format(i+1, len(bin_files), bin_files[i], type(values).__name__, str(values)), file=sys.stderr)
+                continue
+            date = get_date_from_nsidc_filename(bin_files[i])
+            table.extend(zip([bin_files[i]] * len(point_names), [date] * len(point_names), point_names, values))
+            if verbose:
+                print("[{0}/{1}] {2}".format(i+1, len(bin_files), bin_files[i]), file=sys.stderr)
+
+    return table
+
+def output_point_table(table, dest=None):
+    """Write the table from extract_point_values() as csv, with a "file,date,point,value" header line.
+
+    dest = File name to write to, or None (or "-") for stdout.
+    """
+    if dest is None or dest == "-":
+        stream = sys.stdout
+    else:
+        stream = open(dest, "w", newline="")
+
+    try:
+        writer = csv.writer(stream, lineterminator="\n")
+        writer.writerow(POINT_TABLE_COLUMNS)
+        writer.writerows([(os.path.basename(fname), "" if date is None else date.isoformat(), name, value)
+                          for fname, date, name, value in table])
+        stream.flush()
+    finally:
+        if stream is not sys.stdout:
+            stream.close()
+
+    return
+
+def read_points_file(points_file):
+    """Read points from a csv file with a header line, and columns "name,x,y" or "name,lat,lon".
+
+    Returns: (points, point_names, latlon)
+    """
+    with open(points_file, newline="") as f:
+        rows = list(csv.DictReader(f))
+    if len(rows) == 0:
+        raise ValueError("No points in {0}.".format(points_file))
+
+    columns = set([c.strip().lower() for c in rows[0].keys()])
+    latlon = ("lat" in columns and "lon" in columns)
+    if not latlon and not ("x" in columns and "y" in columns):
+        raise ValueError("{0} needs columns 'name,x,y' or 'name,lat,lon'.".format(points_file))
+    rows = [dict([(k.strip().lower(), v) for k, v in row.items()]) for row in rows]
+
+    keys = ("lat", "lon") if latlon else ("x", "y")
+    points = [(float(row[keys[0]]), float(row[keys[1]])) for row in rows]
+    point_names = [row.get("name", "{0},{1}".format(row[keys[0]], row[keys[1]])) for row in rows]
+    return points, point_names, latlon
+
+def read_and_parse_args():
+    """Read and parse command-line arguments."""
+    parser = argparse.ArgumentParser(description="Extracts the values at a few points from many NSIDC flat binary (.bin) data files, reading only those cells of each file. Writes a csv table with a 'file,date,point,value' line per file per point.")
+    parser.add_argument("src", type=str, nargs="+", help="Source .bin files, glob patterns (quoted, e.g. \"tb_f08_1987*.bin\") and/or directories (searched recursively for .bin files).")
+    parser.add_argument("-xy", type=float, nargs=2, action="append", default=[], metavar=("X", "Y"), help="A point, in polar stereographic km. Can be given many times.")
+    parser.add_argument("-latlon", type=float, nargs=2, action="append", default=[], metavar=("LAT", "LON"), help="A point, in degrees latitude & longitude. Can be given many times (but not with -xy).")
+    parser.add_argument("-points_file", type=str, default=None, help="A csv file of points, with a header line and columns 'name,x,y' or 'name,lat,lon'.")
+    parser.add_argument("-dest", "-o", type=str, default=None, help="Output csv file. (Default: write to stdout)")
+    parser.add_argument("-jobs", "-j", type=int, default=8, help="Number of files read at the same time. (Default: 8)")
+    parser.add_argument("-resolution", "-r", type=float, default=None, help="Resolution (km): 6.25, 12.5, or 25. If omitted, it is interpreted from each file name. If cannot be interpreted, defaults to 25 km.")
+    parser.add_argument("-hemisphere", type=str, default=None, help="Hemisphere: one letter, N or S. If omitted, it is interpreted from each file name. If cannot be interpreted, defaults to 'S'.")
+    parser.add_argument("-header_size", "-hs", type=int, default=0, help="Size of .bin file header (in bytes). (Default: 0)")
+    parser.add_argument("-element_size", "-es", type=int, default=2, help="Size of each numerical .bin data element (in bytes). Typically 1 or 2 for NSIDC files. (Default: 2)")
+    parser.add_argument("-output_type", "-ot", default="float", help="Output data type: 'int' or 'float'. Default 'float'.")
+    parser.add_argument("-multiplier","-m", type=str, default="auto", help="Use a multiplier. With 'auto', defaults to 1 (no mod) for integer output and 0.1 for floating-point (2731 -> 273.1).")
+    parser.add_argument("-byteorder", "-bo", type=str, default="little", help="Byte order of each .bin data element: 'little' or 'big'. (Default: little)")
+    parser.add_argument("--signed", "-s", action="store_true", default=False, help="If set, read binary data as signed numbers. (Default: unsigned)")
+    parser.add_argument("--verbose", "-v", action="store_true", default=False, help="Print a line (to stderr) for each file read.")
+
+    args = parser.parse_args()
+    if len(args.xy) + len(args.latlon) == 0 and args.points_file is None:
+        parser.error("give some points, with -xy, -latlon or -points_file")
+    if len(args.xy) > 0 and len(args.latlon) > 0:
+        parser.error("-xy and -latlon points can't be mixed")
+
+    return args
+
+if __name__ == "__main__":
+    args = read_and_parse_args()
+
+    if args.output_type.lower() in ("float", "f"):
+        out_type = float
+    elif args.output_type.lower() in ("int", "i", "d"):
+        out_type = int
+    else:
+        raise ValueError("Uknown output_type (can be: 'int','i','d','float', or 'f'):", str(args.output_type))
+
+    if args.multiplier.lower().strip() != "auto":
+        multiplier = float(args.multiplier)
+    else:
+        multiplier = args.multiplier
+
+    if args.points_file is not None:
+        points, point_names, latlon = read_points_file(args.points_file)
+    else:
+        latlon = len(args.latlon) > 0
+        points = args.latlon if latlon else args.xy
+        point_names = None
+
+    table = extract_point_values(args.src,
+                                 points,
+                                 point_names = point_names,
+                                 latlon = latlon,
+                                 hemisphere = None if args.hemisphere is None else args.hemisphere.strip().upper(),
+                                 resolution = args.resolution,
+                                 header_size = args.header_size,
+                                 element_size = args.element_size,
+                                 return_type = out_type,
+                                 signed = args.signed,
+                                 multiplier = multiplier,
+                                 byteorder = args.byteorder,
+                                 jobs = args.jobs,
+                                 verbose = args.verbose)
+
+    output_point_table(table, args.dest)
@@ -0,0 +1,202 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Fri Oct 16 22:38:12 2026
+
+Coordinates of the NSIDC polar stereographic grids: x/y vectors, 2D x/y grids, and the
+latitude, longitude and area of every pixel, for each (hemisphere, resolution).
+
+Everything is computed with numpy on whole arrays at once, from the polar stereographic
+formulas in Snyder (1987), "Map Projections: A Working Manual" (USGS Professional Paper
+1395), chapter 21. Results are kept in memory after the first call (treat them as
+read-only). The lat/lon and area grids can also be cached on disk as .npy files, which
+are memory-mapped on later runs rather than recomputed.
+"""
+import numpy
+import functools
+import os
+import uuid
+
+from convert_bin_to_gtif import NSIDC_GRIDSIZES, \
+                               NSIDC_N_GRID_UPPER_LEFT_KM, \
+                               NSIDC_S_GRID_UPPER_LEFT_KM
+
+# The NSIDC polar stereographic grids (EPSG 3411 & 3412) are on the Hughes 1980 ellipsoid,
+# true at 70 degrees N/S, with the grid's y-axis along 45 W (north) or 0 E (south).
+# See https://nsidc.org/data/polar-stereo/ps_grids.html
+POLAR_STEREO_EARTH_RADIUS_KM = 6378.273
+POLAR_STEREO_ECCENTRICITY = 0.081816153
+POLAR_STEREO_TRUE_SCALE_LAT = 70.0
+POLAR_STEREO_CENTRAL_MERIDIAN = {"N": -45.0, "S": 0.0}
+
+# Directory to cache lat/lon & area grids in, if not given. None (the default) means no disk cache.
+DEFAULT_GRID_CACHE_DIR = os.environ.get("NSIDC_GRID_CACHE_DIR", None)
+
+def _check_grid(hemisphere, resolution):
+    """Return the hemisphere and resolution as "N" or "S", and 6.25, 12.5 or 25.0. Raises ValueError if not an NSIDC grid."""
+    hemisphere = hemisphere.strip().upper()
+    resolution = float(resolution)
+    if (resolution, hemisphere) not in NSIDC_GRIDSIZES:
+        raise ValueError("Unknown grid: hemisphere '{0}', resolution {1} km".format(hemisphere, resolution))
+    return hemisphere, resolution
+
+def _read_only(array):
+    array.flags.writeable = False
+    return array
+
+def _t(phi):
+    """Snyder equation 15-9, for latitudes phi (radians, positive) on the Hughes ellipsoid."""
+    e = POLAR_STEREO_ECCENTRICITY
+    return numpy.tan(numpy.pi/4 - phi/2) / ((1 - e*numpy.sin(phi)) / (1 + e*numpy.sin(phi)))**(e/2)
+
+def _m(phi):
+    """Snyder equation 14-15, for latitudes phi (radians)."""
+    e = POLAR_STEREO_ECCENTRICITY
+    return numpy.cos(phi) / numpy.sqrt(1 - (e*numpy.sin(phi))**2)
+
+def latlon_to_polar_stereo_km(lat, lon, hemisphere):
+    """Convert latitudes & longitudes (degrees) to the x,y (km) polar stereographic coordinates of the NSIDC grids.
+
+    lat, lon = Numbers or arrays of numbers. All in the given hemisphere ("N" or "S").
+
+    Returns: (x, y) in km, as arrays the shape of lat & lon.
+    """
+    hemisphere = hemisphere.strip().upper()
+    sign = 1.0 if hemisphere == "N" else -1.0
+    lat = numpy.radians(sign * numpy.asarray(lat, dtype=numpy.float64))
+    lon = numpy.radians(numpy.asarray(lon, dtype=numpy.float64) - POLAR_STEREO_CENTRAL_MERIDIAN[hemisphere])
+    if numpy.any(lat < 0):
+        raise ValueError("Latitudes must all be in the {0} hemisphere.".format("northern" if sign > 0 else "southern"))
+
+    # Snyder equation 21-34.
+    true_lat = numpy.radians(POLAR_STEREO_TRUE_SCALE_LAT)
+    rho = POLAR_STEREO_EARTH_RADIUS_KM * _m(true_lat) * _t(lat) / _t(true_lat)
+
+    x = rho * numpy.sin(lon)
+    y = -sign * rho * numpy.cos(lon)
+    return x, y
+
+def polar_stereo_km_to_latlon(x, y, hemisphere):
+    """Convert x,y (km) polar stereographic coordinates of the NSIDC grids to latitudes & longitudes (degrees).
+
+    Returns: (lat, lon) in degrees, as arrays the shape of x & y. Longitudes are in [-180, 180).
+    """
+    hemisphere = hemisphere.strip().upper()
+    sign = 1.0 if hemisphere == "N" else -1.0
+    x = numpy.asarray(x, dtype=numpy.float64)
+    y = numpy.asarray(y, dtype=numpy.float64)
+    e2 = POLAR_STEREO_ECCENTRICITY**2
+
+    # Snyder equations 21-38, 21-39, 7-13 and 3-5.
+    true_lat = numpy.radians(POLAR_STEREO_TRUE_SCALE_LAT)
+    rho = numpy.hypot(x, y)
+    t = rho * _t(true_lat) / (POLAR_STEREO_EARTH_RADIUS_KM * _m(true_lat))
+    chi = numpy.pi/2 - 2*numpy.arctan(t)
+    lat = chi + (e2/2 + 5*e2**2/24 + e2**3/12 + 13*e2**4/360) * numpy.sin(2*chi) \
+              + (7*e2**2/48 + 29*e2**3/240 + 811*e2**4/11520) * numpy.sin(4*chi) \
+              + (7*e2**3/120 + 81*e2**4/1120) * numpy.sin(6*chi) \
+              + (4279*e2**4/161280) * numpy.sin(8*chi)
+
+    lon = numpy.degrees(numpy.arctan2(x, -sign * y)) + POLAR_STEREO_CENTRAL_MERIDIAN[hemisphere]
+    lon = (lon + 180.0) % 360.0 - 180.0
+    return sign * numpy.degrees(lat), lon
+
+def get_polar_stereo_scale_factor(lat, hemisphere):
+    """Return the (point) scale factor of the NSIDC polar stereographic projection at the given latitudes (degrees).
+
+    Lengths on the grid are this much longer than on the ground. (1.0 at 70 degrees N/S.)
+    """
+    hemisphere = hemisphere.strip().upper()
+    sign = 1.0 if hemisphere == "N" else -1.0
+    lat = numpy.radians(sign * numpy.asarray(lat, dtype=numpy.float64))
+    e = POLAR_STEREO_ECCENTRICITY
+    true_lat = numpy.radians(POLAR_STEREO_TRUE_SCALE_LAT)
+
+    # Snyder equation 21-32 (with rho from 21-34), and 21-35 at the pole itself.
+    m_c, t_c = _m(true_lat), _t(true_lat)
+    at_pole = numpy.isclose(lat, numpy.pi/2)
+    m = numpy.where(at_pole, 1.0, _m(lat))
+    k = numpy.where(at_pole,
+                    m_c * numpy.sqrt((1+e)**(1+e) * (1-e)**(1-e)) / (2 * t_c),
+                    m_c * _t(lat) / (t_c * m))
+    return k
+
+@functools.lru_cache(maxsize=None)
+def get_grid_xy_vectors(hemisphere, resolution, cell_centers=False):
+    """Return the (x_vector, y_vector) coordinates (km) of the columns & rows of an NSIDC grid.
+
+    cell_centers = If False (the default), the coordinates of the upper-left corner of each
+                   cell, as retrieve_ssmi_grid_coords() returns. If True, of the center of each cell.
+    """
+    hemisphere, resolution = _check_grid(hemisphere, resolution)
+    UL_corner = NSIDC_N_GRID_UPPER_LEFT_KM if hemisphere == "N" else NSIDC_S_GRID_UPPER_LEFT_KM
+    gridsize_yx = NSIDC_GRIDSIZES[(resolution, hemisphere)]
+    # Keep integer coordinates for the 25 km grid, as they've always been.
+    step = int(resolution) if resolution == int(resolution) else resolution
+
+    x_vector = numpy.arange(UL_corner[0], UL_corner[0]+(step*gridsize_yx[1]), step=step)
+    y_vector = numpy.arange(UL_corner[1], UL_corner[1]+(-step*gridsize_yx[0]), step=-step)
+    if cell_centers:
+        x_vector = x_vector + resolution/2
+        y_vector = y_vector - resolution/2
+
+    return _read_only(x_vector), _read_only(y_vector)
+
+@functools.lru_cache(maxsize=None)
+def get_grid_xy(hemisphere, resolution, cell_centers=True):
+    """Return 2D (x, y) arrays (km) of the center (or with cell_centers=False, the upper-left
+    corner) of every cell of an NSIDC grid, each (rows, cols) in shape."""
+    x_vector, y_vector = get_grid_xy_vectors(hemisphere, resolution, cell_centers=cell_centers)
+    x, y = numpy.meshgrid(x_vector, y_vector)
+    return _read_only(x), _read_only(y)
+
+def _cached_grid(name, hemisphere, resolution, cache_dir, compute):
+    """Load a grid from "cache_dir" (memory-mapped), or compute it (and save it there, if cache_dir isn't None)."""
+    if cache_dir is None:
+        return _read_only(compute())
+
+    cache_file = os.path.join(cache_dir, "nsidc_{0}_{1:g}km_{2}.npy".format(hemisphere.lower(), resolution, name))
+    if os.path.exists(cache_file):
+        return numpy.load(cache_file, mmap_mode="r")
+
+    array = compute()
+    if not os.path.exists(cache_dir):
+        os.makedirs(cache_dir, exist_ok=True)
+    # Write under a temporary name first, so that a half-written file is never loaded.
+    temp_file = "{0}.{1}.tmp.npy".format(os.path.splitext(cache_file)[0], uuid.uuid4().hex)
+    numpy.save(temp_file, array)
+    os.replace(temp_file, cache_file)
+    return numpy.load(cache_file, mmap_mode="r")
+
+@functools.lru_cache(maxsize=None)
+def get_grid_latlon(hemisphere, resolution, cache_dir=DEFAULT_GRID_CACHE_DIR):
+    """Return 2D (lat, lon) arrays (degrees) of the center of every cell of an NSIDC grid.
+
+    cache_dir = A directory to cache the arrays in as .npy files. If they're already
+                there, they're memory-mapped instead of computed. If None, they're
+                computed (once per run) and not saved.
+    """
+    hemisphere, resolution = _check_grid(hemisphere, resolution)
+    x, y = get_grid_xy(hemisphere, resolution, cell_centers=True)
+    latlon = {}
+    def compute(name):
+        if len(latlon) == 0:
+            latlon["lat"], latlon["lon"] = polar_stereo_km_to_latlon(x, y, hemisphere)
+        return latlon[name]
+
+    lat = _cached_grid("lat", hemisphere, resolution, cache_dir, lambda: compute("lat"))
+    lon = _cached_grid("lon", hemisphere, resolution, cache_dir, lambda: compute("lon"))
+    return lat, lon
+
+@functools.lru_cache(maxsize=None)
+def get_grid_area(hemisphere, resolution, cache_dir=DEFAULT_GRID_CACHE_DIR):
+    """Return a 2D array of the area (km^2, on the ground) of every cell of an NSIDC grid.
+
+    Each cell is resolution x resolution km on the grid, shrunk by the square of the
+    projection's scale factor at the cell center. cache_dir is as in get_grid_latlon().
+    """
+    hemisphere, resolution = _check_grid(hemisphere, resolution)
+    def compute():
+        lat, lon = get_grid_latlon(hemisphere, resolution, cache_dir=cache_dir)
+        return resolution**2 / get_polar_stereo_scale_factor(lat, hemisphere)**2
+
+    return _cached_grid("area", hemisphere, resolution, cache_dir, compute)
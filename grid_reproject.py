@@ -0,0 +1,328 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Fri Oct 16 23:02:03 2026
+
+Reprojecting NSIDC polar stereographic grids to EASE-Grid 2.0 (EPSG 6931/6932) and to
+regular latitude/longitude (EPSG 4326) grids, with warp maps computed once and reused.
+
+Every daily file of a product is on the same grid, so which source cells (and, for
+bilinear, which weights) make up each target cell is the same for all of them. That
+"warp map" is computed once per (source grid, target grid, method), with vectorized
+projection formulas, and can be cached on disk as .npy files that later runs memory-map.
+Reprojecting a file is then a single numpy gather (take) from the decoded array, rather
+than a warp. A whole (time, rows, cols) stack is reprojected in one call, too:
+
+    target_grid = get_ease2_grid("N", 25)
+    ease2_stack = reproject_grid(tb_stack, "N", 25, target_grid, method="bilinear", nodata=0)
+"""
+import numpy
+import collections
+import functools
+
+from grid_geometry import latlon_to_polar_stereo_km, _cached_grid, DEFAULT_GRID_CACHE_DIR
+from grid_resample import _get_valid_mask, _get_fill_value
+from convert_bin_to_gtif import NSIDC_GRIDSIZES, \
+                               NSIDC_N_GRID_UPPER_LEFT_KM, \
+                               NSIDC_S_GRID_UPPER_LEFT_KM
+from stage_profiler import profile_stage
+
+# Ways to pick each target cell's value from the source grid.
+REPROJECT_METHODS = ("nearest", "bilinear")
+
+# EASE-Grid 2.0 polar grids: Lambert azimuthal equal-area on WGS 84, centered on each pole,
+# 18,000 km across. See https://nsidc.org/data/user-resources/help-center/guide-ease-grids
+EPSG_EASE2_N = 6931
+EPSG_EASE2_S = 6932
+EASE2_EXTENT_KM = 9000.0
+EASE2_RESOLUTIONS = (25.0, 12.5, 6.25, 3.125)
+WGS84_SEMI_MAJOR_AXIS_KM = 6378.137
+WGS84_ECCENTRICITY = 0.081819190842622
+EPSG_LATLON = 4326
+
+# A grid to reproject to: its name (used in cache file names), EPSG code, (rows, cols),
+# and GDAL geotransform (upper-left corner & cell size, in the EPSG's units).
+TargetGrid = collections.namedtuple("TargetGrid", ("name", "epsg", "shape", "geotransform"))
+
+def get_ease2_grid(hemisphere, resolution=25):
+    """Return the TargetGrid of the EASE-Grid 2.0 North or South grid at a resolution (km): 25, 12.5, 6.25 or 3.125."""
+    hemisphere = hemisphere.strip().upper()
+    resolution = float(resolution)
+    if resolution not in EASE2_RESOLUTIONS:
+        raise ValueError("Unknown EASE-Grid 2.0 resolution {0} km. Must be one of {1}".format(resolution, EASE2_RESOLUTIONS))
+    n_cells = int(round(2 * EASE2_EXTENT_KM / resolution))
+    return TargetGrid(name="ease2_{0}_{1:g}km".format(hemisphere.lower(), resolution),
+                      epsg=EPSG_EASE2_N if hemisphere == "N" else EPSG_EASE2_S,
+                      shape=(n_cells, n_cells),
+                      geotransform=(-EASE2_EXTENT_KM * 1000, resolution * 1000, 0, EASE2_EXTENT_KM * 1000, 0, -resolution * 1000))
+
+def get_latlon_grid(hemisphere, resolution=0.25, lat_limit=30.0):
+    """Return the TargetGrid of a regular latitude/longitude grid of one hemisphere's polar region.
+
+    resolution = Cell size, in degrees. Must divide 180 and (90 - lat_limit) evenly.
+    lat_limit = The grid runs from this latitude (degrees from the equator) to the pole.
+    """
+    hemisphere = hemisphere.strip().upper()
+    resolution, lat_limit = float(resolution), abs(float(lat_limit))
+    n_rows, n_cols = (90.0 - lat_limit) / resolution, 360.0 / resolution
+    if abs(n_rows - round(n_rows)) > 1e-9 or abs(n_cols - round(n_cols)) > 1e-9:
+        raise ValueError("A {0} degree grid doesn't fit evenly between {1} and 90 degrees, or around the globe.".format(resolution, lat_limit))
+    top = 90.0 if hemisphere == "N" else -lat_limit
+    return TargetGrid(name="latlon_{0}_{1:g}deg_{2:g}".format(hemisphere.lower(), resolution, lat_limit),
+                      epsg=EPSG_LATLON,
+                      shape=(int(round(n_rows)), int(round(n_cols))),
+                      geotransform=(-180.0, resolution, 0, top, 0, -resolution))
+
+def get_target_grid(target, hemisphere, resolution=None):
+    """Return the TargetGrid for "ease2" or "latlon" in a hemisphere. (A TargetGrid is returned as-is.)
+
+    resolution = km for "ease2" (default 25), degrees for "latlon" (default 0.25).
+    """
+    if isinstance(target, TargetGrid):
+        return target
+    target = target.strip().lower()
+    if target == "ease2":
+        return get_ease2_grid(hemisphere, 25 if resolution is None else resolution)
+    elif target == "latlon":
+        return get_latlon_grid(hemisphere, 0.25 if resolution is None else resolution)
+    raise ValueError("Unknown grid to reproject to: '{0}'. Must be 'ease2' or 'latlon'.".format(target))
+
+def _q(phi):
+    """Snyder equation 3-12, for latitudes phi (radians) on the WGS 84 ellipsoid."""
+    e = WGS84_ECCENTRICITY
+    sin_phi = numpy.sin(phi)
+    return (1 - e**2) * (sin_phi / (1 - (e*sin_phi)**2) - (1 / (2*e)) * numpy.log((1 - e*sin_phi) / (1 + e*sin_phi)))
+
+def latlon_to_ease2_km(lat, lon, hemisphere):
+    """Convert latitudes & longitudes (degrees) to x,y (km) on the EASE-Grid 2.0 North or South grid.
+
+    From the polar aspect of the ellipsoidal Lambert azimuthal equal-area projection,
+    Snyder (1987) equations 24-18 to 24-21.
+    """
+    sign = 1.0 if hemisphere.strip().upper() == "N" else -1.0
+    lat = numpy.radians(numpy.asarray(lat, dtype=numpy.float64))
+    lon = numpy.radians(numpy.asarray(lon, dtype=numpy.float64))
+    q_p = _q(numpy.pi / 2)
+    rho = WGS84_SEMI_MAJOR_AXIS_KM * numpy.sqrt(numpy.maximum(q_p - sign * _q(lat), 0))
+    return rho * numpy.sin(lon), -sign * rho * numpy.cos(lon)
+
+def ease2_km_to_latlon(x, y, hemisphere):
+    """Convert x,y (km) on the EASE-Grid 2.0 North or South grid to latitudes & longitudes (degrees).
+
+    Snyder (1987) equations 24-28, 24-29 and 3-18. Points beyond the projection's outer
+    edge (the opposite pole) get NaN.
+    """
+    sign = 1.0 if hemisphere.strip().upper() == "N" else -1.0
+    x = numpy.asarray(x, dtype=numpy.float64)
+    y = numpy.asarray(y, dtype=numpy.float64)
+    e = WGS84_ECCENTRICITY
+    q_p = _q(numpy.pi / 2)
+    rho = numpy.hypot(x, y)
+    q = sign * (q_p - (rho / WGS84_SEMI_MAJOR_AXIS_KM)**2)
+    with numpy.errstate(invalid="ignore"):
+        beta = numpy.arcsin(q / q_p)
+    # The authalic latitude beta, back to geodetic latitude.
+    lat = beta + ((e**2/3 + 31*e**4/180 + 517*e**6/5040) * numpy.sin(2*beta) +
+                  (23*e**4/360 + 251*e**6/3780) * numpy.sin(4*beta) +
+                  (761*e**6/45360) * numpy.sin(6*beta))
+    lon = numpy.arctan2(x, -sign * y)
+    return numpy.degrees(lat), numpy.degrees(lon)
+
+def _get_target_latlon(target_grid):
+    """Return 2D (lat, lon) arrays (degrees) of the center of every cell of a TargetGrid."""
+    n_rows, n_cols = target_grid.shape
+    x0, dx, _, y0, _, dy = target_grid.geotransform
+    x_vector = x0 + (numpy.arange(n_cols) + 0.5) * dx
+    y_vector = y0 + (numpy.arange(n_rows) + 0.5) * dy
+    x, y = numpy.meshgrid(x_vector, y_vector)
+    if target_grid.epsg == EPSG_LATLON:
+        return y, x
+    elif target_grid.epsg in (EPSG_EASE2_N, EPSG_EASE2_S):
+        return ease2_km_to_latlon(x / 1000.0, y / 1000.0, "N" if target_grid.epsg == EPSG_EASE2_N else "S")
+    raise ValueError("Can't reproject to EPSG {0}.".format(target_grid.epsg))
+
+def _get_source_positions(hemisphere, resolution, target_grid):
+    """Return the (row, col) positions on the source grid (in cells, 0 at the center of the first) of
+    each target cell's center, and whether each is on the source grid at all."""
+    lat, lon = _get_target_latlon(target_grid)
+    sign = 1.0 if hemisphere == "N" else -1.0
+    in_hemisphere = numpy.isfinite(lat) & (sign * numpy.nan_to_num(lat) >= 0)
+    x, y = latlon_to_polar_stereo_km(numpy.where(in_hemisphere, lat, sign * 90.0), lon, hemisphere)
+
+    UL_x, UL_y = NSIDC_N_GRID_UPPER_LEFT_KM if hemisphere == "N" else NSIDC_S_GRID_UPPER_LEFT_KM
+    n_rows, n_cols = (int(n) for n in NSIDC_GRIDSIZES[(resolution, hemisphere)])
+    rows = (UL_y - y) / resolution - 0.5
+    cols = (x - UL_x) / resolution - 0.5
+    on_grid = in_hemisphere & (rows >= -0.5) & (rows < n_rows - 0.5) & (cols >= -0.5) & (cols < n_cols - 0.5)
+    return rows, cols, on_grid
+
+def compute_warp_map(hemisphere, resolution, target_grid, method="nearest"):
+    """Compute the warp map from an NSIDC grid to a TargetGrid. (See get_warp_map(), which caches it.)
+
+    Returns: (index, weights). index holds the flat (row*cols + col) source cell of each
+             target cell, (rows, cols) for "nearest", or (4, rows, cols) for the 4 source
+             cells around each target cell for "bilinear", with weights (4, rows, cols) to
+             add them up with. (None for "nearest".) Target cells off the source grid get
+             index rows*cols, one past the last source cell.
+    """
+    n_rows, n_cols = (int(n) for n in NSIDC_GRIDSIZES[(resolution, hemisphere)])
+    off_grid_index = n_rows * n_cols
+    rows, cols, on_grid = _get_source_positions(hemisphere, resolution, target_grid)
+
+    if method == "nearest":
+        r = numpy.clip(numpy.floor(rows + 0.5), 0, n_rows - 1).astype(numpy.int32)
+        c = numpy.clip(numpy.floor(cols + 0.5), 0, n_cols - 1).astype(numpy.int32)
+        return numpy.where(on_grid, r * n_cols + c, off_grid_index).astype(numpy.int32), None
+
+    elif method == "bilinear":
+        r0 = numpy.floor(numpy.where(on_grid, rows, 0)).astype(numpy.int32)
+        c0 = numpy.floor(numpy.where(on_grid, cols, 0)).astype(numpy.int32)
+        wr = (rows - r0).astype(numpy.float32)
+        wc = (cols - c0).astype(numpy.float32)
+        index = numpy.empty((4,) + target_grid.shape, dtype=numpy.int32)
+        weights = numpy.empty((4,) + target_grid.shape, dtype=numpy.float32)
+        for i, (dr, dc) in enumerate(((0, 0), (0, 1), (1, 0), (1, 1))):
+            r, c = r0 + dr, c0 + dc
+            # Neighbors past the edge of the grid (around the outermost cell centers) are left out.
+            inside = on_grid & (r >= 0) & (r < n_rows) & (c >= 0) & (c < n_cols)
+            index[i] = numpy.where(inside, r * n_cols + c, off_grid_index)
+            weights[i] = numpy.where(inside, (wr if dr else 1 - wr) * (wc if dc else 1 - wc), 0)
+        return index, weights
+
+    raise ValueError("Unknown reprojection method '{0}'. Must be one of {1}".format(method, REPROJECT_METHODS))
+
+@functools.lru_cache(maxsize=None)
+def get_warp_map(hemisphere, resolution, target_grid, method="nearest", cache_dir=DEFAULT_GRID_CACHE_DIR):
+    """Return the warp map from an NSIDC grid to a TargetGrid (see compute_warp_map()), computed once per run.
+
+    cache_dir = A directory to cache the map in as .npy files. If they're already there,
+                they're memory-mapped instead of computed. If None, the map is computed
+                (once per run) and not saved. (As in grid_geometry.get_grid_latlon().)
+    """
+    hemisphere = hemisphere.strip().upper()
+    resolution = float(resolution)
+    method = method.strip().lower()
+    warp_map = {}
+    def compute(name):
+        if len(warp_map) == 0:
+            warp_map["index"], warp_map["weights"] = compute_warp_map(hemisphere, resolution, target_grid, method=method)
+        return warp_map[name]
+
+    name = "warp_{0}_{1}".format(target_grid.name, method)
+    index = _cached_grid(name + "_index", hemisphere, resolution, cache_dir, lambda: compute("index"))
+    if method == "nearest":
+        return index, None
+    weights = _cached_grid(name + "_weights", hemisphere, resolution, cache_dir, lambda: compute("weights"))
+    return index, weights
+
+def apply_warp_map(array, warp_map, nodata=None):
+    """Reproject a (rows, cols) grid, or a (..., rows, cols) stack of them, with a warp map from get_warp_map().
+
+    nodata = Target cells off the source grid get this value. If None, they get NaN, or
+             0 for an integer grid with a "nearest" map. With a "bilinear" map, source
+             cells of this value (and NaN) are left out, too.
+
+    Returns: The (..., target rows, target cols) array. The same type as array for
+             "nearest", or floating-point for "bilinear".
+    """
+    array = numpy.asarray(array)
+    index, weights = warp_map
+    # Add one more "cell" past the end of each grid, holding the fill value, for the index of cells off the grid.
+    flat = array.reshape(array.shape[:-2] + (-1,))
+
+    if weights is None:
+        # Integers have no NaN, so without a nodata value, cells off the grid are 0.
+        if nodata is None and not numpy.issubdtype(array.dtype, numpy.floating):
+            fill_value = 0
+        else:
+            fill_value = _get_fill_value(array.dtype, nodata)
+        fill = numpy.full(flat.shape[:-1] + (1,), fill_value, dtype=array.dtype)
+        return numpy.take(numpy.concatenate((flat, fill), axis=-1), index, axis=-1)
+
+    out_dtype = array.dtype if array.dtype == numpy.float32 else numpy.dtype(numpy.float64)
+    fill = numpy.full(flat.shape[:-1] + (1,), numpy.nan, dtype=out_dtype)
+    # (..., 4, target rows, target cols)
+    values = numpy.take(numpy.concatenate((flat.astype(out_dtype, copy=False), fill), axis=-1), index, axis=-1)
+    valid = _get_valid_mask(values, nodata)
+    cell_weights = numpy.where(valid, weights, 0).astype(out_dtype, copy=False)
+    total_weights = cell_weights.sum(axis=-3)
+    with numpy.errstate(invalid="ignore", divide="ignore"):
+        reprojected = (cell_weights * numpy.where(valid, values, 0)).sum(axis=-3) / total_weights
+    reprojected[total_weights == 0] = _get_fill_value(out_dtype, nodata)
+    return reprojected
+
+def reproject_grid(array, hemisphere, resolution, target_grid, method="nearest", nodata=None, cache_dir=DEFAULT_GRID_CACHE_DIR):
+    """Reproject a (rows, cols) NSIDC grid, or a (..., rows, cols) stack of them, to a TargetGrid.
+
+    hemisphere, resolution = The NSIDC grid of the array ("N" or "S"; 25, 12.5 or 6.25 km).
+    target_grid = A TargetGrid, e.g. from get_ease2_grid() or get_latlon_grid().
+    method = "nearest" (the default) or "bilinear".
+    nodata, cache_dir = As in apply_warp_map() and get_warp_map().
+    """
+    warp_map = get_warp_map(hemisphere.strip().upper(), float(resolution), target_grid, method=method, cache_dir=cache_dir)
+    with profile_stage("reproject") as stage:
+        reprojected = apply_warp_map(array, warp_map, nodata=nodata)
+        stage.add(arrays=[reprojected])
+    return reprojected
+
+def testing_reproject():
+    """Check reproject_grid() on synthetic grids. Raises AssertionError on a mismatch.
+
+    Round-trips points through the EASE-Grid 2.0 formulas, and reprojects integer and
+    floating-point grids of the Northern 25 km grid to the EASE-Grid 2.0 and lat/lon
+    grids with both methods, checking the values picked, the interpolated values, and
+    the fill of target cells off the source grid. Nothing is cached on disk.
+    """
+    random_state = numpy.random.RandomState(0)
+
+    # EASE-Grid 2.0: the pole is at (0,0), and points go there and back again.
+    for hemisphere in ("N", "S"):
+        sign = 1.0 if hemisphere == "N" else -1.0
+        x, y = latlon_to_ease2_km(sign * 90.0, 0.0, hemisphere)
+        assert abs(x) < 1e-6 and abs(y) < 1e-6, (hemisphere, x, y)
+        lat = sign * random_state.uniform(1, 89.9, 1000)
+        lon = random_state.uniform(-179.9, 179.9, 1000)
+        lat2, lon2 = ease2_km_to_latlon(*latlon_to_ease2_km(lat, lon, hemisphere), hemisphere)
+        assert numpy.abs(lat2 - lat).max() < 1e-6, (hemisphere, numpy.abs(lat2 - lat).max())
+        assert numpy.abs(lon2 - lon).max() < 1e-6, (hemisphere, numpy.abs(lon2 - lon).max())
+
+    n_rows, n_cols = (int(n) for n in NSIDC_GRIDSIZES[(25.0, "N")])
+    for target_grid in (get_ease2_grid("N", 25), get_latlon_grid("N", 1.0)):
+        rows, cols, on_grid = _get_source_positions("N", 25.0, target_grid)
+        assert on_grid.any() and not on_grid.all(), target_grid.name
+
+        # Nearest: each target cell gets the value of the source cell its center is in.
+        # Cell numbers as values show exactly which cell was picked.
+        cell_numbers = numpy.arange(n_rows * n_cols).reshape(n_rows, n_cols)
+        expected_cells = numpy.floor(rows + 0.5) * n_cols + numpy.floor(cols + 0.5)
+        for dtype, nodata, fill_value in ((numpy.int32, None, 0),
+                                          (numpy.int32, -1, -1),
+                                          (numpy.float64, None, numpy.nan),
+                                          (numpy.float32, -1.0, -1.0)):
+            nearest = reproject_grid(cell_numbers.astype(dtype), "N", 25, target_grid, nodata=nodata, cache_dir=None)
+            assert nearest.shape == target_grid.shape and nearest.dtype == dtype, (target_grid.name, nearest.shape, nearest.dtype)
+            assert (nearest[on_grid] == expected_cells[on_grid]).all(), (target_grid.name, dtype)
+            off_grid = nearest[~on_grid]
+            assert (numpy.isnan(off_grid) if numpy.isnan(fill_value) else off_grid == fill_value).all(), (target_grid.name, dtype, nodata)
+
+        # Bilinear: a linear field is interpolated exactly between the outer cell centers,
+        # and a (time, rows, cols) stack gives the same as each grid on its own.
+        row_numbers, col_numbers = numpy.mgrid[0:n_rows, 0:n_cols]
+        linear = numpy.stack([3 * row_numbers + 2 * col_numbers + 10 * t for t in range(2)])
+        interior = on_grid & (rows >= 0) & (rows <= n_rows - 1) & (cols >= 0) & (cols <= n_cols - 1)
+        for dtype in (numpy.int32, numpy.float64):
+            bilinear = reproject_grid(linear.astype(dtype), "N", 25, target_grid, method="bilinear", cache_dir=None)
+            assert bilinear.shape == (2,) + target_grid.shape and bilinear.dtype == numpy.float64, (target_grid.name, bilinear.dtype)
+            for t in range(2):
+                error = numpy.abs(bilinear[t][interior] - (3 * rows + 2 * cols + 10 * t)[interior]).max()
+                assert error < 1e-6, (target_grid.name, dtype, error)
+            assert numpy.isnan(bilinear[:, ~on_grid]).all(), (target_grid.name, dtype)
+            assert numpy.isfinite(bilinear[:, on_grid]).all(), (target_grid.name, dtype)
+
+        # Bilinear with nodata: nodata cells are left out, and cells off the grid get nodata.
+        speckled = numpy.ones((n_rows, n_cols), dtype=numpy.uint16)
+        speckled[random_state.rand(n_rows, n_cols) < 0.3] = 0
+        bilinear = reproject_grid(speckled, "N", 25, target_grid, method="bilinear", nodata=0, cache_dir=None)
+        assert (bilinear[~on_grid] == 0).all(), target_grid.name
+        assert numpy.all((bilinear == 0) | numpy.isclose(bilinear, 1)), target_grid.name
+
+    print("Reprojection checks passed.")
@@ -0,0 +1,308 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Fri Oct 16 22:59:18 2026
+
+Resampling between the 25, 12.5 and 6.25 km NSIDC polar stereographic grids.
+
+The grids of each hemisphere are nested: they share the same upper-left corner, and each
+25 km cell is exactly 2x2 12.5 km cells, or 4x4 6.25 km cells. So no general-purpose
+warping is needed. Going to a coarser grid reduces each block of cells with a reshape
+(mean, max or most common value, leaving out nodata & NaN cells), and going to a finer
+grid repeats each cell (nearest) or interpolates between cell centers (bilinear).
+
+Every function works on the last two (rows, cols) axes of an array, so a whole
+(time, rows, cols) stack of grids is resampled in one call:
+
+    tb_25km = resample_grid(tb_12_5km_stack, 12.5, 25, method="mean", nodata=0)
+"""
+import numpy
+
+from stage_profiler import profile_stage
+
+# The resolutions (km) of the nested NSIDC grids.
+RESAMPLE_RESOLUTIONS = (6.25, 12.5, 25.0)
+# Methods of going to a coarser grid, and to a finer one. The first of each is the default.
+DOWNSAMPLE_METHODS = ("mean", "max", "mode")
+UPSAMPLE_METHODS = ("nearest", "bilinear")
+
+def get_resample_factor(from_resolution, to_resolution):
+    """Return (factor, downsample): how many cells of the finer grid span one of the
+    coarser grid along each axis (1, 2 or 4), and whether to_resolution is the coarser one."""
+    from_resolution, to_resolution = float(from_resolution), float(to_resolution)
+    for resolution in (from_resolution, to_resolution):
+        if resolution not in RESAMPLE_RESOLUTIONS:
+            raise ValueError("Can only resample between {0} km grids, not {1} km.".format(
+                             ", ".join([str(r) for r in RESAMPLE_RESOLUTIONS]), resolution))
+    if to_resolution >= from_resolution:
+        return int(round(to_resolution / from_resolution)), to_resolution > from_resolution
+    return int(round(from_resolution / to_resolution)), False
+
+def get_resample_method(from_resolution, to_resolution, method=None):
+    """Check the method of resampling between two resolutions, or pick the default ("mean" down, "nearest" up)."""
+    factor, downsample = get_resample_factor(from_resolution, to_resolution)
+    methods = DOWNSAMPLE_METHODS if downsample else UPSAMPLE_METHODS
+    if method is None:
+        return methods[0]
+    method = method.strip().lower()
+    if factor > 1 and method not in methods:
+        raise ValueError("Unknown method '{0}' to resample from {1} to {2} km. Must be one of {3}".format(
+                         method, from_resolution, to_resolution, methods))
+    return method
+
+def get_resampled_dtype(dtype, from_resolution, to_resolution, method=None):
+    """Return the numpy dtype that resample_grid() returns for an array of the given dtype.
+
+    Averaging and interpolating give floating-point values (float32 for float32 input,
+    otherwise float64). The other methods keep the dtype.
+    """
+    dtype = numpy.dtype(dtype)
+    factor, downsample = get_resample_factor(from_resolution, to_resolution)
+    if factor == 1 or get_resample_method(from_resolution, to_resolution, method) not in ("mean", "bilinear"):
+        return dtype
+    return dtype if dtype == numpy.float32 else numpy.dtype(numpy.float64)
+
+def get_resampled_window(window, from_resolution, to_resolution):
+    """Return the ((row_start, row_stop), (col_start, col_stop)) window of the to_resolution grid
+    covering the same cells as a window of the from_resolution grid.
+
+    Going to a coarser grid, the window must be made of whole coarse cells. Raises ValueError if not.
+    """
+    if window is None:
+        return None
+    factor, downsample = get_resample_factor(from_resolution, to_resolution)
+    if not downsample:
+        return tuple([(start * factor, stop * factor) for start, stop in window])
+    if any([(start % factor) or (stop % factor) for start, stop in window]):
+        raise ValueError("Window {0} doesn't line up with the cells of the {1} km grid.".format(window, to_resolution))
+    return tuple([(start // factor, stop // factor) for start, stop in window])
+
+def _get_valid_mask(array, nodata):
+    """Return a boolean array of the cells that aren't nodata or NaN. Or None if they all are valid by type."""
+    is_float = numpy.issubdtype(array.dtype, numpy.floating)
+    if nodata is not None and not (isinstance(nodata, float) and numpy.isnan(nodata)):
+        valid = (array != nodata)
+        if is_float:
+            valid &= ~numpy.isnan(array)
+        return valid
+    elif is_float:
+        return ~numpy.isnan(array)
+    return None
+
+def _get_fill_value(dtype, nodata):
+    """The value of output cells with no valid input: nodata, or NaN if nodata is None."""
+    if nodata is not None:
+        return nodata
+    if numpy.issubdtype(dtype, numpy.floating):
+        return numpy.nan
+    raise ValueError("Integer grids with no valid values need a nodata value.")
+
+def _to_blocks(array, factor):
+    """View a (..., rows, cols) array as (..., rows/factor, factor, cols/factor, factor) blocks."""
+    *leading_shape, n_rows, n_cols = array.shape
+    if (n_rows % factor) or (n_cols % factor):
+        raise ValueError("Can't split a grid of {0} rows x {1} cols into {2}x{2} blocks.".format(n_rows, n_cols, factor))
+    return array.reshape(tuple(leading_shape) + (n_rows // factor, factor, n_cols // factor, factor))
+
+def block_reduce(array, factor, method="mean", nodata=None):
+    """Reduce each factor x factor block of cells of a (..., rows, cols) array to one cell.
+
+    method = "mean" (of the valid cells), "max", or "mode" (the most common valid value,
+             the smallest of them if there's a tie).
+
+    nodata = Cells of this value are left out, as are NaN cells. A block with no valid
+             cells gets the nodata value (or NaN, if nodata is None).
+
+    Returns: A (..., rows/factor, cols/factor) array.
+    """
+    array = numpy.asarray(array)
+    blocks = _to_blocks(array, factor)
+    block_axes = (-3, -1)
+    valid = _get_valid_mask(array, nodata)
+    valid_blocks = None if valid is None else _to_blocks(valid, factor)
+
+    if method == "mean":
+        out_dtype = array.dtype if array.dtype == numpy.float32 else numpy.dtype(numpy.float64)
+        if valid_blocks is None:
+            return blocks.mean(axis=block_axes, dtype=out_dtype)
+        sums = numpy.where(valid_blocks, blocks, 0).sum(axis=block_axes, dtype=out_dtype)
+        counts = valid_blocks.sum(axis=block_axes)
+        with numpy.errstate(invalid="ignore", divide="ignore"):
+            means = sums / counts
+        means[counts == 0] = _get_fill_value(out_dtype, nodata)
+        return means
+
+    elif method == "max":
+        if valid_blocks is None:
+            return blocks.max(axis=block_axes)
+        lowest = -numpy.inf if numpy.issubdtype(array.dtype, numpy.floating) else numpy.iinfo(array.dtype).min
+        maxes = numpy.where(valid_blocks, blocks, lowest).max(axis=block_axes).astype(array.dtype, copy=False)
+        maxes[~valid_blocks.any(axis=block_axes)] = _get_fill_value(array.dtype, nodata)
+        return maxes
+
+    elif method == "mode":
+        # Put each block's cells in a row of their own: (..., rows/factor, cols/factor, factor*factor)
+        cells = numpy.moveaxis(blocks, -3, -2)
+        cells = cells.reshape(cells.shape[:-2] + (factor * factor,)).astype(numpy.float64)
+        if valid_blocks is not None:
+            cells[~numpy.moveaxis(valid_blocks, -3, -2).reshape(cells.shape)] = numpy.nan
+        # Sorted, equal values are runs (NaNs at the end). Count each value as the length of its run.
+        cells.sort(axis=-1)
+        n = cells.shape[-1]
+        index = numpy.arange(n)
+        run_starts = numpy.ones(cells.shape, dtype=bool)
+        run_starts[..., 1:] = cells[..., 1:] != cells[..., :-1]
+        run_ends = numpy.ones(cells.shape, dtype=bool)
+        run_ends[..., :-1] = run_starts[..., 1:]
+        first = numpy.maximum.accumulate(numpy.where(run_starts, index, 0), axis=-1)
+        last = (n - 1) - numpy.maximum.accumulate(numpy.where(run_ends, (n - 1) - index, 0)[..., ::-1], axis=-1)[..., ::-1]
+        counts = numpy.where(numpy.isnan(cells), 0, last - first + 1)
+        modes = numpy.take_along_axis(cells, counts.argmax(axis=-1)[..., numpy.newaxis], axis=-1)[..., 0]
+
+        no_valid = numpy.isnan(modes)
+        if numpy.any(no_valid):
+            modes[no_valid] = _get_fill_value(array.dtype, nodata)
+        return modes.astype(array.dtype)
+
+    raise ValueError("Unknown block reduction method '{0}'. Must be one of {1}".format(method, DOWNSAMPLE_METHODS))
+
+def _get_bilinear_neighbors(n, factor):
+    """For each of the n*factor finer cells along an axis, the two nearest coarser cells and their weights."""
+    # Position of each fine cell's center, in coarse cells (from the first coarse cell's center).
+    position = numpy.clip((numpy.arange(n * factor) + 0.5) / factor - 0.5, 0, n - 1)
+    i0 = numpy.minimum(numpy.floor(position).astype(numpy.intp), max(n - 2, 0))
+    i1 = numpy.minimum(i0 + 1, n - 1)
+    w1 = position - i0
+    return (i0, 1 - w1), (i1, w1)
+
+def upsample(array, factor, method="nearest", nodata=None):
+    """Split each cell of a (..., rows, cols) array into factor x factor cells.
+
+    method = "nearest" (repeat each cell's value) or "bilinear" (interpolate between the
+             centers of the nearest 2x2 cells, leaving out nodata and NaN cells. Past the
+             outer cell centers, the edge values are used.)
+
+    nodata = For "bilinear", cells of this value are left out, and cells with no valid
+             neighbors get it (or NaN, if nodata is None).
+
+    Returns: A (..., rows*factor, cols*factor) array.
+    """
+    array = numpy.asarray(array)
+    *leading_shape, n_rows, n_cols = array.shape
+
+    if method == "nearest":
+        repeated = numpy.broadcast_to(array[..., :, numpy.newaxis, :, numpy.newaxis],
+                                      tuple(leading_shape) + (n_rows, factor, n_cols, factor))
+        return repeated.reshape(tuple(leading_shape) + (n_rows * factor, n_cols * factor))
+
+    elif method == "bilinear":
+        out_dtype = array.dtype if array.dtype == numpy.float32 else numpy.dtype(numpy.float64)
+        valid = _get_valid_mask(array, nodata)
+        row_neighbors = _get_bilinear_neighbors(n_rows, factor)
+        col_neighbors = _get_bilinear_neighbors(n_cols, factor)
+
+        values = numpy.zeros(tuple(leading_shape) + (n_rows * factor, n_cols * factor), dtype=out_dtype)
+        weights = numpy.zeros(values.shape, dtype=out_dtype) if valid is not None else None
+        for rows, row_weights in row_neighbors:
+            array_rows = array[..., rows, :]
+            valid_rows = None if valid is None else valid[..., rows, :]
+            for cols, col_weights in col_neighbors:
+                weight = numpy.outer(row_weights, col_weights).astype(out_dtype)
+                if valid is None:
+                    values += weight * array_rows[..., cols]
+                else:
+                    weight = numpy.where(valid_rows[..., cols], weight, 0)
+                    values += weight * numpy.where(valid_rows[..., cols], array_rows[..., cols], 0)
+                    weights += weight
+
+        if weights is not None:
+            with numpy.errstate(invalid="ignore", divide="ignore"):
+                values /= weights
+            values[weights == 0] = _get_fill_value(out_dtype, nodata)
+        return values
+
+    raise ValueError("Unknown upsampling method '{0}'. Must be one of {1}".format(method, UPSAMPLE_METHODS))
+
+def resample_grid(array, from_resolution, to_resolution, method=None, nodata=None):
+    """Resample a (rows, cols) grid, or a (..., rows, cols) stack of them, between the 25, 12.5 and 6.25 km NSIDC grids.
+
+    from_resolution, to_resolution = The resolutions (km) of the array, and to resample it to.
+
+    method = "mean" (the default), "max" or "mode" to go to a coarser grid; "nearest"
+             (the default) or "bilinear" to go to a finer one. See block_reduce() and upsample().
+
+    nodata = The nodata value of the array. Nodata (and NaN) cells are left out of every
+             method except "nearest", and output cells with no valid input get this value
+             (or NaN, if None).
+
+    Returns: The resampled array. (See get_resampled_dtype() for its type.) The array
+             itself if the resolutions are the same.
+    """
+    factor, downsample = get_resample_factor(from_resolution, to_resolution)
+    method = get_resample_method(from_resolution, to_resolution, method)
+    if factor == 1:
+        return array
+
+    with profile_stage("resample") as stage:
+        if downsample:
+            resampled = block_reduce(array, factor, method=method, nodata=nodata)
+        else:
+            resampled = upsample(array, factor, method=method, nodata=nodata)
+        stage.add(arrays=[resampled])
+    return resampled
+
+def testing_resample():
+    """Check resample_grid() on small synthetic grids. Raises AssertionError on a mismatch.
+
+    Compares each way of going to a coarser grid, with and without nodata, against a
+    block-by-block reference, and checks going to a finer grid and the windows and
+    dtypes that go with it.
+    """
+    random_state = numpy.random.RandomState(0)
+
+    # Down: every block of a (time, rows, cols) stack, against the same block on its own.
+    stack = random_state.randint(0, 5, size=(3, 8, 12)).astype(numpy.uint16)
+    for nodata in (None, 0):
+        for method in DOWNSAMPLE_METHODS:
+            resampled = resample_grid(stack, 12.5, 25, method=method, nodata=nodata)
+            assert resampled.shape == (3, 4, 6), (method, resampled.shape)
+            assert resampled.dtype == get_resampled_dtype(stack.dtype, 12.5, 25, method), (method, resampled.dtype)
+            for t, i, j in numpy.ndindex(resampled.shape):
+                block = stack[t, 2*i:2*i+2, 2*j:2*j+2].ravel()
+                values = block if nodata is None else block[block != nodata]
+                if len(values) == 0:
+                    expected = nodata
+                elif method == "mean":
+                    expected = values.mean()
+                elif method == "max":
+                    expected = values.max()
+                else:
+                    unique_values, counts = numpy.unique(values, return_counts=True)
+                    expected = unique_values[counts.argmax()]
+                assert numpy.isclose(resampled[t, i, j], expected), (method, nodata, block, resampled[t, i, j])
+
+    # NaN cells are left out of a floating-point grid, and a block of all NaN stays NaN.
+    grid = random_state.rand(16, 8)
+    grid[0, 0] = numpy.nan
+    grid[4:8, 4:8] = numpy.nan
+    resampled = resample_grid(grid, 6.25, 25)
+    assert numpy.isclose(resampled[0, 0], numpy.nanmean(grid[:4, :4])), resampled[0, 0]
+    assert numpy.isnan(resampled[1, 1]), resampled[1, 1]
+
+    # Up: "nearest" repeats each cell, and "bilinear" hits each coarse value at its cell center.
+    nearest = resample_grid(stack, 25, 6.25)
+    assert nearest.shape == (3, 32, 48) and nearest.dtype == stack.dtype, (nearest.shape, nearest.dtype)
+    assert (nearest[:, ::4, ::4] == stack).all() and (nearest[:, 3::4, 3::4] == stack).all()
+    linear = numpy.add.outer(3.0 * numpy.arange(5), 2.0 * numpy.arange(7))
+    bilinear = resample_grid(linear, 25, 12.5, method="bilinear")
+    fine_rows = numpy.clip((numpy.arange(10) + 0.5) / 2 - 0.5, 0, 4)
+    fine_cols = numpy.clip((numpy.arange(14) + 0.5) / 2 - 0.5, 0, 6)
+    assert numpy.allclose(bilinear, numpy.add.outer(3 * fine_rows, 2 * fine_cols))
+    linear[2, 3] = -1
+    bilinear = resample_grid(linear, 25, 12.5, method="bilinear", nodata=-1)
+    assert numpy.isfinite(bilinear).all() and not (bilinear == -1).any()
+
+    assert get_resampled_window(((4, 12), (8, 16)), 6.25, 25) == ((1, 3), (2, 4))
+    assert get_resampled_window(((1, 3), (2, 4)), 25, 6.25) == ((4, 12), (8, 16))
+    assert resample_grid(stack, 25, 25) is stack
+
+    print("Resampling checks passed.")
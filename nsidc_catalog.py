@@ -0,0 +1,426 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Fri Oct 16 22:47:35 2026
+
+A catalog of NSIDC .bin files, in a local SQLite database, for picking out files by
+product, platform, date, hemisphere and channel without walking the directory tree.
+
+A scan walks the tree once and records every .bin file (and every .bin file inside a
+.gz, .zip or .tar archive) with what its name says about it (see
+read_bin.parse_nsidc_filename()), its size and its modification time. Rescans skip the
+directories whose modification time hasn't changed (no files added, removed or renamed in
+them), and only re-read the files in the rest whose modification time has, so rescanning
+a large, mostly unchanged tree is quick. An archive that can't be read (e.g. one that's
+still downloading) is skipped with a warning, and tried again on the next scan. Example:
+
+    scan_catalog("nsidc.db", "/data/nsidc")
+    files = select_catalog_files("nsidc.db", product="0001", hemisphere="S", channel="19H",
+                                 start="1995-01-01", end="1995-12-31")
+"""
+import argparse
+import datetime
+import os
+import sqlite3
+import sys
+import tarfile
+import zipfile
+
+from read_bin import parse_nsidc_filename
+from bin_archives import get_archive_type, list_archive_members
+
+# Columns of the "files" table. "path" is the .bin file ("archive::member" inside an archive),
+# "archive" the file on disk (the same as path, for a plain .bin file), and "directory" the
+# directory that's in. "size" is the (uncompressed) size of the .bin file, and "mtime_ns" the
+# modification time of the file on disk. The others are from parse_nsidc_filename(), with
+# dates as "YYYY-MM-DD" text, and are NULL for files whose names it doesn't recognize.
+CATALOG_COLUMNS = ("path", "archive", "directory", "product", "platform", "date", "period",
+                   "hemisphere", "channel", "resolution", "size", "mtime_ns")
+
+# Fields that files can be selected by, in select_catalog_files() and "-select key=value".
+CATALOG_SELECT_KEYS = ("product", "platform", "hemisphere", "channel", "resolution", "period", "start", "end")
+
+_CATALOG_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY,
+                                  archive TEXT NOT NULL,
+                                  directory TEXT NOT NULL,
+                                  product TEXT,
+                                  platform TEXT,
+                                  date TEXT,
+                                  period TEXT,
+                                  hemisphere TEXT,
+                                  channel TEXT,
+                                  resolution REAL,
+                                  size INTEGER,
+                                  mtime_ns INTEGER);
+CREATE INDEX IF NOT EXISTS files_by_product ON files (product, hemisphere, date);
+CREATE INDEX IF NOT EXISTS files_by_date ON files (date);
+CREATE INDEX IF NOT EXISTS files_by_archive ON files (archive);
+CREATE INDEX IF NOT EXISTS files_by_directory ON files (directory);
+CREATE TABLE IF NOT EXISTS directories (path TEXT PRIMARY KEY,
+                                        parent TEXT,
+                                        mtime_ns INTEGER);
+CREATE INDEX IF NOT EXISTS directories_by_parent ON directories (parent);
+"""
+
+def open_catalog(catalog_file):
+    """Open (or create) a catalog database. Returns an sqlite3 connection."""
+    connection = sqlite3.connect(catalog_file)
+    connection.executescript(_CATALOG_SCHEMA)
+    return connection
+
+def _is_catalog_file(fname, extension=".bin"):
+    return fname.lower().endswith(extension.lower()) or get_archive_type(fname) is not None
+
+def _catalog_file(connection, file_path, mtime_ns, size):
+    """(Re)catalog one .bin file or archive on disk. Returns the number of .bin files cataloged.
+
+    An archive that can't be read (corrupt, truncated or unreadable) is left out of the
+    catalog, with a warning on stderr, and None is returned. Since its modification time
+    isn't recorded, the next scan tries it again.
+    """
+    connection.execute("DELETE FROM files WHERE archive = ?", (file_path,))
+
+    if get_archive_type(file_path) is None:
+        members = [(file_path, size)]
+    else:
+        try:
+            members = list_archive_members(file_path, with_sizes=True)
+        except (OSError, zipfile.BadZipFile, tarfile.TarError, EOFError) as e:
+            print("Skipping {0}, which can't be read ({1}: {2}). It will be tried again on the next scan.".format(
+                  file_path, type(e).__name__, e), file=sys.stderr)
+            return None
+
+    rows = []
+    directory = os.path.dirname(file_path)
+    for path, member_size in members:
+        fields = parse_nsidc_filename(path) or {}
+        date = fields.get("date")
+        rows.append((path, file_path, directory,
+                     fields.get("product"),
+                     fields.get("platform"),
+                     None if date is None else date.isoformat(),
+                     fields.get("period"),
+                     fields.get("hemisphere"),
+                     fields.get("channel"),
+                     fields.get("resolution"),
+                     member_size,
+                     mtime_ns))
+
+    connection.executemany("INSERT OR REPLACE INTO files VALUES ({0})".format(", ".join(["?"] * len(CATALOG_COLUMNS))), rows)
+    return len(rows)
+
+def _remove_directory(connection, dir_path):
+    """Remove a directory, and everything under it, from the catalog. Returns the number of .bin files removed."""
+    prefix = os.path.join(dir_path, "")
+    n_removed = connection.execute("DELETE FROM files WHERE directory = ? OR substr(directory, 1, ?) = ?", (dir_path, len(prefix), prefix)).rowcount
+    connection.execute("DELETE FROM directories WHERE path = ? OR substr(path, 1, ?) = ?", (dir_path, len(prefix), prefix))
+    return n_removed
+
+def scan_catalog(catalog_file, paths, full=False, verbose=False):
+    """Add the .bin files (and archives of them) under some directories to a catalog, or bring it up to date.
+
+    catalog_file = The SQLite database file. Created if it doesn't exist.
+
+    paths = A directory or file, or a list of them. Directories are searched recursively.
+
+    full = If True, check the modification time of every file, even in directories that
+           haven't changed since the last scan. (Only needed to catch files that were
+           rewritten in place.)
+
+    Returns: A dictionary of counts: "directories_scanned", "directories_skipped" (unchanged
+             since the last scan), "files_cataloged" (new or changed .bin files),
+             "files_removed" and "archives_failed" (archives that couldn't be read, and
+             were skipped until the next scan).
+    """
+    if isinstance(paths, str):
+        paths = [paths]
+    counts = {"directories_scanned": 0, "directories_skipped": 0, "files_cataloged": 0, "files_removed": 0, "archives_failed": 0}
+
+    def add_file(file_path, stat):
+        n_cataloged = _catalog_file(connection, file_path, stat.st_mtime_ns, stat.st_size)
+        if n_cataloged is None:
+            counts["archives_failed"] += 1
+            return False
+        counts["files_cataloged"] += n_cataloged
+        return True
+
+    connection = open_catalog(catalog_file)
+    try:
+        dirs_to_scan = []
+        for path in paths:
+            path = os.path.abspath(path)
+            if os.path.isdir(path):
+                dirs_to_scan.append(path)
+            else:
+                add_file(path, os.stat(path))
+
+        while len(dirs_to_scan) > 0:
+            dir_path = dirs_to_scan.pop()
+            dir_mtime_ns = os.stat(dir_path).st_mtime_ns
+            row = connection.execute("SELECT mtime_ns FROM directories WHERE path = ?", (dir_path,)).fetchone()
+
+            # Nothing's been added to or removed from an unchanged directory, so just look in its subdirectories.
+            if row is not None and row[0] == dir_mtime_ns and not full:
+                counts["directories_skipped"] += 1
+                dirs_to_scan.extend([child for (child,) in
+                                     connection.execute("SELECT path FROM directories WHERE parent = ?", (dir_path,))])
+                continue
+
+            counts["directories_scanned"] += 1
+            known_files = dict(connection.execute("SELECT archive, max(mtime_ns) FROM files WHERE directory = ? GROUP BY archive", (dir_path,)))
+            known_dirs = set([child for (child,) in connection.execute("SELECT path FROM directories WHERE parent = ?", (dir_path,))])
+
+            subdirs = []
+            all_files_read = True
+            with os.scandir(dir_path) as entries:
+                for entry in sorted(entries, key=lambda e: e.name):
+                    if entry.is_dir():
+                        subdirs.append(entry.path)
+                    elif entry.is_file() and _is_catalog_file(entry.name):
+                        stat = entry.stat()
+                        if known_files.pop(entry.path, None) != stat.st_mtime_ns:
+                            all_files_read = add_file(entry.path, stat) and all_files_read
+
+            # Whatever's left wasn't found this time.
+            for archive in known_files:
+                counts["files_removed"] += connection.execute("DELETE FROM files WHERE archive = ?", (archive,)).rowcount
+            for child in known_dirs.difference(subdirs):
+                counts["files_removed"] += _remove_directory(connection, child)
+
+            # A directory with an archive that couldn't be read isn't marked unchanged, so that the
+            # next scan looks at it (and tries the archive) again, even if nothing's added or removed.
+            connection.execute("INSERT OR REPLACE INTO directories VALUES (?, ?, ?)",
+                               (dir_path, os.path.dirname(dir_path), dir_mtime_ns if all_files_read else None))
+            dirs_to_scan.extend(reversed(subdirs))
+
+        connection.commit()
+    finally:
+        connection.close()
+
+    if verbose:
+        print("{0} directories scanned ({1} unchanged), {2} .bin files cataloged, {3} removed, {4} unreadable archives skipped.".format(
+              counts["directories_scanned"] + counts["directories_skipped"], counts["directories_skipped"],
+              counts["files_cataloged"], counts["files_removed"], counts["archives_failed"]), file=sys.stderr)
+
+    return counts
+
+def _date_text(value):
+    """A date (datetime.date, or "YYYY-MM-DD" text) as "YYYY-MM-DD" text."""
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.strftime("%Y-%m-%d")
+    return datetime.datetime.strptime(str(value).strip(), "%Y-%m-%d").strftime("%Y-%m-%d")
+
+def select_catalog_files(catalog_file,
+                         product=None,
+                         platform=None,
+                         hemisphere=None,
+                         channel=None,
+                         resolution=None,
+                         period=None,
+                         start=None,
+                         end=None,
+                         skip_missing=True):
+    """Return the paths of the cataloged .bin files that match all the given fields, in date order.
+
+    product = e.g. "nsidc-0001" (or just "0001").
+    platform = e.g. "f08".
+    hemisphere = "N" or "S".
+    channel = e.g. "19H" (NSIDC-0001 only).
+    resolution = 6.25, 12.5 or 25 (km).
+    period = "daily" or "monthly".
+    Each of these can also be a list, to match any of them. None matches everything.
+
+    start, end = The first and last dates (datetime.dates, or "YYYY-MM-DD" text) to include.
+
+    skip_missing = If True (the default), leave out files (or archives) that have been
+                   deleted or moved since the catalog was last scanned, with a warning
+                   on stderr for each, so that a stale catalog doesn't stop a batch.
+
+    Returns: A list of file names ("archive::member" for files inside archives), ready for
+             output_bins_to_gtifs(), composite_bins(), etc.
+    """
+    normalize = {"product": lambda p: p.strip().lower() if p.strip().lower().startswith("nsidc-") else "nsidc-" + p.strip().lower(),
+                 "platform": lambda p: p.strip().lower(),
+                 "hemisphere": lambda h: h.strip().upper(),
+                 "channel": lambda c: c.strip().upper(),
+                 "resolution": float,
+                 "period": lambda p: p.strip().lower()}
+    values = {"product": product, "platform": platform, "hemisphere": hemisphere,
+              "channel": channel, "resolution": resolution, "period": period}
+
+    conditions = []
+    parameters = []
+    for column, value in values.items():
+        if value is None:
+            continue
+        value_list = [value] if isinstance(value, (str, int, float)) else list(value)
+        conditions.append("{0} IN ({1})".format(column, ", ".join(["?"] * len(value_list))))
+        parameters.extend([normalize[column](v) for v in value_list])
+    if start is not None:
+        conditions.append("date >= ?")
+        parameters.append(_date_text(start))
+    if end is not None:
+        conditions.append("date <= ?")
+        parameters.append(_date_text(end))
+
+    query = "SELECT path, archive FROM files"
+    if len(conditions) > 0:
+        query += " WHERE " + " AND ".join(conditions)
+    query += " ORDER BY date, path"
+
+    connection = open_catalog(catalog_file)
+    try:
+        rows = connection.execute(query, parameters).fetchall()
+    finally:
+        connection.close()
+
+    if not skip_missing:
+        return [path for (path, archive) in rows]
+
+    paths = []
+    for path, archive in rows:
+        if os.path.exists(archive):
+            paths.append(path)
+        else:
+            print("Skipping {0}, which is no longer on disk. (Rescan the catalog to remove it.)".format(path), file=sys.stderr)
+    return paths
+
+def parse_catalog_selection(selection):
+    """Turn "key=value" strings (e.g. from "-select hemisphere=S channel=19H,19V start=1995-01-01")
+    into select_catalog_files() keyword arguments. Comma-separated values match any of them."""
+    if isinstance(selection, str):
+        selection = selection.split()
+
+    kwargs = {}
+    for item in selection:
+        key, sep, value = item.partition("=")
+        key = key.strip().lower()
+        if len(sep) == 0 or key not in CATALOG_SELECT_KEYS:
+            raise ValueError("Can't select by '{0}'. Use key=value, with keys: {1}".format(item, ", ".join(CATALOG_SELECT_KEYS)))
+        values = [v for v in value.split(",") if len(v.strip()) > 0]
+        kwargs[key] = values[0] if (len(values) == 1 or key in ("start", "end")) else values
+
+    return kwargs
+
+def testing_catalog():
+    """Check that rescanning a catalog picks up added, deleted and unreadable files. Raises AssertionError on a mismatch.
+
+    Builds a small tree of empty NSIDC-0051 .bin files (and a zip archive) in a temporary
+    directory, and scans it again after each change. The directories' modification times
+    are set by hand, so the check doesn't depend on the resolution of the file system's
+    timestamps.
+    """
+    import contextlib
+    import io
+    import shutil
+    import tempfile
+
+    def touch(path, mtime_ns):
+        if not os.path.exists(path):
+            open(path, "wb").close()
+        os.utime(path, ns=(mtime_ns, mtime_ns))
+
+    def scan():
+        stderr = io.StringIO()
+        with contextlib.redirect_stderr(stderr):
+            counts = scan_catalog(catalog_file, tree)
+        return counts, stderr.getvalue()
+
+    def selected(**kwargs):
+        return [os.path.relpath(path, tree) for path in select_catalog_files(catalog_file, **kwargs)]
+
+    tempdir = tempfile.mkdtemp()
+    try:
+        # The catalog is kept outside the tree, so that writing it doesn't change the tree.
+        catalog_file = os.path.join(tempdir, "nsidc.db")
+        tree = os.path.join(tempdir, "nsidc")
+        os.mkdir(tree)
+        subdir = os.path.join(tree, "1987")
+        os.mkdir(subdir)
+        mtime_ns = 10**18
+        for day in (1, 2, 3):
+            touch(os.path.join(subdir, "nt_1987070{0}_f08_v01_n.bin".format(day)), mtime_ns)
+        touch(os.path.join(tree, "nt_19870704_f08_v01_s.bin"), mtime_ns)
+        touch(os.path.join(tree, "notes.txt"), mtime_ns)
+        touch(subdir, mtime_ns)
+        touch(tree, mtime_ns)
+
+        counts, warnings = scan()
+        assert (counts["directories_scanned"], counts["files_cataloged"], counts["archives_failed"]) == (2, 4, 0), counts
+        assert selected() == ["1987/nt_19870701_f08_v01_n.bin", "1987/nt_19870702_f08_v01_n.bin",
+                              "1987/nt_19870703_f08_v01_n.bin", "nt_19870704_f08_v01_s.bin"], selected()
+        assert selected(hemisphere="S") == ["nt_19870704_f08_v01_s.bin"], selected(hemisphere="S")
+
+        # Nothing's changed, so nothing's re-read.
+        counts, warnings = scan()
+        assert (counts["directories_skipped"], counts["files_cataloged"], counts["files_removed"]) == (2, 0, 0), counts
+
+        # Add one file and delete another.
+        mtime_ns += 10**9
+        os.remove(os.path.join(subdir, "nt_19870702_f08_v01_n.bin"))
+        touch(os.path.join(subdir, "nt_19870705_f08_v01_n.bin"), mtime_ns)
+        touch(subdir, mtime_ns)
+        counts, warnings = scan()
+        assert (counts["directories_scanned"], counts["directories_skipped"]) == (1, 1), counts
+        assert (counts["files_cataloged"], counts["files_removed"]) == (1, 1), counts
+        assert selected(start="1987-07-02", end="1987-07-05") == ["1987/nt_19870703_f08_v01_n.bin", "nt_19870704_f08_v01_s.bin",
+                                                                  "1987/nt_19870705_f08_v01_n.bin"], selected(start="1987-07-02")
+
+        # An archive that can't be read (here, one that's only partly written) is skipped with a
+        # warning, without stopping the scan, and tried again on every scan until it can be read.
+        mtime_ns += 10**9
+        zip_file = os.path.join(subdir, "nt_198707.zip")
+        with open(zip_file, "wb") as f:
+            f.write(b"PK\x03\x04 not finished")
+        touch(os.path.join(subdir, "nt_19870706_f08_v01_n.bin"), mtime_ns)
+        touch(subdir, mtime_ns)
+        for i in range(2):
+            counts, warnings = scan()
+            assert counts["archives_failed"] == 1 and zip_file in warnings, (counts, warnings)
+            assert counts["directories_scanned"] == 1, counts
+        assert "1987/nt_19870706_f08_v01_n.bin" in selected(), selected()
+
+        with zipfile.ZipFile(zip_file, "w") as zf:
+            zf.writestr("nt_19870707_f08_v01_n.bin", b"")
+        counts, warnings = scan()
+        assert (counts["files_cataloged"], counts["archives_failed"]) == (1, 0), counts
+        assert selected(start="1987-07-07") == ["1987/nt_198707.zip::nt_19870707_f08_v01_n.bin"], selected(start="1987-07-07")
+        counts, warnings = scan()
+        assert counts["directories_skipped"] == 2, counts
+
+        # Removing a whole directory removes everything in it.
+        mtime_ns += 10**9
+        shutil.rmtree(subdir)
+        touch(tree, mtime_ns)
+        counts, warnings = scan()
+        assert counts["files_removed"] == 5, counts
+        assert selected() == ["nt_19870704_f08_v01_s.bin"], selected()
+    finally:
+        shutil.rmtree(tempdir)
+
+    print("Catalog checks passed.")
+
+def read_and_parse_args():
+    """Read and parse command-line arguments."""
+    parser = argparse.ArgumentParser(description="Catalog NSIDC .bin files in an SQLite database, and list the ones matching a selection.")
+    parser.add_argument("catalog", type=str, help="The catalog database file (created if it doesn't exist).")
+    parser.add_argument("-scan", type=str, nargs="+", default=[], help="Directories (searched recursively) or files to add to the catalog, or bring up to date. Includes .bin files inside .gz, .zip and .tar archives.")
+    parser.add_argument("--full", action="store_true", default=False, help="With -scan, re-check every file, not just those in directories that have changed.")
+    parser.add_argument("-select", type=str, nargs="*", default=None, help="Print the cataloged files matching all of these key=value fields, in date order. Keys: {0}. e.g. -select product=0001 hemisphere=S channel=19H start=1995-01-01 end=1995-12-31".format(", ".join(CATALOG_SELECT_KEYS)))
+    parser.add_argument("--count", action="store_true", default=False, help="Print only the number of files selected.")
+
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = read_and_parse_args()
+
+    if len(args.scan) > 0:
+        scan_catalog(args.catalog, args.scan, full=args.full, verbose=True)
+
+    if args.select is not None or len(args.scan) == 0:
+        files = select_catalog_files(args.catalog, **parse_catalog_selection(args.select or []))
+        if args.count:
+            print(len(files))
+        else:
+            for fname in files:
+                print(fname)
@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Fri Oct 16 22:40:11 2026
+
+Lookup-table decoding of NSIDC .bin products.
+
+Files with 1- or 2-byte elements only hold 256 or 65536 possible raw values, so the
+output value of every raw value (scaled, with flag values replaced by NaN or a nodata
+value) can be worked out once, in a lookup table. Decoding a file is then a single
+gather from the table (value_lut[raw_array]), rather than separate passes to convert,
+scale and mask it.
+A second table gives the flag class (land, coast, pole hole, missing...) of every raw value.
+
+Example, for an NSIDC-0051 sea-ice concentration file (as percent, NaN where flagged):
+
+    value_lut, class_lut = get_product_luts("nsidc-0051")
+    concentration = read_NSIDC_bin_file("nt_20201231_f17_v1.1_n.bin", grid_shape=(448,304),
+                                        header_size=300, element_size=1, lut=value_lut)
+"""
+import numpy
+import functools
+
+# Flag classes, numbered by their position here, in the flag-class arrays.
+FLAG_CLASSES = ("valid", "pole_hole", "unused", "coast", "land", "missing")
+
+# Built-in decoding of the products read in read_bin.testing(). "flags" are the raw
+# values that aren't data, and their flag class. "multiplier" scales the rest to the
+# product's units. See the user guide of each product at https://nsidc.org/data/<product>
+NSIDC_PRODUCTS = {
+    # SSM/I-SSMIS daily polar gridded brightness temperatures, in tenths of a Kelvin.
+    "nsidc-0001": {"header_size": 0,
+                   "element_size": 2,
+                   "multiplier": 0.1,
+                   "flags": {0: "missing"}},
+    # NASA Team sea-ice concentrations, as fractions of 250 (0.4 gives percent).
+    "nsidc-0051": {"header_size": 300,
+                   "element_size": 1,
+                   "multiplier": 0.4,
+                   "flags": {251: "pole_hole",
+                             252: "unused",
+                             253: "coast",
+                             254: "land",
+                             255: "missing"}},
+    # Bootstrap sea-ice concentrations, in tenths of a percent.
+    "nsidc-0079": {"header_size": 0,
+                   "element_size": 2,
+                   "multiplier": 0.1,
+                   "flags": {1100: "missing",
+                             1200: "land"}},
+    }
+
+def _check_lut_element_size(element_size):
+    if int(element_size) not in (1, 2):
+        raise ValueError("Lookup tables are only made for 1- or 2-byte elements, not {0}.".format(element_size))
+    return int(element_size)
+
+def build_decode_lut(element_size=1,
+                     signed=False,
+                     return_type=float,
+                     multiplier=0.1,
+                     flags=None,
+                     flag_fill=None):
+    """Build a table of the decoded output value of every possible raw value of a .bin file.
+
+    Entry i of the table is the value of the raw element whose bits, read as an unsigned
+    integer, are i. (decode_with_lut() indexes it that way, whatever the byte order.)
+
+    element_size, signed, return_type, multiplier = As in read_bin.read_NSIDC_bin_file().
+            (Integer return types keep the raw values, floating-point types are multiplied.)
+
+    flags = A dict of {raw value: flag class} of the values that aren't data.
+
+    flag_fill = Output value of the flags. Defaults to NaN for floating-point return
+                types. For integer return types, None keeps the raw flag values.
+
+    Returns: A 1D array of 2**(8*element_size) values, of the return_type.
+    """
+    element_size = _check_lut_element_size(element_size)
+    n_entries = 2**(8*element_size)
+    raw_values = numpy.arange(n_entries, dtype="u{0}".format(element_size))
+    if signed:
+        raw_values = raw_values.view("i{0}".format(element_size))
+
+    return_dtype = numpy.dtype(return_type)
+    if numpy.issubdtype(return_dtype, numpy.integer):
+        lut = raw_values.astype(return_dtype)
+    else:
+        lut = numpy.asarray(raw_values.astype(return_dtype) * multiplier, dtype=return_dtype)
+        if flag_fill is None:
+            flag_fill = numpy.nan
+
+    if flags is not None and flag_fill is not None:
+        for raw_value in flags:
+            lut[_lut_index(raw_value, element_size)] = flag_fill
+
+    return lut
+
+def build_flag_class_lut(element_size=1, flags=None):
+    """Build a table of the flag class (an index into FLAG_CLASSES, 0 for "valid") of every possible raw value.
+
+    Returns: A 1D uint8 array of 2**(8*element_size) values, indexed as in build_decode_lut().
+    """
+    element_size = _check_lut_element_size(element_size)
+    lut = numpy.zeros(2**(8*element_size), dtype=numpy.uint8)
+    if flags is not None:
+        for raw_value, flag_class in flags.items():
+            lut[_lut_index(raw_value, element_size)] = FLAG_CLASSES.index(flag_class)
+    return lut
+
+def _lut_index(raw_value, element_size):
+    """The table index of a raw value: its bits as an unsigned integer (so -1 -> 255 for 1-byte elements)."""
+    return int(raw_value) % 2**(8*element_size)
+
+@functools.lru_cache(maxsize=None)
+def get_product_luts(product, return_type=float, multiplier=None, flag_fill=None, signed=False):
+    """Return the (value_lut, class_lut) lookup tables of one of the NSIDC_PRODUCTS.
+
+    product = e.g. "nsidc-0051" (or just "0051").
+
+    multiplier = Defaults to the product's own multiplier.
+
+    return_type, flag_fill, signed = As in build_decode_lut().
+
+    The tables are cached, and shared between calls, so are read-only.
+    """
+    product_info = get_product_info(product)
+    if multiplier is None:
+        multiplier = product_info["multiplier"]
+
+    value_lut = build_decode_lut(element_size=product_info["element_size"],
+                                 signed=signed,
+                                 return_type=return_type,
+                                 multiplier=multiplier,
+                                 flags=product_info["flags"],
+                                 flag_fill=flag_fill)
+    class_lut = build_flag_class_lut(element_size=product_info["element_size"],
+                                     flags=product_info["flags"])
+
+    value_lut.flags.writeable = False
+    class_lut.flags.writeable = False
+    return value_lut, class_lut
+
+def get_product_info(product):
+    """Return the NSIDC_PRODUCTS entry of a product, e.g. "nsidc-0051" or "0051". Raises ValueError if unknown."""
+    name = product.strip().lower()
+    if not name.startswith("nsidc-"):
+        name = "nsidc-" + name
+    try:
+        return NSIDC_PRODUCTS[name]
+    except KeyError:
+        raise ValueError("Unknown product '{0}'. Built-in products are: {1}".format(product, ", ".join(sorted(NSIDC_PRODUCTS))))
+
+def decode_with_lut(raw_array, value_lut, class_lut=None):
+    """Decode an array of raw .bin values with lookup tables from build_decode_lut() (and build_flag_class_lut()).
+
+    Returns: The decoded array, the shape of raw_array. Or if class_lut is given, a tuple
+             (decoded array, flag-class array).
+    """
+    element_size = raw_array.dtype.itemsize
+    if len(value_lut) != 2**(8*element_size):
+        raise ValueError("A lookup table for {0}-byte elements needs {1} entries, not {2}.".format(
+                         element_size, 2**(8*element_size), len(value_lut)))
+
+    # Index the table by the bits of each element as an unsigned integer, in the element's own byte order.
+    # (Indexing with small unsigned integers is about twice as fast as numpy.take(), which
+    # first copies the indices to a full-size array of intp.)
+    index = raw_array.view(raw_array.dtype.byteorder.replace("|", "=") + "u{0}".format(element_size))
+    values = value_lut[index]
+    if class_lut is None:
+        return values
+
+    return values, class_lut[index]
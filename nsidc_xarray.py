@@ -0,0 +1,276 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Fri Oct 16 22:56:47 2026
+
+An xarray backend for NSIDC .bin files, which opens one file, or a whole collection of
+them (a list, glob pattern or directory), as a lazily-loaded dataset with a (time, y, x)
+data variable, x/y coordinates of the polar stereographic grid, the date of each file
+(from its name, the 1st of the month for monthly files) along the time dimension, and the CF grid mapping of EPSG 3411/3412.
+
+Nothing is read when the dataset is opened. Each chunk (or slice) is read from its file
+by byte offset, rows and all, so a computation only reads the bytes it needs, and with
+dask the chunks are read in parallel on whichever workers compute them:
+
+    import xarray
+    from nsidc_xarray import NSIDCBinBackendEntrypoint
+
+    ds = xarray.open_dataset("nsidc-0001/tb_f08_1987*_v5_s19h.bin",
+                             engine=NSIDCBinBackendEntrypoint, chunks={})
+    july_mean = ds["values"].sel(time="1987-07").mean("time").compute()
+
+xarray.open_mfdataset() works too, combining the files by their dates. (The backend
+isn't registered as an entry point, since these scripts aren't an installed package,
+so pass the class as the engine, or use open_nsidc_bin_dataset().)
+"""
+import numpy
+import os
+import xarray
+
+from xarray.backends import BackendArray, BackendEntrypoint
+from xarray.core import indexing
+
+from read_bin import read_NSIDC_bin_file, check_bin_file_size, get_date_from_nsidc_filename
+from bin_archives import is_archive_path, get_member_name, read_archive_member
+from convert_bin_to_gtif import find_bin_files, \
+                               resolve_hemisphere_and_resolution, \
+                               resolve_multiplier, \
+                               NSIDC_GRIDSIZES, \
+                               EPSG_N, \
+                               EPSG_S
+from nsidc_products import get_product_info, get_product_luts
+from grid_geometry import get_grid_xy_vectors, \
+                          POLAR_STEREO_EARTH_RADIUS_KM, \
+                          POLAR_STEREO_ECCENTRICITY, \
+                          POLAR_STEREO_TRUE_SCALE_LAT, \
+                          POLAR_STEREO_CENTRAL_MERIDIAN
+
+# Name of the variable holding the CF grid mapping, which the data variable points to.
+GRID_MAPPING_NAME = "crs"
+
+def get_cf_grid_mapping_attrs(hemisphere):
+    """Return the CF-convention attributes of the polar stereographic grid mapping of a hemisphere ("N" or "S")."""
+    hemisphere = hemisphere.strip().upper()
+    sign = 1.0 if hemisphere == "N" else -1.0
+    epsg = EPSG_N if hemisphere == "N" else EPSG_S
+    # Flattening of the Hughes 1980 ellipsoid, from its eccentricity.
+    flattening = 1 - numpy.sqrt(1 - POLAR_STEREO_ECCENTRICITY**2)
+    return {"grid_mapping_name": "polar_stereographic",
+            "latitude_of_projection_origin": sign * 90.0,
+            "standard_parallel": sign * POLAR_STEREO_TRUE_SCALE_LAT,
+            "straight_vertical_longitude_from_pole": POLAR_STEREO_CENTRAL_MERIDIAN[hemisphere],
+            "false_easting": 0.0,
+            "false_northing": 0.0,
+            "semi_major_axis": POLAR_STEREO_EARTH_RADIUS_KM * 1000.0,
+            "inverse_flattening": float(1 / flattening),
+            "epsg_code": "EPSG:{0}".format(epsg)}
+
+def _key_to_range(key, size):
+    """Turn an int or slice along one axis into a range of indices, and whether the axis is dropped (an int)."""
+    if isinstance(key, slice):
+        return range(*key.indices(size)), False
+    index = int(key)
+    if index < 0:
+        index += size
+    return range(index, index + 1), True
+
+def _range_to_window(indices):
+    """Return the (start, stop) span of a non-empty range of indices, and the slice that takes them from that span."""
+    start, stop = min(indices), max(indices) + 1
+    local_stop = indices.stop - start
+    return (start, stop), slice(indices.start - start, local_stop if local_stop >= 0 else None, indices.step)
+
+class NSIDCBinBackendArray(BackendArray):
+    """The (time, rows, cols) values of a list of .bin files on the same grid, read only when indexed.
+
+    Holds just the file names and decoding parameters (so it pickles cheaply, to dask
+    workers), and reads each requested slice from its file with read_NSIDC_bin_file(),
+    by byte offset. (Files inside archives are decompressed whole, each time they're read.)
+    """
+    def __init__(self,
+                 bin_files,
+                 grid_shape,
+                 header_size=0,
+                 element_size=2,
+                 return_type=float,
+                 signed=False,
+                 multiplier=0.1,
+                 byteorder="little",
+                 lut=None):
+        self.bin_files = list(bin_files)
+        self.grid_shape = tuple(int(n) for n in grid_shape)
+        self.read_kwargs = dict(grid_shape=self.grid_shape,
+                                header_size=header_size,
+                                element_size=element_size,
+                                return_type=return_type,
+                                signed=signed,
+                                multiplier=multiplier,
+                                byteorder=byteorder,
+                                lut=lut)
+        self.shape = (len(self.bin_files),) + self.grid_shape
+        self.dtype = lut.dtype if lut is not None else numpy.dtype(return_type)
+
+    def __getitem__(self, key):
+        return indexing.explicit_indexing_adapter(key, self.shape, indexing.IndexingSupport.BASIC, self._getitem)
+
+    def _getitem(self, key):
+        """Read a (time, row, col) key of ints and slices."""
+        (times, _), (rows, drop_rows), (cols, drop_cols) = [_key_to_range(k, size) for k, size in zip(key, self.shape)]
+
+        array = numpy.empty((len(times), len(rows), len(cols)), dtype=self.dtype)
+        if len(rows) > 0 and len(cols) > 0:
+            row_window, row_slice = _range_to_window(rows)
+            col_window, col_slice = _range_to_window(cols)
+            for i, t in enumerate(times):
+                # Read just the rows & cols the key spans, then take the ones it asks for.
+                grid = read_NSIDC_bin_file(self.bin_files[t],
+                                           window=(row_window, col_window),
+                                           **self.read_kwargs)
+                array[i] = grid[row_slice, col_slice]
+
+        # Drop the axes indexed with an int.
+        if isinstance(key[0], slice):
+            return array[:, 0 if drop_rows else slice(None), 0 if drop_cols else slice(None)]
+        return array[0, 0 if drop_rows else slice(None), 0 if drop_cols else slice(None)]
+
+def _get_data_variable_name(product):
+    if product is None:
+        return "values"
+    elif product.strip().lower().endswith("0001"):
+        return "brightness_temperature"
+    else:
+        return "sea_ice_concentration"
+
+class NSIDCBinBackendEntrypoint(BackendEntrypoint):
+    """Opens NSIDC .bin files with xarray.open_dataset(..., engine=NSIDCBinBackendEntrypoint).
+
+    The file to open can be a .bin file (or .bin.gz, or "archive.tar::member.bin"), a glob
+    pattern, a directory, a zip or tar archive, or a list of any of those, all on the same grid.
+    Options, as keyword arguments to open_dataset():
+
+    resolution, hemisphere = Of the grid (6.25, 12.5 or 25 km; "N" or "S"). Read from the
+                 file names if not given (see convert_bin_to_gtif.resolve_hemisphere_and_resolution()).
+    product = A built-in NSIDC product (see nsidc_products.NSIDC_PRODUCTS), which sets the
+                 header size, element size and (unless given) multiplier, and decodes with a
+                 lookup table, turning flag values into NaN for floating-point output.
+    header_size, element_size, return_type, signed, multiplier, byteorder =
+                 As in read_bin.read_NSIDC_bin_file(). multiplier can be "auto" (the default),
+                 1 for integer return types and 0.1 otherwise.
+    variable_name = Name of the data variable. Defaults to "brightness_temperature" or
+                 "sea_ice_concentration" for the built-in products, otherwise "values".
+
+    The data variable is (time, y, x). Its "time" coordinate is the date of each file, if
+    every file name holds one (files are then sorted by date), and "source_file" names the
+    file of each time step. x and y are the polar stereographic coordinates (m) of the
+    cell centers, and the "crs" variable holds the CF grid mapping.
+    """
+    description = "NSIDC polar stereographic .bin files (SSM/I-SSMIS brightness temperatures & sea-ice concentrations)"
+    open_dataset_parameters = ("filename_or_obj", "drop_variables", "resolution", "hemisphere", "product",
+                               "header_size", "element_size", "return_type", "signed", "multiplier",
+                               "byteorder", "variable_name")
+
+    def guess_can_open(self, filename_or_obj):
+        if not isinstance(filename_or_obj, (str, os.PathLike)):
+            return False
+        return get_member_name(str(filename_or_obj)).lower().endswith(".bin")
+
+    def open_dataset(self,
+                     filename_or_obj,
+                     *,
+                     drop_variables=None,
+                     resolution=None,
+                     hemisphere=None,
+                     product=None,
+                     header_size=0,
+                     element_size=2,
+                     return_type=float,
+                     signed=False,
+                     multiplier="auto",
+                     byteorder="little",
+                     variable_name=None):
+        if isinstance(filename_or_obj, os.PathLike):
+            filename_or_obj = os.fspath(filename_or_obj)
+        elif not isinstance(filename_or_obj, str):
+            filename_or_obj = [os.fspath(fn) for fn in filename_or_obj]
+        bin_files = find_bin_files(filename_or_obj, expand_archives=True)
+        if len(bin_files) == 0:
+            raise FileNotFoundError("No .bin files found in {0!r}.".format(filename_or_obj))
+
+        grids = set([resolve_hemisphere_and_resolution(fn, hemisphere=hemisphere, resolution=resolution) for fn in bin_files])
+        if len(grids) > 1:
+            raise ValueError("The files are on more than one grid: {0}. Open each grid separately, or give the hemisphere and resolution.".format(
+                             ", ".join(["{0} {1} km".format(*grid) for grid in sorted(grids)])))
+        hemisphere, resolution = grids.pop()
+        grid_shape = tuple(int(n) for n in NSIDC_GRIDSIZES[(resolution, hemisphere)])
+
+        if product is not None:
+            product_info = get_product_info(product)
+            header_size = product_info["header_size"]
+            element_size = product_info["element_size"]
+            lut = get_product_luts(product,
+                                   return_type=return_type,
+                                   multiplier=None if multiplier == "auto" else multiplier,
+                                   signed=signed)[0]
+            if multiplier == "auto":
+                multiplier = product_info["multiplier"]
+        else:
+            lut = None
+            multiplier = resolve_multiplier(multiplier, return_type)
+
+        # Check the first file matches the grid now, rather than in the middle of a computation.
+        # (The rest are checked as they're read.)
+        if not is_archive_path(bin_files[0]):
+            check_bin_file_size(bin_files[0], grid_shape, header_size=header_size, element_size=element_size)
+        else:
+            check_bin_file_size(bin_files[0], grid_shape, header_size=header_size, element_size=element_size,
+                                file_size=len(read_archive_member(bin_files[0])))
+
+        dates = [get_date_from_nsidc_filename(fn) for fn in bin_files]
+        if None not in dates:
+            order = sorted(range(len(bin_files)), key=lambda i: (dates[i], bin_files[i]))
+            bin_files = [bin_files[i] for i in order]
+            dates = [dates[i] for i in order]
+
+        backend_array = NSIDCBinBackendArray(bin_files,
+                                             grid_shape,
+                                             header_size=header_size,
+                                             element_size=element_size,
+                                             return_type=return_type,
+                                             signed=signed,
+                                             multiplier=multiplier,
+                                             byteorder=byteorder,
+                                             lut=lut)
+
+        if variable_name is None:
+            variable_name = _get_data_variable_name(product)
+        data = xarray.Variable(("time", "y", "x"),
+                               indexing.LazilyIndexedArray(backend_array),
+                               attrs={"grid_mapping": GRID_MAPPING_NAME},
+                               # With chunks={}, one chunk per file.
+                               encoding={"preferred_chunks": {"time": 1, "y": grid_shape[0], "x": grid_shape[1]}})
+
+        x_vector, y_vector = get_grid_xy_vectors(hemisphere, resolution, cell_centers=True)
+        coords = {"x": ("x", x_vector * 1000.0, {"standard_name": "projection_x_coordinate", "units": "m", "axis": "X"}),
+                  "y": ("y", y_vector * 1000.0, {"standard_name": "projection_y_coordinate", "units": "m", "axis": "Y"}),
+                  "source_file": ("time", numpy.array(bin_files, dtype=object))}
+        if None not in dates:
+            coords["time"] = ("time", numpy.array(dates, dtype="datetime64[ns]"), {"standard_name": "time"})
+
+        data_vars = {variable_name: data,
+                     GRID_MAPPING_NAME: xarray.Variable((), numpy.int32(EPSG_N if hemisphere == "N" else EPSG_S),
+                                                        attrs=get_cf_grid_mapping_attrs(hemisphere))}
+        for name in (drop_variables or ()):
+            data_vars.pop(name, None)
+
+        attrs = {"hemisphere": hemisphere,
+                 "resolution_km": resolution}
+        if product is not None:
+            attrs["product"] = product
+        return xarray.Dataset(data_vars, coords=coords, attrs=attrs)
+
+def open_nsidc_bin_dataset(paths, chunks={}, **kwargs):
+    """Open .bin files as a lazily-loaded xarray dataset. See NSIDCBinBackendEntrypoint for the options.
+
+    chunks = Dask chunks, as in xarray.open_dataset(). {} (the default) gives one chunk per
+             file, and None gives lazily-indexed arrays without dask.
+    """
+    return xarray.open_dataset(paths, engine=NSIDCBinBackendEntrypoint, chunks=chunks, **kwargs)
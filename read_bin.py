@@ -8,6 +8,12 @@ import numpy
 import argparse
 import re
 import os
+import datetime
+
+from export_array import output_array, EXPORT_FORMATS
+from nsidc_products import decode_with_lut, get_product_info, get_product_luts, NSIDC_PRODUCTS, FLAG_CLASSES
+from bin_archives import is_archive_path, read_archive_member, get_member_name
+from stage_profiler import profile_stage, StageProfiler
 
 # 332 rows x 316 cols for Antarctic Polar Stereo data,
 # per https://nsidc.org/data/polar-stereo/ps_grids.html
@@ -26,22 +32,62 @@ GRIDSIZE_6_25_N = GRIDSIZE_25_N * 4
 GRIDSIZE_6_25_S = GRIDSIZE_25_S * 4
 
 
+# Numpy type codes for each element size (in bytes) that a .bin file can use,
+# as (unsigned, signed) pairs.
+BIN_ELEMENT_TYPE_CODES = {1: ("u1", "i1"),
+                          2: ("u2", "i2"),
+                          4: ("u4", "i4"),
+                          8: ("u8", "i8")}
+# Numpy byte-order characters for each of the "byteorder" values accepted by int.from_bytes()
+BIN_BYTEORDER_CODES = {"little": "<",
+                       "big": ">"}
+
+def get_bin_dtype(element_size=2, signed=False, byteorder="little"):
+    """Return the numpy dtype of the raw data elements in an NSIDC .bin file.
+
+    element_size - number of bytes for each numerical element: 1, 2, 4 or 8.
+
+    signed - Whether the data values are signed (True) or unsigned (False) data
+
+    byteorder - "little" or "big". NSIDC .bin files are little-endian.
+    """
+    try:
+        type_codes = BIN_ELEMENT_TYPE_CODES[int(element_size)]
+    except KeyError:
+        raise ValueError("Unhandled element_size {0}. Must be 1, 2, 4 or 8 bytes.".format(element_size))
+
+    try:
+        byteorder_code = BIN_BYTEORDER_CODES[byteorder.strip().lower()]
+    except KeyError:
+        raise ValueError("Unknown byteorder '{0}'. Must be 'little' or 'big'.".format(byteorder))
+
+    return numpy.dtype(byteorder_code + type_codes[1 if signed else 0])
+
 def read_NSIDC_bin_file(fname,
                         grid_shape = DEFAULT_GRID_SHAPE,
                         header_size=0,
                         element_size=2,
                         return_type=float,
                         signed=False,
-                        multiplier=0.1):
+                        multiplier=0.1,
+                        byteorder="little",
+                        window=None,
+                        lut=None,
+                        defer_scaling=False,
+                        class_lut=None):
     """Read an SSMI file, return a 2D grid of integer values.
 
+    fname - The .bin file. Can also be a file inside a .gz, .zip or .tar archive, named
+        "archive.tar::member.bin" (or just "file.bin.gz"). It's decompressed into memory,
+        never to disk. (See bin_archives.py.)
+
     header_size - size, in bytes, of the header. Defaults to zero for
         brightness-temperature data, but can be one for other data. For instance,
         NSIDC sea-ice concentration data has a 300-byte header on it.
 
     element_size - number of bytes for each numerical element. The brightness-temperature
         uses 2-byte little-endian integers (with a multiplier factor to turn them into floating-point values).
-        NSIDC sea-ice concentration data is just 1-byte integers.
+        NSIDC sea-ice concentration data is just 1-byte integers. Can be 1, 2, 4 or 8.
 
     return_type can be "int" or "float", or the numpy equivalent therein.
 
@@ -52,81 +98,422 @@ def read_NSIDC_bin_file(fname,
         multiplied by 0.1 to get floating-point values.
         (Example: value "2731" with a multiplier of 0.1 will return 273.1)
         This is ingored if the return type is "int" or a numpy integer type.
+
+    byteorder - "little" or "big", the byte order of each element. Defaults to
+        "little", which is what the NSIDC products use.
+
+    window - ((row_start, row_stop), (col_start, col_stop)) to read just that part of
+        the grid (e.g. from convert_bin_to_gtif.get_bbox_window()). Only the rows it
+        spans are read from the file. Defaults to None, the whole grid.
+
+    lut - A lookup table of the output value of every possible raw value (e.g. from
+        nsidc_products.get_product_luts()), to decode, scale and replace flag values in
+        one pass. If given, return_type and multiplier are ignored (they're built into
+        the table). Only for 1- and 2-byte elements. Defaults to None, no table.
+
+    class_lut - With lut, a table of the flag class of every possible raw value (the
+        second table from nsidc_products.get_product_luts()). If given, returns a tuple
+        (values, flag_classes), where flag_classes is a uint8 grid of the flag class of
+        each cell, as an index into nsidc_products.FLAG_CLASSES (0 for valid data).
+
+    defer_scaling - If True, don't convert or scale the values at all. Return a tuple
+        (raw_array, scale), where raw_array holds the file's own integers (in native
+        byte order, e.g. uint16 for 2-byte unsigned data), and the values are
+        raw_array * scale. The scale is the multiplier, or 1 for integer return types.
+        The raw array is a quarter the size of a float64 one (for 2-byte data), and
+        output_gtif() can write it as-is, with the scale in the geotiff's metadata.
+    """
+    if is_archive_path(fname):
+        with profile_stage("read") as stage:
+            raw_data = read_archive_member(fname)
+            stage.add(bytes_read=len(raw_data))
+        return decode_NSIDC_bin_data(raw_data,
+                                     grid_shape=grid_shape,
+                                     header_size=header_size,
+                                     element_size=element_size,
+                                     return_type=return_type,
+                                     signed=signed,
+                                     multiplier=multiplier,
+                                     byteorder=byteorder,
+                                     window=window,
+                                     lut=lut,
+                                     defer_scaling=defer_scaling,
+                                     class_lut=class_lut,
+                                     fname=fname)
+
+    dtype = get_bin_dtype(element_size=element_size, signed=signed, byteorder=byteorder)
+    grid_shape = check_bin_file_size(fname, grid_shape, header_size=header_size, element_size=element_size)
+
+    with profile_stage("read") as stage:
+        if window is None:
+            # Read the whole grid in one go, skipping past the header. Numpy decodes the
+            # elements directly from the file buffer in the byte order given by the dtype.
+            raw_array = numpy.fromfile(fname, dtype=dtype, count=int(numpy.product(grid_shape)), offset=header_size)
+            raw_array.shape = grid_shape
+            stage.add(bytes_read=raw_array.nbytes, arrays=[raw_array])
+        else:
+            (row_start, row_stop), (col_start, col_stop) = check_window(window, grid_shape)
+            # Read just the rows the window spans, then cut out its columns.
+            raw_array = numpy.fromfile(fname,
+                                       dtype=dtype,
+                                       count=(row_stop - row_start) * grid_shape[1],
+                                       offset=header_size + row_start * grid_shape[1] * element_size)
+            raw_array.shape = (row_stop - row_start, grid_shape[1])
+            stage.add(bytes_read=raw_array.nbytes, arrays=[raw_array])
+            raw_array = raw_array[:, col_start:col_stop]
+
+    return _decode_raw_array(raw_array, return_type, multiplier, lut, defer_scaling, class_lut=class_lut)
+
+def _decode_raw_array(raw_array, return_type, multiplier, lut, defer_scaling, copy=False, class_lut=None):
+    """Turn an array of raw values read from a .bin file into the output of read_NSIDC_bin_file().
+
+    copy - With defer_scaling, always copy the raw values (e.g. when raw_array is a
+           view of someone else's buffer.) Otherwise they're only copied if needed.
+    """
+    if class_lut is not None and lut is None:
+        raise ValueError("Flag classes (class_lut) can only be decoded along with a lookup table (lut).")
+
+    with profile_stage("scale") as stage:
+        if defer_scaling:
+            if lut is not None:
+                raise ValueError("Can't defer scaling when decoding with a lookup table.")
+            scale = 1 if numpy.issubdtype(numpy.dtype(return_type), numpy.integer) else multiplier
+            native_dtype = raw_array.dtype.newbyteorder("=")
+            if copy:
+                array = numpy.array(raw_array, dtype=native_dtype, order="C")
+            else:
+                array = numpy.ascontiguousarray(raw_array, dtype=native_dtype)
+            if array is not raw_array and array.base is not raw_array:
+                stage.add(arrays=[array])
+            return array, scale
+
+        if class_lut is not None:
+            array, flag_classes = decode_with_lut(raw_array, lut, class_lut)
+            stage.add(arrays=[array, flag_classes])
+            return array, flag_classes
+        elif lut is not None:
+            array = decode_with_lut(raw_array, lut)
+        else:
+            array = scale_raw_array(raw_array, return_type=return_type, multiplier=multiplier)
+        stage.add(arrays=[array])
+        return array
+
+def check_window(window, grid_shape):
+    """Make sure a ((row_start, row_stop), (col_start, col_stop)) window is a non-empty part of the grid.
+
+    Raises ValueError if not. Returns the window as a tuple of tuples of ints.
+    """
+    try:
+        (row_start, row_stop), (col_start, col_stop) = [(int(start), int(stop)) for start, stop in window]
+    except (TypeError, ValueError):
+        raise ValueError("A window must be ((row_start, row_stop), (col_start, col_stop)), not {0!r}.".format(window))
+
+    if not (0 <= row_start < row_stop <= grid_shape[0] and 0 <= col_start < col_stop <= grid_shape[1]):
+        raise ValueError("Window {0} is empty or outside the grid {1}.".format(window, tuple(grid_shape)))
+
+    return ((row_start, row_stop), (col_start, col_stop))
+
+def decode_NSIDC_bin_data(raw_data,
+                          grid_shape = DEFAULT_GRID_SHAPE,
+                          header_size=0,
+                          element_size=2,
+                          return_type=float,
+                          signed=False,
+                          multiplier=0.1,
+                          byteorder="little",
+                          window=None,
+                          lut=None,
+                          defer_scaling=False,
+                          class_lut=None,
+                          fname="<data>"):
+    """Decode the contents of a .bin file, already read into memory, into a 2D grid.
+
+    raw_data - The bytes (or bytearray, memoryview, etc) of the whole file, header included.
+
+    fname - The name of the file the data came from, for error messages.
+
+    The rest of the parameters are the same as read_NSIDC_bin_file(), which this matches.
+    """
+    dtype = get_bin_dtype(element_size=element_size, signed=signed, byteorder=byteorder)
+    grid_shape = check_bin_file_size(fname, grid_shape, header_size=header_size, element_size=element_size, file_size=len(raw_data))
+
+    # No copy here, numpy reads the elements straight out of the buffer.
+    raw_array = numpy.frombuffer(raw_data, dtype=dtype, count=int(numpy.product(grid_shape)), offset=header_size)
+    raw_array = raw_array.reshape(grid_shape)
+    if window is not None:
+        (row_start, row_stop), (col_start, col_stop) = check_window(window, grid_shape)
+        raw_array = raw_array[row_start:row_stop, col_start:col_stop]
+
+    return _decode_raw_array(raw_array, return_type, multiplier, lut, defer_scaling, copy=True, class_lut=class_lut)
+
+def check_bin_file_size(fname, grid_shape, header_size=0, element_size=2, file_size=None):
+    """Make sure a .bin file holds exactly one grid of data after its header.
+
+    file_size - The size of the file (or of its contents already in memory), in bytes.
+        If None, it's looked up from the file.
+
+    Raises ValueError if not. Returns the grid_shape as a tuple of ints.
+    """
+    grid_shape = tuple(int(n) for n in grid_shape)
+    if file_size is None:
+        file_size = os.path.getsize(fname)
+
+    # TODO: The NSIDC-0051 data has the rows,cols in the header. We could read it from there,
+    # although right now we just get the grid size from the paramter.
+    data_size = max(file_size - header_size, 0)
+    if int(data_size / element_size) != int(numpy.product(grid_shape)):
+        raise ValueError("File {0} has {1} elements, does not match grid size {2}.".format(
+                         fname, int(data_size/element_size), str(grid_shape)))
+
+    return grid_shape
+
+def scale_raw_array(raw_array, return_type=float, multiplier=0.1):
+    """Convert an array of raw .bin values to the return_type, applying the multiplier to non-integer types.
+
+    Always returns a new array, never a view on raw_array.
+    """
+    # If the file is meant to be an integer array, just return it.
+    if return_type in (int, numpy.int, numpy.uint8, numpy.int8, numpy.uint16, numpy.int16, numpy.uint32, numpy.int32, numpy.uint64, numpy.int64):
+        return_array = raw_array.astype(return_type)
+    # Else, if it's meant to be a floating-point array, scale by the multiplier
+    # and return the floating-point array. If the mutiplier is a float (i.e. 0.1),
+    # numpy will conver and return an array of floats
+    else:
+        return_array = numpy.asarray(raw_array.astype(return_type) * multiplier, dtype=return_type)
+
+    return return_array
+
+class NSIDCBinFile(object):
+    """A memory-mapped NSIDC .bin file that is only read (and scaled) when sliced.
+
+    Takes the same parameters as read_NSIDC_bin_file(). Nothing is read from the file
+    until it is indexed, or converted to an array with numpy.asarray(). Then only the
+    pages of the file under the requested slice are read, and only that slice is
+    scaled by the multiplier. Example:
+
+        grid = NSIDCBinFile("nt_20201231_f17_v1.1_n.bin", grid_shape=(448,304), header_size=300, element_size=1)
+        subset = grid[100:200, 50:150]   # reads & scales just these rows/cols
+        whole = numpy.asarray(grid)      # reads & scales the whole grid
+
+    The .raw attribute is the underlying (read-only) numpy.memmap of raw, unscaled values.
+    (For a file inside an archive, which can't be memory-mapped, the file is read into
+    memory when opened and .raw is a read-only array over that.)
+    """
+    def __init__(self,
+                 fname,
+                 grid_shape = DEFAULT_GRID_SHAPE,
+                 header_size=0,
+                 element_size=2,
+                 return_type=float,
+                 signed=False,
+                 multiplier=0.1,
+                 byteorder="little"):
+        self.fname = fname
+        self.header_size = header_size
+        self.return_type = return_type
+        self.multiplier = multiplier
+
+        raw_dtype = get_bin_dtype(element_size=element_size, signed=signed, byteorder=byteorder)
+        if is_archive_path(fname):
+            raw_data = read_archive_member(fname)
+            grid_shape = check_bin_file_size(fname, grid_shape, header_size=header_size, element_size=element_size,
+                                             file_size=len(raw_data))
+            self.raw = numpy.frombuffer(raw_data, dtype=raw_dtype, offset=header_size,
+                                        count=int(numpy.prod(grid_shape))).reshape(grid_shape)
+            self.raw.flags.writeable = False
+        else:
+            grid_shape = check_bin_file_size(fname, grid_shape, header_size=header_size, element_size=element_size)
+            self.raw = numpy.memmap(fname, dtype=raw_dtype, mode="r", offset=header_size, shape=grid_shape)
+
+    @property
+    def shape(self):
+        return self.raw.shape
+
+    @property
+    def ndim(self):
+        return self.raw.ndim
+
+    @property
+    def size(self):
+        return self.raw.size
+
+    @property
+    def dtype(self):
+        """The numpy dtype of the scaled values returned from slices of this file."""
+        return numpy.dtype(self.return_type)
+
+    def __len__(self):
+        return len(self.raw)
+
+    def __getitem__(self, key):
+        scaled = scale_raw_array(self.raw[key], return_type=self.return_type, multiplier=self.multiplier)
+        # Return single elements as numpy scalars rather than 0-d arrays, like numpy does.
+        if scaled.ndim == 0:
+            return scaled[()]
+        return scaled
+
+    def __array__(self, dtype=None, copy=None):
+        array = scale_raw_array(self.raw, return_type=self.return_type, multiplier=self.multiplier)
+        if dtype is not None:
+            array = array.astype(dtype, copy=False)
+        return array
+
+    def __repr__(self):
+        return "NSIDCBinFile({0!r}, shape={1}, dtype={2})".format(self.fname, self.shape, self.dtype)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        """Release the memory map on the file. (It is unmapped once no slices still refer to it.)"""
+        self.raw = None
+
+def _read_NSIDC_bin_file_bytewise(fname,
+                                  grid_shape = DEFAULT_GRID_SHAPE,
+                                  header_size=0,
+                                  element_size=2,
+                                  return_type=float,
+                                  signed=False,
+                                  multiplier=0.1,
+                                  byteorder="little"):
+    """Reference (slow) version of read_NSIDC_bin_file(), decoding one element at a time.
+
+    Kept only to check the results of read_NSIDC_bin_file() in testing_decode_parity().
     """
-    # Data is in two-byte, little-endian integers, array of size GRID_SHAPE
     with open(fname, 'rb') as fin:
         raw_data = fin.read()
-        fin.close()
 
     # Lop off the header from the start of the byte array.
     if header_size > 0:
         raw_data = raw_data[header_size:]
 
-    # Check to make sure the data is the right size, raise ValueError if not.
-    # TODO: The NSIDC-0051 data has the rows,cols in the header. We could read it from there,
-    # although right now we just get the grid size from the paramter.
     if int(len(raw_data) / element_size) != int(numpy.product(grid_shape)):
         raise ValueError("File {0} has {1} elements, does not match grid size {2}.".format(
                          fname, int(len(raw_data)/element_size), str(grid_shape)))
 
-    # Creating a uint16 array to read the data in
     int_array = numpy.empty(grid_shape, dtype=return_type)
     int_array = int_array.flatten()
 
-    # Read the data. The built_int "from_bytes" function does the work here.
     for i in range(0, int(len(raw_data)/element_size)):
         int_array[i] = int.from_bytes(raw_data[(i*element_size):((i+1)*element_size)],
-                                      byteorder="little",
+                                      byteorder=byteorder,
                                       signed=signed)
 
-    # Unflatten the array back into the grid shape
     int_array.shape = grid_shape
 
-    # If the file is meant to be an integer array, just return it.
     if return_type in (int, numpy.int, numpy.uint8, numpy.int8, numpy.uint16, numpy.int16, numpy.uint32, numpy.int32, numpy.uint64, numpy.int64):
         return_array = numpy.array(int_array, dtype=return_type)
-    # Else, if it's meant to be a floating-point array, scale by the multiplier
-    # and return the floating-point array. If the mutiplier is a float (i.e. 0.1),
-    # numpy will conver and return an array of floats
     else:
         return_array = numpy.array( int_array * multiplier, dtype=return_type)
 
     return return_array
 
+# File-name patterns of the NSIDC products, without the extension. A "date" of 6 digits
+# (YYYYMM) is a monthly file, of 8 digits (YYYYMMDD) a daily one.
+NSIDC_FILENAME_PATTERNS = {
+    # e.g. "tb_f08_19870709_v5_s19h.bin"
+    "nsidc-0001": re.compile(r"\Atb_(?P<platform>[fn]\d{2})_(?P<date>\d{8})_v\d+_(?P<hemisphere>[ns])(?P<channel>\d{2}[vh])\Z", re.IGNORECASE),
+    # e.g. "nt_20201231_f17_v1.1_n.bin", "nt_198707_f08_v01_s.bin"
+    "nsidc-0051": re.compile(r"\Ant_(?P<date>\d{6}(?:\d{2})?)_(?P<platform>[fn]\d{2})_v[\d.]+_(?P<hemisphere>[ns])\Z", re.IGNORECASE),
+    # e.g. "bt_19870709_f08_v3.1_n.bin"
+    "nsidc-0079": re.compile(r"\Abt_(?P<date>\d{6}(?:\d{2})?)_(?P<platform>[fn]\d{2})_v[\d.]+_(?P<hemisphere>[ns])\Z", re.IGNORECASE),
+    }
+
+# The resolutions for each frequency (GHz) in the NSIDC data products.
+# Dictionary is "frequency:resolution" key:value pair.
+NSIDC_FREQUENCY_RESOLUTIONS = {19:25.0,
+                               22:25.0,
+                               37:25.0,
+                               85:12.5,
+                               91:12.5}
+
+def parse_nsidc_filename(fname):
+    """Read what an NSIDC-0001, -0051 or -0079 file name says about the file.
+
+    Returns: A dictionary with keys "product" (e.g. "nsidc-0051"), "platform" (e.g. "f08"),
+             "date" (a datetime.date, the 1st of the month for monthly files), "period"
+             ("daily" or "monthly"), "hemisphere" ("N" or "S"), "channel" (e.g. "19H", or
+             None for sea-ice products) and "resolution" (km). Or None if the name isn't
+             one of those products'.
+    """
+    fbase = os.path.splitext(get_member_name(fname))[0]
+
+    for product, pattern in NSIDC_FILENAME_PATTERNS.items():
+        match = pattern.match(fbase)
+        if match is None:
+            continue
+
+        fields = match.groupdict()
+        date_str = fields["date"]
+        try:
+            if len(date_str) == 8:
+                date, period = datetime.datetime.strptime(date_str, "%Y%m%d").date(), "daily"
+            else:
+                date, period = datetime.datetime.strptime(date_str, "%Y%m").date(), "monthly"
+        except ValueError:
+            return None
+
+        channel = fields.get("channel")
+        if channel is None:
+            # The sea-ice products are all on the 25 km grids.
+            resolution = 25.0
+        else:
+            channel = channel.upper()
+            resolution = NSIDC_FREQUENCY_RESOLUTIONS.get(int(channel[0:2]))
+            if resolution is None:
+                return None
+
+        return {"product": product,
+                "platform": fields["platform"].lower(),
+                "date": date,
+                "period": period,
+                "hemisphere": fields["hemisphere"].upper(),
+                "channel": channel,
+                "resolution": resolution}
+
+    return None
+
 def get_hemisphere_and_resolution_from_nsidc_filename(fname):
-    """Get the resolution from the filename.
+    """Get the hemisphere and resolution from the filename.
 
-    From the file specs on https://nsidc.org/data/nsidc-0001
-    Will be 12.5 or 25 km.
+    From the file specs on https://nsidc.org/data/nsidc-0001 (and -0051, -0079).
+    Will be 12.5 or 25 km. Returns (None, None) if the file name isn't one of those products'.
     """
-    fbase = os.path.splitext(os.path.split(fname)[1])[0]
+    fields = parse_nsidc_filename(fname)
+    if fields is None:
+        return None, None
 
-    # This is the filename structure for NSIDC-0001. TODO: Generalize it for other file name structures.
-    SSMI_REGEX =  r"(?<=\Atb_f\d{2}_\d{8}_v\d_)[ns]\d{2}(?=[vh])"
+    return fields["hemisphere"], fields["resolution"]
 
-    matches = re.search(fbase, SSMI_REGEX)
-    if matches is None:
-        return None, None
+def get_date_from_nsidc_filename(fname):
+    """Get the date of an NSIDC file from its file name, as a datetime.date.
 
-    match = matches.group(0)
-    hemisphere = match[0].upper()
+    NSIDC-0001, -0051 and -0079 file names hold the date as an 8-digit YYYYMMDD number
+    (e.g. "tb_f08_19870709_v5_s19h.bin", "nt_20201231_f17_v1.1_n.bin"), or a 6-digit
+    YYYYMM number for monthly files ("nt_198707_f08_v1.1_n.bin"), which get the 1st of
+    the month (as in parse_nsidc_filename()). Other file names are searched for a
+    YYYYMMDD number. Returns None if no valid date is found.
+    """
+    fields = parse_nsidc_filename(fname)
+    if fields is not None:
+        return fields["date"]
 
-    frequency = int(match[1:2])
+    fbase = os.path.splitext(get_member_name(fname))[0]
 
-    # The resolutions for each frequency in the NSIDC data products.
-    # Dictionary is "frequency:resolutin" key:value pair.
-    resolution = {19:25.0,
-                  22:25.0,
-                  37:25.0,
-                  85:12.5,
-                  91:12.5}[frequency]
+    for match in re.finditer(r"(?<!\d)(19|20)\d{6}(?!\d)", fbase):
+        try:
+            return datetime.datetime.strptime(match.group(0), "%Y%m%d").date()
+        except ValueError:
+            continue
 
-    return hemisphere, resolution
+    return None
 
-def output_array_to_stdout(array):
-    """Output a 2D array to stdout."""
-    for row in array:
-        print(" ".join([str(i) for i in row]))
+def output_array_to_stdout(array, precision=None):
+    """Output a 2D array to stdout, as space-delimited text. (See export_array.output_array() for other formats.)"""
+    output_array(array, None, format="txt", precision=precision)
     return
 
 def testing():
@@ -197,25 +584,145 @@ def testing():
     print(array5.shape, array5.dtype)
     print(array5)
 
+def testing_decode_parity():
+    """Check that read_NSIDC_bin_file() matches the element-by-element reference decoder.
+
+    Writes small synthetic .bin files (random values, random headers) for each of the
+    parameter combinations used in testing(), plus every element size, signedness and
+    byte order, and compares the results bit-for-bit. Raises AssertionError on a mismatch.
+    """
+    import tempfile
+
+    # (grid_shape, header_size, element_size, return_type, signed, multiplier, byteorder)
+    # The first five are the combinations used by the example files in testing().
+    combinations = [((332,316), 0, 2, float, False, 0.1, "little"),
+                    ((448,304), 300, 1, int, False, 0.1, "little"),
+                    ((332,316), 300, 1, int, False, 0.1, "little"),
+                    ((448,304), 0, 2, int, False, 0.1, "little"),
+                    ((332,316), 0, 2, float, False, 0.1, "little")]
+    for element_size in (1, 2, 4, 8):
+        for signed in (False, True):
+            for byteorder in ("little", "big"):
+                for return_type in (int, float, numpy.float32):
+                    combinations.append(((20,16), 300, element_size, return_type, signed, 0.1, byteorder))
+
+    random_state = numpy.random.RandomState(0)
+    tempdir = tempfile.mkdtemp()
+    try:
+        for i, (grid_shape, header_size, element_size, return_type, signed, multiplier, byteorder) in enumerate(combinations):
+            fname = os.path.join(tempdir, "parity_{0}.bin".format(i))
+            # Random bytes cover the full range of values (and signs) for each element size,
+            # except 8-byte unsigned values that won't fit in a (signed) python int array.
+            raw_bytes = random_state.randint(0, 256, size=header_size + int(numpy.product(grid_shape))*element_size).astype(numpy.uint8)
+            if element_size == 8 and not signed:
+                raw_bytes[header_size:].reshape(-1,8)[:, 7 if byteorder == "little" else 0] &= 0x7f
+            raw_bytes.tofile(fname)
+
+            kwargs = dict(grid_shape=grid_shape,
+                          header_size=header_size,
+                          element_size=element_size,
+                          return_type=return_type,
+                          signed=signed,
+                          multiplier=multiplier,
+                          byteorder=byteorder)
+            array_fast = read_NSIDC_bin_file(fname, **kwargs)
+            array_reference = _read_NSIDC_bin_file_bytewise(fname, **kwargs)
+
+            assert array_fast.shape == array_reference.shape, (kwargs, array_fast.shape, array_reference.shape)
+            assert array_fast.dtype == array_reference.dtype, (kwargs, array_fast.dtype, array_reference.dtype)
+            assert array_fast.tobytes() == array_reference.tobytes(), kwargs
+
+            os.remove(fname)
+    finally:
+        os.rmdir(tempdir)
+
+    print(len(combinations), "decode combinations match.")
+
+def testing_flag_classes():
+    """Check decoding an NSIDC-0051 grid with its lookup tables, flag classes included. Raises AssertionError on a mismatch.
+
+    Writes a synthetic sea-ice concentration file holding every raw value (0-250 as
+    data, and the 251-255 flags), and checks the values and flag classes returned by
+    read_NSIDC_bin_file() and decode_NSIDC_bin_data(), whole and in a window.
+    """
+    import tempfile
+
+    product_info = get_product_info("nsidc-0051")
+    grid_shape = (448, 304)
+    random_state = numpy.random.RandomState(0)
+    raw_array = random_state.randint(0, 256, size=grid_shape).astype(numpy.uint8)
+    raw_array.ravel()[:256] = numpy.arange(256)
+    header = random_state.randint(0, 256, size=product_info["header_size"]).astype(numpy.uint8)
+
+    expected_classes = numpy.zeros(grid_shape, dtype=numpy.uint8)
+    for raw_value, flag_class in product_info["flags"].items():
+        expected_classes[raw_array == raw_value] = FLAG_CLASSES.index(flag_class)
+    expected_values = raw_array * product_info["multiplier"]
+    expected_values[raw_array >= 251] = numpy.nan
+
+    value_lut, class_lut = get_product_luts("nsidc-0051")
+    kwargs = dict(grid_shape=grid_shape, header_size=product_info["header_size"], element_size=1,
+                  lut=value_lut, class_lut=class_lut)
+    window = ((10, 200), (5, 300))
+
+    fd, fname = tempfile.mkstemp(suffix=".bin")
+    os.close(fd)
+    try:
+        numpy.concatenate((header, raw_array.ravel())).tofile(fname)
+        with open(fname, "rb") as f:
+            raw_data = f.read()
+
+        for w in (None, window):
+            rows, cols = (slice(None), slice(None)) if w is None else (slice(*w[0]), slice(*w[1]))
+            for values, flag_classes in (read_NSIDC_bin_file(fname, window=w, **kwargs),
+                                         decode_NSIDC_bin_data(raw_data, window=w, **kwargs)):
+                assert flag_classes.dtype == numpy.uint8, flag_classes.dtype
+                assert numpy.array_equal(flag_classes, expected_classes[rows, cols]), w
+                assert numpy.allclose(values, expected_values[rows, cols], equal_nan=True), w
+
+        # Every flag value (and nothing else) is flagged, with its own class.
+        values, flag_classes = read_NSIDC_bin_file(fname, **kwargs)
+        assert [FLAG_CLASSES[c] for c in flag_classes.ravel()[251:256]] == ["pole_hole", "unused", "coast", "land", "missing"]
+        assert not flag_classes.ravel()[:251].any()
+        # Without class_lut, just the values, as before.
+        assert numpy.allclose(read_NSIDC_bin_file(fname, grid_shape=grid_shape, header_size=product_info["header_size"],
+                                                  element_size=1, lut=value_lut), values, equal_nan=True)
+    finally:
+        os.remove(fname)
+
+    print("Flag class checks passed.")
+
 def read_and_parse_args():
     """Read and parse command-line arguments."""
     parser = argparse.ArgumentParser(description="""Reads an NSIDC .bin file and outputs the array contents. Use
 'convert_bin_to_gtif.py' to output to a GeoTiff. This will just spit the
 numbers onto a screen. In order to output to a space-delimited text file, just
-route the stdout into a file. Example:
+route the stdout into a file, or use -dest. Example:
 
                 $ python read_bin.py infile.bin > outfile.txt
 
+Other formats (csv, with optional x/y columns, .npy, or raw binary) can be
+chosen with -format.
+
 Read the NSIDC documentation for your data product in order to
 choose the correct parameters listed below.""")
-    parser.add_argument("src", type=str, help="Source file (.bin)")
+    parser.add_argument("src", type=str, help="Source file (.bin). Or a .bin file inside a .gz, .zip or .tar archive, as 'archive.tar::member.bin' (or just 'file.bin.gz').")
     parser.add_argument("-resolution", "-r", type=float, default=None, help="Resolution (km): 6.25, 12.5, or 25. If omitted, it is interpreted from the file name. If cannot be interpreted, defaults to 25 km. Check your NSIDC data source documentation.")
     parser.add_argument("-hemisphere", type=str, default=None, help="Hemisphere: N or S. If omitted, it is interpreted from the file name. If cannot be interpreted, defaults to 'N'.")
     parser.add_argument("-header_size", "-hs", type=int, default=0, help="Size of .bin file header (in bytes.) (Default: 0)")
     parser.add_argument("-element_size", "-es", type=int, default=2, help="Size of each numerical .bin data element, in bytes. Most NSIDC files use 1- or 2-byte numbers. Check the documentation of the dataset. (Default: 2)")
-    parser.add_argument("-output_type", "-ot", default="int", help="Output data type: 'int' or 'float'. Default 'int'.")
+    parser.add_argument("-output_type", "-ot", default="int", help="Output data type: 'int', 'float' or 'float32'. Default 'int'.")
     parser.add_argument("-multiplier","-m", type=str, default="auto", help="A multiplier to create the output numbers. Any number, or 'auto'. With 'auto', defaults to 1 for integers (no modification) and 0.1 for floating-point (2731 becomes 273.1, e.g.). Or, specify your own multiplier here.")
+    parser.add_argument("-byteorder", "-bo", type=str, default="little", help="Byte order of each data element: 'little' or 'big'. NSIDC files are little-endian. (Default: little)")
+    parser.add_argument("-product", type=str, default=None, help="A built-in NSIDC product ({0}). Sets the header size, element size and (unless given) multiplier, and decodes with a lookup table that turns flag values (land, coast, pole hole, missing...) into NaN for float output.".format(", ".join(sorted(NSIDC_PRODUCTS))))
+    parser.add_argument("-dest", "-o", type=str, default=None, help="Output file. (Default: write to stdout)")
+    parser.add_argument("-flags_dest", type=str, default=None, help="With -product, also write the flag class of each grid cell to this file, in the same -format: 0 for data, or {0}.".format(", ".join(["{0} for {1}".format(i, c) for i, c in enumerate(FLAG_CLASSES) if i > 0])))
+    parser.add_argument("-format", "-f", type=str, default="txt", help="Output format: 'txt' (space-delimited), 'csv', 'npy' (numpy .npy), or 'bin' (raw native-endian binary). (Default: txt)")
+    parser.add_argument("-precision", "-p", type=int, default=None, help="Decimal places for floating-point values in txt & csv output. (Default: full precision, which is slower)")
     parser.add_argument("--signed", "-s", action="store_true", default=False, help="Read bin as signed data. Default to unsigned.")
+    parser.add_argument("-bbox", type=float, nargs=4, default=None, metavar=("XMIN", "YMIN", "XMAX", "YMAX"), help="Only read the grid cells within this box, in polar stereo coordinates (km).")
+    parser.add_argument("--xy", action="store_true", default=False, help="With -format csv, write one 'x,y,value' line per grid cell, with x & y the polar stereo coordinates (km) of each cell.")
+    parser.add_argument("-profile_report", type=str, default=None, metavar="JSON_FILE", help="Time each stage of the read (read, scale) and write the totals (seconds, bytes, arrays allocated) to this JSON file. See stage_profiler.py.")
 
     return parser.parse_args()
 
@@ -225,15 +732,34 @@ if __name__ == "__main__":
 
     if args.output_type.lower() in ("float", "f"):
         out_type = float
+    elif args.output_type.lower() == "float32":
+        out_type = numpy.float32
     elif args.output_type.lower() in ("int", "i", "d"):
         out_type = int
     else:
-        raise ValueError("Uknown output_type (can be: 'int','i','d','float', or 'f'):", str(args.output_type))
+        raise ValueError("Uknown output_type (can be: 'int','i','d','float','f', or 'float32'):", str(args.output_type))
 
     if args.multiplier.lower().strip() != "auto":
         multiplier = float(args.multiplier)
     else:
-        multiplier = args.multiplier
+        multiplier = 1 if (out_type == int) else 0.1
+
+    header_size = args.header_size
+    element_size = args.element_size
+    if args.product is not None:
+        product_info = get_product_info(args.product)
+        header_size = product_info["header_size"]
+        element_size = product_info["element_size"]
+        lut, class_lut = get_product_luts(args.product,
+                                          return_type=out_type,
+                                          multiplier=None if args.multiplier.lower().strip() == "auto" else multiplier,
+                                          signed=args.signed)
+        if args.flags_dest is None:
+            class_lut = None
+    elif args.flags_dest is not None:
+        raise ValueError("-flags_dest needs a -product, to know which values are flags.")
+    else:
+        lut = class_lut = None
 
     # Resolve the resolution, from:
     # 1) The command line argument
@@ -280,14 +806,59 @@ if __name__ == "__main__":
     else:
         raise ValueError("Unknown hemisphere: {0}".format(hemisphere))
 
+    if args.bbox is not None:
+        # Only needed for a bounding box, so only imported here.
+        from convert_bin_to_gtif import get_bbox_window
+        window = get_bbox_window(args.bbox, hemisphere=hemisphere, resolution=resolution)
+    else:
+        window = None
+
+    if args.profile_report is not None:
+        profiler = StageProfiler()
+        profiler.start()
+
     # Read the array
     array = read_NSIDC_bin_file(args.src,
                                 grid_shape = gridsize,
-                                header_size=args.header_size,
-                                element_size=args.element_size,
+                                header_size=header_size,
+                                element_size=element_size,
                                 return_type=out_type,
                                 signed=args.signed,
-                                multiplier=args.multiplier)
-
-    # Print the array to stdout
-    output_array_to_stdout(array)
\ No newline at end of file
+                                multiplier=multiplier,
+                                byteorder=args.byteorder,
+                                window=window,
+                                lut=lut,
+                                class_lut=class_lut)
+    if class_lut is not None:
+        array, flag_classes = array
+
+    if args.format.strip().lower() not in EXPORT_FORMATS:
+        raise ValueError("Unknown output format (can be: {0}): {1}".format(", ".join(EXPORT_FORMATS), args.format))
+
+    if args.xy:
+        # Only needed for x/y columns, so only imported here.
+        from convert_bin_to_gtif import retrieve_ssmi_grid_coords
+        x_vector, y_vector = retrieve_ssmi_grid_coords(N_or_S=hemisphere, gridsize_km=resolution)
+        if window is not None:
+            x_vector = x_vector[window[1][0]:window[1][1]]
+            y_vector = y_vector[window[0][0]:window[0][1]]
+    else:
+        x_vector, y_vector = None, None
+
+    # Write the array to stdout (or the -dest file)
+    output_array(array,
+                 args.dest,
+                 format=args.format,
+                 precision=args.precision,
+                 x_vector=x_vector,
+                 y_vector=y_vector)
+    if class_lut is not None:
+        output_array(flag_classes,
+                     args.flags_dest,
+                     format=args.format,
+                     x_vector=x_vector,
+                     y_vector=y_vector)
+
+    if args.profile_report is not None:
+        profiler.stop()
+        profiler.save_json(args.profile_report)
\ No newline at end of file
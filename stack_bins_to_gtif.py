@@ -0,0 +1,296 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Fri Oct 16 22:27:58 2026
+"""
+import numpy
+import argparse
+import os
+import uuid
+
+from read_bin import read_NSIDC_bin_file, get_date_from_nsidc_filename
+from band_statistics import compute_band_stats
+from grid_resample import resample_grid, get_resample_method, get_resampled_dtype, DOWNSAMPLE_METHODS, UPSAMPLE_METHODS
+from convert_bin_to_gtif import output_bin_to_gtif, \
+                               get_nsidc_geotransform, \
+                               get_projection_wkt, \
+                               get_gdal_datatype, \
+                               get_gtif_creation_options, \
+                               resolve_hemisphere_and_resolution, \
+                               resolve_multiplier, \
+                               find_bin_files, \
+                               get_gtif_file_name, \
+                               NSIDC_GRIDSIZES
+from conversion_manifest import ConversionManifest, get_conversion_params_key, get_source_stat, DEFAULT_MANIFEST_NAME
+
+def set_band_source_metadata(band, bin_file):
+    """Record the date and source .bin file of a raster band, in the band's description & metadata."""
+    date = get_date_from_nsidc_filename(bin_file)
+    band.SetDescription(os.path.basename(bin_file))
+    band.SetMetadata({"DATE": "" if date is None else date.isoformat(),
+                      "SOURCE_FILE": os.path.basename(bin_file)})
+    return
+
+def stack_bins_to_gtif(bin_files,
+                       gtif_file,
+                       element_size=2,
+                       header_size=0,
+                       resolution=None,
+                       hemisphere=None,
+                       verbose=True,
+                       nodata=0,
+                       signed=False,
+                       multiplier="auto",
+                       return_type=float,
+                       byteorder="little",
+                       vrt=False,
+                       profile="plain",
+                       compress="DEFLATE",
+                       predictor=True,
+                       blocksize=256,
+                       num_threads="ALL_CPUS",
+                       interleave="BAND",
+                       resample_to=None,
+                       resample_method=None):
+    """Stack many same-grid NSIDC .bin files (e.g. a season of daily files) into one multi-band geotiff.
+
+    Band i of the output holds the i-th .bin file. Each band's description is its
+    source file name, and its metadata holds "DATE" (YYYY-MM-DD, read from the file
+    name, if there) and "SOURCE_FILE". The output is created once, and the files are
+    read and written one band at a time, so memory use doesn't grow with the number of files.
+    It's written to a temporary file that is renamed to gtif_file once every band is in,
+    so an interrupted run never leaves a partly-written gtif_file behind.
+
+    bin_files = A list of .bin files, glob patterns or directories. (See find_bin_files().)
+                Bands are stacked in this order.
+
+    gtif_file = Name of the multi-band geotiff (.tif) or, if vrt is True, VRT (.vrt) to produce.
+
+    vrt = If True, write a GDAL VRT that references a single-band geotiff for each .bin
+          file, instead of one multi-band geotiff. The single-band geotiffs are written
+          alongside each .bin file (as output_bin_to_gtif() does), unless a manifest
+          (see conversion_manifest.py) in the VRT's directory says they were already
+          written from the same, unchanged .bin file with the same parameters.
+
+    profile, compress, predictor, blocksize, num_threads = How the geotiff(s) are encoded,
+          as in output_gtif(). Only "plain" and "tiled" profiles can be written a band at
+          a time, so a "cog" profile is only allowed for the single-band geotiffs of a VRT.
+
+    interleave = "BAND" (the default) or "PIXEL". Band-interleaved geotiffs are faster
+                 to write a band at a time. Pixel-interleaved ones are faster to read
+                 the whole time series of a few pixels from.
+
+    resample_to, resample_method = A resolution (25, 12.5 or 6.25 km) to resample every band
+                 to, and how, as in output_bin_to_gtif(). (See grid_resample.resample_grid().)
+
+    The rest of the parameters are the same as output_bin_to_gtif(). The hemisphere
+    and resolution (if not given) are read from the file names, and all the files must
+    be on the same grid.
+
+    Returns: None. Just saves the geotiff or VRT.
+    """
+    from osgeo import gdal
+
+    bin_files = find_bin_files(bin_files, expand_archives=True)
+    if len(bin_files) == 0:
+        raise ValueError("No .bin files to stack.")
+
+    # Make sure all the files are on the same grid.
+    grid_hemisphere, grid_resolution = resolve_hemisphere_and_resolution(bin_files[0], hemisphere=hemisphere, resolution=resolution)
+    for bin_file in bin_files[1:]:
+        if resolve_hemisphere_and_resolution(bin_file, hemisphere=hemisphere, resolution=resolution) != (grid_hemisphere, grid_resolution):
+            raise ValueError("File {0} is not on the same grid ({1}, {2} km) as {3}.".format(
+                             bin_file, grid_hemisphere, grid_resolution, bin_files[0]))
+    hemisphere, resolution = grid_hemisphere, grid_resolution
+
+    multiplier = resolve_multiplier(multiplier, return_type)
+    if resample_to is not None:
+        resample_method = get_resample_method(resolution, resample_to, resample_method)
+        out_resolution = float(resample_to)
+    else:
+        out_resolution = resolution
+
+    if vrt:
+        _stack_bins_to_vrt(bin_files,
+                           gtif_file,
+                           verbose=verbose,
+                           element_size=element_size,
+                           header_size=header_size,
+                           resolution=resolution,
+                           hemisphere=hemisphere,
+                           nodata=nodata,
+                           signed=signed,
+                           multiplier=multiplier,
+                           return_type=return_type,
+                           byteorder=byteorder,
+                           profile=profile,
+                           compress=compress,
+                           predictor=predictor,
+                           blocksize=blocksize,
+                           num_threads=num_threads,
+                           resample_to=resample_to,
+                           resample_method=resample_method)
+        return
+
+    if profile.strip().lower() == "cog":
+        raise ValueError("A Cloud-Optimized GeoTiff can't be written a band at a time. Use the 'tiled' profile, or vrt=True.")
+
+    grid_shape = NSIDC_GRIDSIZES[(resolution, hemisphere)]
+    out_grid_shape = NSIDC_GRIDSIZES[(out_resolution, hemisphere)]
+    datatype = get_gdal_datatype(get_resampled_dtype(return_type, resolution, out_resolution, resample_method))
+    creation_options = get_gtif_creation_options(profile=profile,
+                                                 compress=compress,
+                                                 predictor=predictor,
+                                                 blocksize=blocksize,
+                                                 num_threads=num_threads,
+                                                 is_float=(datatype in (gdal.GDT_Float32, gdal.GDT_Float64)))
+    # A year of daily 6.25 km grids is bigger than a classic (4 GB) tiff can hold.
+    creation_options.extend(["INTERLEAVE={0}".format(interleave.strip().upper()),
+                             "BIGTIFF=IF_SAFER"])
+
+    # Written to a temporary file, and moved into place once it's complete (as in output_gtif()).
+    output_file = "{0}.{1}.tmp.tif".format(os.path.splitext(gtif_file)[0], uuid.uuid4().hex)
+    ds = None
+    written = False
+    try:
+        driver = gdal.GetDriverByName("GTiff")
+        ds = driver.Create(output_file, int(out_grid_shape[1]), int(out_grid_shape[0]), len(bin_files), datatype, options=creation_options)
+        ds.SetGeoTransform(get_nsidc_geotransform(hemisphere=hemisphere, resolution=out_resolution))
+        ds.SetProjection(get_projection_wkt(hemisphere))
+
+        for i, bin_file in enumerate(bin_files):
+            array = read_NSIDC_bin_file(bin_file,
+                                        grid_shape = grid_shape,
+                                        header_size=header_size,
+                                        element_size=element_size,
+                                        return_type=return_type,
+                                        signed=signed,
+                                        multiplier=multiplier,
+                                        byteorder=byteorder)
+            if out_resolution != resolution:
+                array = resample_grid(array, resolution, out_resolution, method=resample_method, nodata=nodata)
+
+            band = ds.GetRasterBand(i+1)
+            band.WriteArray(array)
+            if nodata != None:
+                band.SetNoDataValue(nodata)
+            band.SetStatistics(*compute_band_stats(array, nodata=nodata).as_tuple())
+            set_band_source_metadata(band, bin_file)
+            # Write this band out to disk before reading the next one.
+            band.FlushCache()
+            band = None
+
+            if verbose:
+                print("Band {0}/{1}: {2}".format(i+1, len(bin_files), bin_file))
+
+        ds.FlushCache()
+        ds = None
+
+        if os.path.exists(output_file + ".aux.xml"):
+            os.replace(output_file + ".aux.xml", gtif_file + ".aux.xml")
+        os.replace(output_file, gtif_file)
+        written = True
+    finally:
+        ds = None
+        if not written:
+            for fname in (output_file, output_file + ".aux.xml"):
+                if os.path.exists(fname):
+                    os.remove(fname)
+
+    if verbose:
+        print(gtif_file, "written with", len(bin_files), "bands.")
+
+    return
+
+def _stack_bins_to_vrt(bin_files, vrt_file, verbose=True, **kwargs):
+    """Write a single-band geotiff for each .bin file (if not already up to date), and a VRT stacking them as bands.
+
+    Whether a geotiff is up to date is kept in a manifest (see conversion_manifest.py) in
+    the VRT's directory, so geotiffs written with other parameters (a different multiplier
+    or resolution, say) are written again, not just ones older than their .bin file.
+    """
+    from osgeo import gdal
+
+    params_key = get_conversion_params_key(kwargs)
+    gtif_files = []
+    with ConversionManifest(os.path.join(os.path.dirname(os.path.abspath(vrt_file)), DEFAULT_MANIFEST_NAME)) as manifest:
+        for bin_file in bin_files:
+            gtif_file = get_gtif_file_name(bin_file)
+            source_stat = get_source_stat(bin_file)
+            if not manifest.is_up_to_date(bin_file, gtif_file, params_key, source_stat):
+                output_bin_to_gtif(bin_file, gtif_file, verbose=verbose, **kwargs)
+                manifest.record(bin_file, gtif_file, params_key, source_stat)
+            gtif_files.append(gtif_file)
+
+    ds = gdal.BuildVRT(vrt_file, gtif_files, separate=True)
+    if ds is None:
+        raise RuntimeError("Could not build VRT {0}".format(vrt_file))
+
+    for i, bin_file in enumerate(bin_files):
+        set_band_source_metadata(ds.GetRasterBand(i+1), bin_file)
+
+    ds.FlushCache()
+    ds = None
+
+    if verbose:
+        print(vrt_file, "written with", len(bin_files), "bands.")
+
+    return
+
+def read_and_parse_args():
+    """Read and parse command-line arguments."""
+    parser = argparse.ArgumentParser(description="Stacks many NSIDC flat binary (.bin) data files on the same grid (e.g. a season of daily files) into a single multi-band geo-referenced TIF (.tif), or a VRT (.vrt) of single-band TIFs. Each band records its date and source file in its metadata.")
+    parser.add_argument("src", type=str, nargs="+", help="Source .bin files, glob patterns (quoted, e.g. \"tb_f08_1987*.bin\") and/or directories (searched recursively for .bin files and archives), in band order. Files inside .gz, .zip or .tar archives can be named as \"archive.tar::file.bin\".")
+    parser.add_argument("-dest", type=str, required=True, help="Destination multi-band file (.tif), or (.vrt) with --vrt.")
+    parser.add_argument("-resolution", "-r", type=float, default=None, help="Resolution (km): 6.25, 12.5, or 25. If omitted, it is interpreted from the file names. If cannot be interpreted, defaults to 25 km.")
+    parser.add_argument("-hemisphere", type=str, default=None, help="Hemisphere: one letter, N or S. If omitted, it is interpreted from the file names. If cannot be interpreted, defaults to 'S'.")
+    parser.add_argument("-nodata", "-nd", type=int, default=None, help="Nodata value. (Default: None)")
+    parser.add_argument("-header_size", "-hs", type=int, default=0, help="Size of .bin file header (in bytes). (Default: 0)")
+    parser.add_argument("-element_size", "-es", type=int, default=2, help="Size of each numerical .bin data element (in bytes). Typically 1 or 2 for NSIDC files. (Default: 2)")
+    parser.add_argument("-output_type", "-ot", default="float", help="Output data type: 'int' or 'float'. Default 'float'.")
+    parser.add_argument("-multiplier","-m", type=str, default="auto", help="Use a multiplier. With 'auto', defaults to 1 (no mod) for integer output and 0.1 for floating-point (2731 -> 273.1).")
+    parser.add_argument("-byteorder", "-bo", type=str, default="little", help="Byte order of each .bin data element: 'little' or 'big'. (Default: little)")
+    parser.add_argument("-profile", "-p", type=str, default="plain", help="GeoTiff encoding: 'plain' or 'tiled'. ('cog' is allowed with --vrt only.) (Default: plain)")
+    parser.add_argument("-compress", "-c", type=str, default="DEFLATE", help="Compression for the 'tiled' profile: DEFLATE, ZSTD, LZW, or NONE. (Default: DEFLATE)")
+    parser.add_argument("-interleave", type=str, default="BAND", help="BAND or PIXEL interleaving of the multi-band geotiff. (Default: BAND)")
+    parser.add_argument("-resample_to", type=float, default=None, help="Resample every band to this resolution (km): 25, 12.5 or 6.25. (Default: keep the files' resolution)")
+    parser.add_argument("-resample_method", type=str, default=None, help="How to resample: {0} to a coarser grid, or {1} to a finer one, leaving out nodata & NaN cells. (Default: {2} or {3})".format(
+                        ", ".join(DOWNSAMPLE_METHODS), ", ".join(UPSAMPLE_METHODS), DOWNSAMPLE_METHODS[0], UPSAMPLE_METHODS[0]))
+    parser.add_argument("--vrt", action="store_true", default=False, help="Write a VRT referencing one single-band .tif per .bin file, instead of one multi-band .tif.")
+    parser.add_argument("--signed", "-s", action="store_true", default=False, help="If set, read binary data as signed numbers. (Default: unsigned)")
+    parser.add_argument("--verbose", "-v", action="store_true", default=False, help="Increase output verbosity.")
+
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = read_and_parse_args()
+
+    if args.output_type.lower() in ("float", "f"):
+        out_type = float
+    elif args.output_type.lower() in ("int", "i", "d"):
+        out_type = int
+    else:
+        raise ValueError("Uknown output_type (can be: 'int','i','d','float', or 'f'):", str(args.output_type))
+
+    if args.multiplier.lower().strip() != "auto":
+        multiplier = float(args.multiplier)
+    else:
+        multiplier = args.multiplier
+
+    stack_bins_to_gtif(args.src,
+                       args.dest,
+                       header_size = args.header_size,
+                       element_size = args.element_size,
+                       resolution = args.resolution,
+                       hemisphere = None if args.hemisphere is None else args.hemisphere.strip().upper(),
+                       nodata = args.nodata,
+                       signed = args.signed,
+                       return_type = out_type,
+                       multiplier = multiplier,
+                       byteorder = args.byteorder,
+                       vrt = args.vrt,
+                       profile = args.profile,
+                       compress = args.compress,
+                       interleave = args.interleave,
+                       resample_to = args.resample_to,
+                       resample_method = args.resample_method,
+                       verbose = args.verbose)
@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Fri Oct 16 22:53:48 2026
+
+Per-stage timing of the read -> scale -> statistics -> GeoTiff write path, for finding
+where a slow batch spends its time.
+
+read_NSIDC_bin_file(), output_bin_to_gtif() and output_gtif() mark out their stages:
+
+    "read"        reading the file (or archive member) into memory
+    "scale"       turning the raw values into the output values (byte order, type,
+                  multiplier or lookup table)
+    "resample"    resampling to another resolution (see grid_resample.py), if asked to
+    "reproject"   reprojecting to another grid (see grid_reproject.py), if asked to
+    "stats"       the band statistics (leaving out nodata and NaN values)
+    "gdal_write"  creating the geotiff and writing the bands & metadata to it
+    "overviews"   building overviews, or copying to a Cloud-Optimized GeoTiff
+    "gdal_flush"  flushing and closing the geotiff, and moving it into place
+
+Each stage records its wall time, the bytes it read and wrote, and the arrays it allocated.
+Nothing is recorded (and the stages cost a single check each) unless a StageProfiler is
+active:
+
+    with StageProfiler() as profiler:
+        output_bins_to_gtifs(bin_files, dest_dir="tifs")
+    profiler.save_json("profile.json")
+
+or, to see each stage as it finishes, StageProfiler(callback=lambda stage, record: print(stage, record)).
+"""
+import json
+import threading
+import time
+
+# The stage counters, and the order they're reported in.
+STAGE_COUNTERS = ("calls", "seconds", "bytes_read", "bytes_written", "arrays_allocated", "array_bytes_allocated")
+PROFILED_STAGES = ("read", "scale", "resample", "reproject", "stats", "gdal_write", "overviews", "gdal_flush")
+
+# The active profilers. Empty unless profiling, which is all the stages check.
+_active_profilers = []
+_profilers_lock = threading.Lock()
+
+class _NullStage(object):
+    """What profile_stage() returns when nothing is profiling: does nothing, as quickly as possible."""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+    def add(self, bytes_read=0, bytes_written=0, arrays=()):
+        pass
+
+_NULL_STAGE = _NullStage()
+
+class _Stage(object):
+    """One timed run of a stage, reported to every active profiler when it ends."""
+    __slots__ = ("name", "start_time", "record")
+
+    def __init__(self, name):
+        self.name = name
+        self.record = {"calls": 1, "seconds": 0.0, "bytes_read": 0, "bytes_written": 0,
+                       "arrays_allocated": 0, "array_bytes_allocated": 0}
+
+    def __enter__(self):
+        self.start_time = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.record["seconds"] = time.perf_counter() - self.start_time
+        for profiler in list(_active_profilers):
+            profiler.add(self.name, self.record)
+        return False
+
+    def add(self, bytes_read=0, bytes_written=0, arrays=()):
+        """Count bytes read or written, and numpy arrays allocated, in this stage."""
+        self.record["bytes_read"] += int(bytes_read)
+        self.record["bytes_written"] += int(bytes_written)
+        for array in arrays:
+            if array is not None:
+                self.record["arrays_allocated"] += 1
+                self.record["array_bytes_allocated"] += int(array.nbytes)
+
+def profile_stage(name):
+    """Time a stage, for the active profilers (if any):
+
+        with profile_stage("read") as stage:
+            array = numpy.fromfile(...)
+            stage.add(bytes_read=array.nbytes, arrays=[array])
+    """
+    if not _active_profilers:
+        return _NULL_STAGE
+    return _Stage(name)
+
+class StageProfiler(object):
+    """Collects the time, bytes and allocations of each stage, while active (in a "with" block, or between start() and stop()).
+
+    callback = Optional function(stage name, record) called as each stage ends, with
+               that run's counters (see STAGE_COUNTERS).
+
+    Safe to use from several threads. Work done in other processes (e.g. batches with
+    jobs > 1) is only included if it's collected there and merge()'d in.
+    """
+    def __init__(self, callback=None):
+        self.callback = callback
+        self.stages = {}
+        self.wall_seconds = 0.0
+        self._start_time = None
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+        return False
+
+    @property
+    def is_active(self):
+        return self in _active_profilers
+
+    def start(self):
+        self._start_time = time.perf_counter()
+        with _profilers_lock:
+            _active_profilers.append(self)
+
+    def stop(self):
+        with _profilers_lock:
+            if self in _active_profilers:
+                _active_profilers.remove(self)
+        if self._start_time is not None:
+            self.wall_seconds += time.perf_counter() - self._start_time
+            self._start_time = None
+
+    def _add_totals(self, stage, record):
+        with self._lock:
+            totals = self.stages.setdefault(stage, dict([(counter, 0) for counter in STAGE_COUNTERS]))
+            for counter in STAGE_COUNTERS:
+                totals[counter] += record.get(counter, 0)
+
+    def add(self, stage, record):
+        """Add the counters of one run of a stage."""
+        self._add_totals(stage, record)
+        if self.callback is not None:
+            self.callback(stage, record)
+
+    def merge(self, stages):
+        """Add the stages of another profiler (its to_dict()["stages"], e.g. sent back from another process)."""
+        for stage, record in stages.items():
+            self._add_totals(stage, record)
+
+    def to_dict(self):
+        """Return the totals of every stage, with MB/s of the bytes read and written and each stage's share of the time.
+
+        Returns: {"wall_seconds": ..., "stage_seconds": total of all stages, "stages": {stage: {counter: total}}}
+        """
+        with self._lock:
+            stage_seconds = sum([record["seconds"] for record in self.stages.values()])
+            order = [s for s in PROFILED_STAGES if s in self.stages] + sorted([s for s in self.stages if s not in PROFILED_STAGES])
+            stages = {}
+            for stage in order:
+                record = dict(self.stages[stage])
+                megabytes = (record["bytes_read"] + record["bytes_written"]) / (1024.**2)
+                record["mb_per_s"] = megabytes / record["seconds"] if record["seconds"] > 0 else None
+                record["share"] = record["seconds"] / stage_seconds if stage_seconds > 0 else None
+                stages[stage] = record
+
+        return {"wall_seconds": self.wall_seconds,
+                "stage_seconds": stage_seconds,
+                "stages": stages}
+
+    def save_json(self, json_file):
+        """Write to_dict() to a JSON file."""
+        with open(json_file, "w") as f:
+            json.dump(self.to_dict(), f, indent=1)
+
+    def print_report(self):
+        """Print a table of the stages."""
+        report = self.to_dict()
+        print("{0:<12} {1:>8} {2:>10} {3:>7} {4:>10} {5:>10} {6:>8}".format("Stage", "Calls", "Seconds", "Share", "MB read", "MB written", "Arrays"))
+        for stage, record in report["stages"].items():
+            print("{0:<12} {1:>8d} {2:>10.3f} {3:>6.1f}% {4:>10.1f} {5:>10.1f} {6:>8d}".format(
+                  stage, record["calls"], record["seconds"], 100.0 * (record["share"] or 0),
+                  record["bytes_read"] / (1024.**2), record["bytes_written"] / (1024.**2), record["arrays_allocated"]))
+        print("{0} s in stages, of {1:0.3f} s wall time.".format(round(report["stage_seconds"], 3), report["wall_seconds"]))